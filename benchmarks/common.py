@@ -0,0 +1,72 @@
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import time
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """ Перцентиль по ближайшему рангу: значение, не больше которого q процентов замеров """
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(q / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def summarize(latencies: list[float], elapsed: float, errors: int = 0) -> dict[str, float | int]:
+    """ Сводка по замерам в секундах: перцентили и среднее в миллисекундах,
+    пропускная способность в запросах в секунду
+    """
+    values = sorted(latencies)
+    return {
+        'count': len(values),
+        'errors': errors,
+        'rps': round(len(values) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(statistics.fmean(values) * 1000, 3) if values else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p95_ms': round(percentile(values, 95) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(kind: str, name: str, params: dict, results: dict, directory: str = RESULTS_DIR) -> str:
+    """ Сохраняет прогон в <directory>/<kind>-<name>-<время>.json вместе с ревизией и окружением для сравнения """
+    os.makedirs(directory, exist_ok=True)
+    started = time.strftime('%Y%m%dT%H%M%S')
+    path = os.path.join(directory, f'{kind}-{name}-{started}.json')
+    document = {
+        'kind': kind,
+        'name': name,
+        'started': started,
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'params': params,
+        'results': results,
+    }
+    with open(path, 'w') as file:
+        json.dump(document, file, indent=2, ensure_ascii=False)
+    return path
+
+
+def print_table(results: dict[str, dict]) -> None:
+    columns = [column for column in ('count', 'errors', 'rps', 'p50_ms', 'p95_ms', 'p99_ms', 'rows_per_sec',
+                                     'rows_per_call', 'peak_kib')
+               if any(column in summary for summary in results.values())]
+    width = max((len(name) for name in results), default=10)
+    print(f'{"":{width}}  ' + '  '.join(f'{column:>10}' for column in columns))
+    for name, summary in results.items():
+        print(f'{name:{width}}  ' + '  '.join(f'{summary.get(column, ""):>10}' for column in columns))
@@ -0,0 +1,36 @@
+"""
+Сравнение двух сохраненных прогонов одного вида:
+
+    python -m benchmarks.compare benchmarks/results/micro-default-A.json benchmarks/results/micro-default-B.json
+"""
+import argparse
+import json
+
+METRICS = ('rps', 'p50_ms', 'p95_ms', 'p99_ms', 'rows_per_sec', 'rows_per_call', 'peak_kib')
+
+
+def delta(before: float, after: float) -> str:
+    if not before:
+        return f'{after:>10}'
+    return f'{after:>10} ({(after - before) / before:+.1%})'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('before')
+    parser.add_argument('after')
+    args = parser.parse_args()
+
+    with open(args.before) as file:
+        before = json.load(file)
+    with open(args.after) as file:
+        after = json.load(file)
+    print(f'{before["revision"]} -> {after["revision"]}')
+    for name, summary in after['results'].items():
+        baseline = before['results'].get(name)
+        if baseline is None:
+            continue
+        print(name)
+        for metric in METRICS:
+            if metric in summary:
+                print(f'    {metric:<14}{baseline[metric]:>10} -> {delta(baseline[metric], summary[metric])}')
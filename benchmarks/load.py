@@ -0,0 +1,217 @@
+"""
+Нагрузочные сценарии против запущенного API (uvicorn/gunicorn с базой, засеянной benchmarks.seed).
+
+    python -m benchmarks.load --scenario browse --concurrency 32 --duration 30
+    python -m benchmarks.load --scenario all --base-url http://localhost:8000
+
+Задержки считаются по шаблону маршрута, результат печатается таблицей и сохраняется в benchmarks/results/*.json.
+Сценарий admin_burst дописывает к названиям блюд номер правки, поэтому не запускайте его на боевой базе.
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+import httpx
+
+from benchmarks.common import RESULTS_DIR, print_table, save_results, summarize
+
+MENUS = '/api/v1/menus'
+SUBMENUS = MENUS + '/{menu_id}/submenus'
+DISHES = SUBMENUS + '/{submenu_id}/dishes'
+
+
+@dataclass
+class Catalog:
+    menus: list[str] = field(default_factory=list)
+    submenus: list[tuple[str, str]] = field(default_factory=list)
+    dishes: list[tuple[str, str, dict]] = field(default_factory=list)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.recording = False
+
+    async def request(self, client: httpx.AsyncClient, method: str, route: str, **kwargs) -> httpx.Response | None:
+        """ route - шаблон пути: по нему группируются замеры, подставляются значения из kwargs['path'] """
+        url = route.format(**kwargs.pop('path', {}))
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        elapsed = time.perf_counter() - started
+        if self.recording:
+            label = f'{method} {route}'
+            if response is None or response.status_code >= 400:
+                self.errors[label] += 1
+            else:
+                self.latencies[label].append(elapsed)
+        return response
+
+    def summary(self, elapsed: float) -> dict[str, dict]:
+        labels = sorted(set(self.latencies) | set(self.errors))
+        return {label: summarize(self.latencies[label], elapsed, self.errors[label]) for label in labels}
+
+
+async def discover(client: httpx.AsyncClient, max_menus: int, max_submenus: int) -> Catalog:
+    """ Собирает id засеянного каталога через API, по курсорным страницам """
+    catalog = Catalog()
+
+    async def walk(url: str, limit: int) -> list[dict]:
+        items, cursor = [], None
+        while len(items) < limit:
+            params = {'limit': min(limit - len(items), 1000)} | ({'cursor': cursor} if cursor else {})
+            page = (await client.get(url, params=params)).raise_for_status().json()
+            items.extend(page['items'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        return items
+
+    for menu in await walk(f'{MENUS}/list', max_menus):
+        catalog.menus.append(menu['id'])
+        for submenu in await walk(SUBMENUS.format(menu_id=menu['id']) + '/list', max_submenus):
+            catalog.submenus.append((menu['id'], submenu['id']))
+    for menu_id, submenu_id in random.sample(catalog.submenus, min(len(catalog.submenus), 50)):
+        for dish in await walk(DISHES.format(menu_id=menu_id, submenu_id=submenu_id) + '/list', 100):
+            catalog.dishes.append((menu_id, submenu_id, dish))
+    if not catalog.dishes:
+        raise SystemExit('The catalog is empty: seed it with python -m benchmarks.seed --load')
+    return catalog
+
+
+async def browse_once(client: httpx.AsyncClient, catalog: Catalog, recorder: Recorder) -> None:
+    """ Типичный клиент: список меню, меню, его подменю и блюда """
+    menu_id, submenu_id, dish = random.choice(catalog.dishes)
+    ids = {'menu_id': menu_id, 'submenu_id': submenu_id, 'dish_id': dish['id']}
+    choice = random.random()
+    if choice < 0.2:
+        await recorder.request(client, 'GET', MENUS + '/list/{skip}/{limit}', path={'skip': 0, 'limit': 50})
+    elif choice < 0.35:
+        await recorder.request(client, 'GET', MENUS + '/{menu_id}', path=ids)
+    elif choice < 0.55:
+        await recorder.request(client, 'GET', SUBMENUS + '/list', path=ids, params={'limit': 100})
+    elif choice < 0.65:
+        await recorder.request(client, 'GET', SUBMENUS + '/{submenu_id}', path=ids)
+    elif choice < 0.85:
+        await recorder.request(client, 'GET', DISHES + '/list', path=ids, params={'limit': 100})
+    else:
+        await recorder.request(client, 'GET', DISHES + '/{dish_id}', path=ids)
+
+
+async def browse(worker: int, client: httpx.AsyncClient, catalog: Catalog, recorder: Recorder, deadline: float,
+                 options: argparse.Namespace) -> None:
+    while time.perf_counter() < deadline:
+        await browse_once(client, catalog, recorder)
+
+
+async def admin_burst(worker: int, client: httpx.AsyncClient, catalog: Catalog, recorder: Recorder, deadline: float,
+                      options: argparse.Namespace) -> None:
+    """ Нулевой воркер пачками правит блюда (каждая правка - clear_cache), остальные читают, как в browse:
+    видно, во что читателям обходятся инвалидации и повторное наполнение кэша
+    """
+    if worker != 0:
+        await browse(worker, client, catalog, recorder, deadline, options)
+        return
+    # у писателя свой клиент: cookie last_write иначе отправила бы чтения всех воркеров на primary
+    async with httpx.AsyncClient(base_url=client.base_url, timeout=client.timeout) as writer:
+        await write_bursts(writer, catalog, recorder, deadline, options)
+
+
+async def write_bursts(client: httpx.AsyncClient, catalog: Catalog, recorder: Recorder, deadline: float,
+                       options: argparse.Namespace) -> None:
+    revision = 0
+    while time.perf_counter() < deadline:
+        revision += 1
+        for menu_id, submenu_id, dish in random.sample(catalog.dishes, min(options.burst, len(catalog.dishes))):
+            title = dish['title'].split(' #')[0]
+            body = {'title': f'{title} #{revision}', 'description': dish['description'], 'price': str(dish['price'])}
+            await recorder.request(client, 'PATCH', DISHES + '/{dish_id}', json=body,
+                                   path={'menu_id': menu_id, 'submenu_id': submenu_id, 'dish_id': dish['id']})
+            dish['title'] = body['title']
+        await asyncio.sleep(options.pause)
+
+
+async def deep_pagination(worker: int, client: httpx.AsyncClient, catalog: Catalog, recorder: Recorder,
+                          deadline: float, options: argparse.Namespace) -> None:
+    """ Проход по всем страницам списков: курсорные страницы против OFFSET на той же глубине """
+    while time.perf_counter() < deadline:
+        menu_id, submenu_id = random.choice(catalog.submenus)
+        ids = {'menu_id': menu_id, 'submenu_id': submenu_id}
+        depth, cursor = 0, None
+        while time.perf_counter() < deadline:
+            params = {'limit': options.page_size} | ({'cursor': cursor} if cursor else {})
+            response = await recorder.request(client, 'GET', DISHES + '/list', path=ids, params=params)
+            if response is None or response.status_code != 200:
+                break
+            await recorder.request(client, 'GET', DISHES + '/list/{skip}/{limit}',
+                                   path=ids | {'skip': depth, 'limit': options.page_size})
+            depth += options.page_size
+            cursor = response.json()['next_cursor']
+            if cursor is None:
+                break
+        params = {'limit': options.page_size}
+        await recorder.request(client, 'GET', MENUS + '/list', params=params)
+
+
+SCENARIOS: dict[str, Callable[..., Awaitable[None]]] = {
+    'browse': browse,
+    'admin_burst': admin_burst,
+    'deep_pagination': deep_pagination,
+}
+
+
+async def run_scenario(name: str, catalog: Catalog, options: argparse.Namespace) -> dict[str, dict]:
+    recorder = Recorder()
+    scenario = SCENARIOS[name]
+    limits = httpx.Limits(max_connections=options.concurrency, max_keepalive_connections=options.concurrency)
+    async with httpx.AsyncClient(base_url=options.base_url, limits=limits, timeout=options.timeout) as client:
+        # прогрев наполняет кэши и пулы соединений, его замеры не учитываются
+        warmup_deadline = time.perf_counter() + options.warmup
+        await asyncio.gather(*(scenario(worker, client, catalog, recorder, warmup_deadline, options)
+                               for worker in range(options.concurrency)))
+        recorder.recording = True
+        started = time.perf_counter()
+        deadline = started + options.duration
+        await asyncio.gather(*(scenario(worker, client, catalog, recorder, deadline, options)
+                               for worker in range(options.concurrency)))
+        elapsed = time.perf_counter() - started
+    return recorder.summary(elapsed)
+
+
+async def main(options: argparse.Namespace) -> None:
+    random.seed(options.seed)
+    async with httpx.AsyncClient(base_url=options.base_url, timeout=options.timeout) as client:
+        catalog = await discover(client, options.max_menus, options.max_submenus)
+    names = list(SCENARIOS) if options.scenario == 'all' else [options.scenario]
+    for name in names:
+        results = await run_scenario(name, catalog, options)
+        print(f'\n{name}: {options.concurrency} workers, {options.duration}s')
+        print_table(results)
+        params = {key: value for key, value in vars(options).items() if key != 'output_dir'}
+        print('saved to', save_results('load', name, params, results, options.output_dir))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run load scenarios against a running API')
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--scenario', choices=(*SCENARIOS, 'all'), default='browse')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds of measured load per scenario')
+    parser.add_argument('--warmup', type=float, default=3.0)
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--max-menus', type=int, default=100, help='menus to discover ids from')
+    parser.add_argument('--max-submenus', type=int, default=20, help='submenus per menu to discover')
+    parser.add_argument('--burst', type=int, default=20, help='admin_burst: writes per burst')
+    parser.add_argument('--pause', type=float, default=1.0, help='admin_burst: seconds between bursts')
+    parser.add_argument('--page-size', type=int, default=50, help='deep_pagination: page size')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output-dir', default=RESULTS_DIR)
+    options = parser.parse_args()
+    asyncio.run(main(options))
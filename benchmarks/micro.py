@@ -0,0 +1,334 @@
+"""
+Микробенчмарки репозиториев и кэш-декораторов. Нужны база (засеянная benchmarks.seed) и Redis из .env.
+
+    python -m benchmarks.micro
+    python -m benchmarks.micro --only repo. --iterations 500 --rows 1000
+    python -m benchmarks.micro --only repo.dish.get_all orm.dish --rows 5000  # колонки против ORM-объектов
+    python -m benchmarks.micro --only json.  # без базы и Redis: сериализация дерева меню на 10k блюд
+    python -m benchmarks.micro --only rows.submenu --rows 100  # объем строк страницы подменю (seed --dishes 1000)
+
+Каждый вызов репозитория идет в новой сессии, как в запросе: в замер входит и выдача соединения из пула.
+Пиковая память считается tracemalloc'ом на отдельном вызове, чтобы трассировка не искажала задержки.
+"""
+import argparse
+import asyncio
+import fnmatch
+import time
+import tracemalloc
+import uuid
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+
+from benchmarks.common import RESULTS_DIR, print_table, save_results, summarize
+
+Operation = Callable[[], Awaitable[int]]
+
+
+@dataclass
+class Target:
+    """ Самые большие родители засеянного каталога: на них разница между реализациями заметнее всего """
+    menu_id: object
+    submenu_id: object
+    dish_id: object
+
+
+BENCHMARKS: dict[str, Callable[[Target, argparse.Namespace], Awaitable[Operation]]] = {}
+
+
+def benchmark(name: str):
+    """ Регистрирует фабрику операции. Операция возвращает число обработанных строк - из него считаются rows/sec """
+    def decorator(factory):
+        BENCHMARKS[name] = factory
+        return factory
+    return decorator
+
+
+def repository_call(entity: str, method: str, *args, **kwargs) -> Operation:
+    from source.api.factories.factory import RepositoryFactory
+    from source.db.database import session
+
+    async def operation() -> int:
+        async with session() as db:
+            repository = await RepositoryFactory.create(entity, db)
+            result = await getattr(repository, method)(*args, **kwargs)
+        return len(result) if isinstance(result, list) else 1
+    return operation
+
+
+@benchmark('repo.dish.get_all')
+async def dish_get_all(target: Target, options: argparse.Namespace) -> Operation:
+    return repository_call('dish', 'get_all', target.submenu_id, 0, options.rows)
+
+
+@benchmark('repo.dish.get_page')
+async def dish_get_page(target: Target, options: argparse.Namespace) -> Operation:
+    return repository_call('dish', 'get_page', target.submenu_id, options.rows)
+
+
+@benchmark('repo.dish.get')
+async def dish_get(target: Target, options: argparse.Namespace) -> Operation:
+    return repository_call('dish', 'get', target.dish_id)
+
+
+@benchmark('repo.submenu.get_all')
+async def submenu_get_all(target: Target, options: argparse.Namespace) -> Operation:
+    return repository_call('submenu', 'get_all', target.menu_id, 0, options.rows)
+
+
+@benchmark('repo.submenu.get')
+async def submenu_get(target: Target, options: argparse.Namespace) -> Operation:
+    return repository_call('submenu', 'get', target.submenu_id)
+
+
+@benchmark('repo.menu.get_page')
+async def menu_get_page(target: Target, options: argparse.Namespace) -> Operation:
+    return repository_call('menu', 'get_page', options.rows)
+
+
+def orm_call(load: Callable) -> Operation:
+    """ Прежний путь чтения через ORM-объекты - база для сравнения с колоночными запросами репозиториев """
+    from source.db.database import session
+
+    async def operation() -> int:
+        async with session() as db:
+            return len(await load(db))
+    return operation
+
+
+@benchmark('orm.dish.get_all')
+async def orm_dish_get_all(target: Target, options: argparse.Namespace) -> Operation:
+    from sqlalchemy import select
+
+    from source.db.models import Dish
+
+    async def load(db) -> list[dict]:
+        stmt = select(Dish).where(Dish.submenu_id == target.submenu_id).order_by(Dish.id).offset(0).limit(options.rows)
+        dishes = (await db.execute(stmt)).scalars().all()
+        return [{'id': dish.id, 'submenu_id': dish.submenu_id, 'title': dish.title, 'description': dish.description,
+                 'price': dish.price} for dish in dishes]
+    return orm_call(load)
+
+
+@benchmark('orm.submenu.get_all')
+async def orm_submenu_get_all(target: Target, options: argparse.Namespace) -> Operation:
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+
+    from source.db.models import Submenu
+
+    async def load(db) -> list[dict]:
+        stmt = select(Submenu).options(selectinload(Submenu.dishes)).where(
+            Submenu.menu_id == target.menu_id).order_by(Submenu.id).offset(0).limit(options.rows)
+        submenus = (await db.execute(stmt)).scalars().all()
+        return [{'id': submenu.id, 'title': submenu.title, 'description': submenu.description,
+                 'dishes': [{'id': dish.id, 'title': dish.title, 'description': dish.description, 'price': dish.price}
+                            for dish in submenu.dishes]} for submenu in submenus]
+    return orm_call(load)
+
+
+# Прежний SubMenuRepository.get_all: select(Submenu, Dish).outerjoin(Dish) с LIMIT по склеенным строкам, и каждую
+# строку еще размножали joined-связи Submenu.dishes и Submenu.menu -> Menu.submenus. Столько строк база за разумное
+# время не передаст, поэтому они считаются в ней самой, и это нижняя оценка: блюда соседних подменю не учтены.
+JOINED_SUBMENU_PAGE_ROWS = text('''
+    SELECT count(*)
+    FROM (
+        SELECT submenus.id, submenus.menu_id
+        FROM submenus
+        LEFT JOIN dishes ON dishes.submenu_id = submenus.id
+        WHERE submenus.menu_id = :menu_id
+        LIMIT :limit
+    ) AS page
+    LEFT JOIN dishes AS eager_dishes ON eager_dishes.submenu_id = page.id
+    LEFT JOIN submenus AS eager_submenus ON eager_submenus.menu_id = page.menu_id
+''')
+
+
+@benchmark('rows.submenu.get_all.joined')
+async def rows_submenu_joined(target: Target, options: argparse.Namespace) -> Operation:
+    from source.db.database import session
+
+    async def operation() -> int:
+        async with session() as db:
+            res = await db.execute(JOINED_SUBMENU_PAGE_ROWS, {'menu_id': target.menu_id, 'limit': options.rows})
+            return res.scalar_one()
+    return operation
+
+
+@benchmark('rows.submenu.get_all')
+async def rows_submenu_get_all(target: Target, options: argparse.Namespace) -> Operation:
+    from source.api.factories.factory import RepositoryFactory
+    from source.db.database import session
+
+    async def operation() -> int:
+        async with session() as db:
+            repository = await RepositoryFactory.create('submenu', db)
+            submenus = await repository.get_all(target.menu_id, 0, options.rows)
+        # страница подменю одним запросом и их блюда вторым: по строке на подменю и на блюдо
+        return len(submenus) + sum(len(submenu['dishes']) for submenu in submenus)
+    return operation
+
+
+def cached_list(prefix: str) -> Callable[..., Awaitable[JSONResponse]]:
+    from source.api.cache.decorators import cache_list_response
+
+    body = [{'id': str(i), 'title': f'Item {i}', 'description': 'Benchmark item'} for i in range(100)]
+
+    @cache_list_response(prefix)
+    async def get_all(self, skip: int, limit: int) -> JSONResponse:
+        return JSONResponse(content=body)
+    return get_all
+
+
+@benchmark('cache.list.local_hit')
+async def cache_local_hit(target: Target, options: argparse.Namespace) -> Operation:
+    from source.api.cache.cache import local_cache
+
+    # локальный кэш по умолчанию выключен (LOCAL_CACHE_ENABLED), для замера он включается на время прогона
+    local_cache.maxsize = max(local_cache.maxsize, 1024)
+    get_all = cached_list('bench_local')
+
+    async def operation() -> int:
+        await get_all(None, skip=0, limit=100)
+        return 1
+    return operation
+
+
+@benchmark('cache.list.redis_hit')
+async def cache_redis_hit(target: Target, options: argparse.Namespace) -> Operation:
+    from source.api.cache.cache import local_cache
+
+    get_all = cached_list('bench_redis')
+
+    async def operation() -> int:
+        local_cache.clear()
+        await get_all(None, skip=0, limit=100)
+        return 1
+    return operation
+
+
+@benchmark('cache.list.invalidate_and_fill')
+async def cache_fill(target: Target, options: argparse.Namespace) -> Operation:
+    from source.api.cache.cache import CacheInvalidation
+
+    get_all = cached_list('bench_fill')
+
+    async def operation() -> int:
+        await CacheInvalidation().lists('bench_fill').flush()
+        await get_all(None, skip=0, limit=100)
+        return 1
+    return operation
+
+
+def menu_tree(dishes: int, per_submenu: int = 100) -> dict:
+    """ Меню с dishes блюдами по per_submenu в подменю, с UUID и Decimal - как их отдает база """
+    return {
+        'id': uuid.uuid4(), 'title': 'Menu', 'description': 'Benchmark menu',
+        'submenus': [
+            {'id': uuid.uuid4(), 'title': f'Submenu {s}', 'description': 'Benchmark submenu',
+             'dishes': [{'id': uuid.uuid4(), 'title': f'Dish {s}.{d}', 'description': 'Benchmark dish',
+                         'price': Decimal(1000 + d) / 100} for d in range(per_submenu)]}
+            for s in range(max(dishes // per_submenu, 1))
+        ],
+    }
+
+
+def stringified(tree: dict) -> dict:
+    """ Дерево в том виде, в котором его раньше готовили репозитории для stdlib json: id и цены строками """
+    return {
+        'id': str(tree['id']), 'title': tree['title'], 'description': tree['description'],
+        'submenus': [
+            {'id': str(submenu['id']), 'title': submenu['title'], 'description': submenu['description'],
+             'dishes': [{'id': str(dish['id']), 'title': dish['title'], 'description': dish['description'],
+                         'price': str(dish['price'])} for dish in submenu['dishes']]}
+            for submenu in tree['submenus']
+        ],
+    }
+
+
+@benchmark('json.stdlib.menu_tree')
+async def json_stdlib(target: Target, options: argparse.Namespace) -> Operation:
+    tree = menu_tree(options.tree_dishes)
+
+    async def operation() -> int:
+        JSONResponse(content=stringified(tree))
+        return options.tree_dishes
+    return operation
+
+
+@benchmark('json.orjson.menu_tree')
+async def json_orjson(target: Target, options: argparse.Namespace) -> Operation:
+    from source.api.responses import ORJSONResponse
+
+    tree = menu_tree(options.tree_dishes)
+
+    async def operation() -> int:
+        ORJSONResponse(content=tree)
+        return options.tree_dishes
+    return operation
+
+
+async def find_target() -> Target:
+    from source.db.database import session
+
+    async with session() as db:
+        row = (await db.execute(text('''
+            SELECT s.menu_id, s.id AS submenu_id,
+                (SELECT d.id FROM dishes d WHERE d.submenu_id = s.id LIMIT 1) AS dish_id
+            FROM submenus s JOIN menus m ON m.id = s.menu_id
+            ORDER BY s.dishes_count DESC, m.submenus_count DESC
+            LIMIT 1
+        '''))).one_or_none()
+    if row is None or row.dish_id is None:
+        raise SystemExit('The catalog is empty: seed it with python -m benchmarks.seed --load')
+    return Target(row.menu_id, row.submenu_id, row.dish_id)
+
+
+async def measure(operation: Operation, iterations: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        await operation()
+    latencies, rows = [], 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        rows += await operation()
+        latencies.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    await operation()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    summary = summarize(latencies, elapsed)
+    summary['rows_per_sec'] = round(rows / elapsed, 1) if elapsed else 0.0
+    summary['rows_per_call'] = round(rows / iterations, 1) if iterations else 0.0
+    summary['peak_kib'] = round(peak / 1024, 1)
+    return summary
+
+
+async def main(options: argparse.Namespace) -> None:
+    names = [name for name in BENCHMARKS if any(fnmatch.fnmatch(name, f'{pattern}*') for pattern in options.only)]
+    target = await find_target() if any(name.startswith(('repo.', 'orm.', 'rows.')) for name in names) else None
+    results = {}
+    for name in names:
+        operation = await BENCHMARKS[name](target, options)
+        results[name] = await measure(operation, options.iterations, options.warmup)
+    print_table(results)
+    params = {key: value for key, value in vars(options).items() if key != 'output_dir'}
+    print('saved to', save_results('micro', options.name, params, results, options.output_dir))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Micro-benchmark repositories and cache decorators')
+    parser.add_argument('--only', nargs='*', default=[''], help='benchmark name prefixes, e.g. repo.dish cache.')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=500, help='page size for list methods')
+    parser.add_argument('--tree-dishes', type=int, default=10_000, help='dishes in the serialized menu tree')
+    parser.add_argument('--name', default='default', help='label of the run in the results file name')
+    parser.add_argument('--output-dir', default=RESULTS_DIR)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,79 @@
+"""
+Генератор тестового каталога: menus x submenus x dishes с детерминированными id
+(одинаковый --seed - одинаковый каталог).
+
+    python -m benchmarks.seed --menus 20 --submenus 10 --dishes 50 --output catalog.ndjson
+    python -m benchmarks.seed --menus 20 --submenus 10 --dishes 50 --load
+
+Файл в формате NDJSON загружается и через import_catalog.py или POST /api/v1/catalog/import.
+"""
+import argparse
+import asyncio
+import json
+import random
+import uuid
+from collections.abc import AsyncIterator, Iterator
+from decimal import Decimal
+
+from config import Settings
+
+
+def generate(menus: int, submenus: int, dishes: int, seed: int = 0) -> Iterator[dict]:
+    """ Записи каталога в порядке импорта: меню, за ним его подменю, за каждым подменю его блюда """
+    rnd = random.Random(seed)
+
+    def next_id() -> str:
+        return str(uuid.UUID(int=rnd.getrandbits(128), version=4))
+
+    for m in range(menus):
+        menu_id = next_id()
+        yield {'type': 'menu', 'id': menu_id, 'title': f'Menu {m}', 'description': f'Benchmark menu {m}'}
+        for s in range(submenus):
+            submenu_id = next_id()
+            yield {'type': 'submenu', 'id': submenu_id, 'menu_id': menu_id, 'title': f'Submenu {m}.{s}',
+                   'description': f'Benchmark submenu {m}.{s}'}
+            for d in range(dishes):
+                price = Decimal(rnd.randrange(100, 100000)) / 100
+                yield {'type': 'dish', 'id': next_id(), 'submenu_id': submenu_id, 'title': f'Dish {m}.{s}.{d}',
+                       'description': f'Benchmark dish {m}.{s}.{d}', 'price': str(price)}
+
+
+def write_ndjson(path: str, records: Iterator[dict]) -> int:
+    count = 0
+    with open(path, 'w') as file:
+        for record in records:
+            file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+async def load(records: Iterator[dict], chunk_size: int) -> dict[str, int]:
+    # импорт тянет за собой базу, поэтому модули подключаются только для --load
+    from source.db.database import session
+    from source.importer.loader import CatalogImporter
+
+    async def stream() -> AsyncIterator[dict]:
+        for record in records:
+            yield record
+
+    async with session() as db:
+        return await CatalogImporter(db, chunk_size=chunk_size).run(stream())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a benchmark catalog')
+    parser.add_argument('--menus', type=int, default=10)
+    parser.add_argument('--submenus', type=int, default=10, help='submenus per menu')
+    parser.add_argument('--dishes', type=int, default=50, help='dishes per submenu')
+    parser.add_argument('--seed', type=int, default=0)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--output', help='write NDJSON to this file')
+    target.add_argument('--load', action='store_true', help='import straight into the configured database')
+    parser.add_argument('--chunk-size', type=int, default=None, help='defaults to IMPORT_CHUNK_SIZE')
+    args = parser.parse_args()
+
+    records = generate(args.menus, args.submenus, args.dishes, args.seed)
+    if args.output:
+        print(f'{write_ndjson(args.output, records)} records written to {args.output}')
+    else:
+        print(asyncio.run(load(records, args.chunk_size or Settings().IMPORT_CHUNK_SIZE)))
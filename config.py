@@ -1,13 +1,5 @@
-from confluent_kafka import Producer
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
-kafka_producer_config = {
-    'bootstrap.servers': 'localhost:9092',
-    'group.id': 'mygroup',
-    'auto.offset.reset': 'earliest'
-}
-producer = Producer(kafka_producer_config)
-
 
 class Settings(BaseSettings):
     DB_NAME: str
@@ -22,6 +14,41 @@ class Settings(BaseSettings):
     TEST_DB_HOST: str
     TEST_DB_PORT: str
 
+    # Пул соединений на каждый воркер: DB_POOL_SIZE + DB_MAX_OVERFLOW, умноженное на число воркеров,
+    # должно укладываться в max_connections Postgres
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 5
+    DB_POOL_TIMEOUT: float = 10.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 500
+
+    # Реплики для чтения: полные URL через запятую (postgresql+asyncpg://...). Пусто - все читается с primary
+    DB_REPLICA_URLS: str = ''
+    TEST_DB_REPLICA_URLS: str = ''
+    # Сколько секунд после записи клиент читает с primary, чтобы увидеть свою запись несмотря на отставание реплик
+    READ_YOUR_WRITES_WINDOW: float = 5.0
+
+    KAFKA_BOOTSTRAP_SERVERS: str = 'localhost:9092'
+    KAFKA_LINGER_MS: int = 20
+    KAFKA_BATCH_SIZE: int = 131072
+    KAFKA_COMPRESSION_TYPE: str = 'lz4'
+
+    LOCAL_CACHE_ENABLED: bool = False
+    LOCAL_CACHE_MAXSIZE: int = 1024
+    LOCAL_CACHE_TTL: float = 5.0
+
+    OUTBOX_BATCH_SIZE: int = 500
+    OUTBOX_POLL_INTERVAL: float = 1.0
+    OUTBOX_REPORT_INTERVAL: float = 10.0
+
+    # Разбивка времени запроса в Server-Timing по заголовку X-Request-Timing; выключите, если API открыт наружу
+    SERVER_TIMING_ENABLED: bool = True
+
+    IMPORT_CHUNK_SIZE: int = 1000
+    IMPORT_QUEUE_SIZE: int = 4
+    IMPORT_REPORT_INTERVAL: float = 10.0
+
     model_config = SettingsConfigDict(env_file='.env')
 
     @property
@@ -32,6 +59,35 @@ class Settings(BaseSettings):
             f'{self.DB_PORT}/{self.DB_NAME}'
         )
 
+    @property
+    def get_db_engine_options(self) -> dict[str, int | float | bool | dict]:
+        return {
+            'pool_size': self.DB_POOL_SIZE,
+            'max_overflow': self.DB_MAX_OVERFLOW,
+            'pool_timeout': self.DB_POOL_TIMEOUT,
+            'pool_recycle': self.DB_POOL_RECYCLE,
+            'pool_pre_ping': self.DB_POOL_PRE_PING,
+            'connect_args': {'prepared_statement_cache_size': self.DB_STATEMENT_CACHE_SIZE},
+        }
+
+    @property
+    def get_kafka_producer_config(self) -> dict[str, str | int | bool]:
+        return {
+            'bootstrap.servers': self.KAFKA_BOOTSTRAP_SERVERS,
+            'linger.ms': self.KAFKA_LINGER_MS,
+            'batch.size': self.KAFKA_BATCH_SIZE,
+            'compression.type': self.KAFKA_COMPRESSION_TYPE,
+            'enable.idempotence': True,
+        }
+
+    @property
+    def get_db_replica_urls(self) -> list[str]:
+        return [url.strip() for url in self.DB_REPLICA_URLS.split(',') if url.strip()]
+
+    @property
+    def get_test_db_replica_urls(self) -> list[str]:
+        return [url.strip() for url in self.TEST_DB_REPLICA_URLS.split(',') if url.strip()]
+
     @property
     def get_test_db_url(self) -> str:
         return (
@@ -0,0 +1,62 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+from config import Settings
+from source.db.database import session
+from source.importer.loader import CatalogImporter, CatalogImportError
+from source.importer.parsers import parse, read_file
+
+
+class FileCheckpoint:
+    """ Количество сохраненных записей в файле рядом с каталогом: после сбоя следующий запуск продолжит с него """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path) as file:
+            return int(file.read().strip() or 0)
+
+    async def save(self, committed: int) -> None:
+        with open(f'{self.path}.tmp', 'w') as file:
+            file.write(str(committed))
+        os.replace(f'{self.path}.tmp', self.path)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+async def run(path: str, format: str, checkpoint: FileCheckpoint, chunk_size: int, queue_size: int,
+              report_interval: float) -> None:
+    async with session() as db:
+        importer = CatalogImporter(db, chunk_size=chunk_size, queue_size=queue_size, report_interval=report_interval)
+        await importer.run(parse(read_file(path), format), skip=checkpoint.load(), checkpoint=checkpoint.save)
+    checkpoint.clear()
+
+
+if __name__ == '__main__':
+    settings = Settings()
+    parser = argparse.ArgumentParser(description='Import an NDJSON or CSV catalog file')
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=('ndjson', 'csv'), default=None,
+                        help='defaults to the file extension')
+    parser.add_argument('--checkpoint', default=None, help='defaults to <path>.checkpoint')
+    parser.add_argument('--chunk-size', type=int, default=settings.IMPORT_CHUNK_SIZE)
+    parser.add_argument('--queue-size', type=int, default=settings.IMPORT_QUEUE_SIZE)
+    parser.add_argument('--report-interval', type=float, default=settings.IMPORT_REPORT_INTERVAL)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    format = args.format or ('csv' if args.path.endswith('.csv') else 'ndjson')
+    checkpoint = FileCheckpoint(args.checkpoint or f'{args.path}.checkpoint')
+    try:
+        asyncio.run(run(args.path, format, checkpoint, args.chunk_size, args.queue_size, args.report_interval))
+    except CatalogImportError as error:
+        logging.error('catalog import stopped at record %d: %s', error.checkpoint, error)
+        sys.exit(1)
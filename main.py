@@ -1,9 +1,39 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
 
-from source.api.routers import dishes, menus, submenus
+from config import Settings
+from source.api.cache.cache import listen_for_invalidations, local_cache
+from source.api.middlewares import (
+    ConditionalGetMiddleware,
+    ReadYourWritesMiddleware,
+    RequestStatsMiddleware,
+)
+from source.api.responses import ORJSONResponse
+from source.api.routers import catalog, dishes, menus, metrics, submenus
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Веб-воркеры в Kafka не пишут: события уходят через outbox, producer запускается только в relay.py
+    invalidations = asyncio.create_task(listen_for_invalidations()) if local_cache.maxsize else None
+    yield
+    if invalidations is not None:
+        invalidations.cancel()
+        with suppress(asyncio.CancelledError):
+            await invalidations
+
+
+settings = Settings()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+app.add_middleware(ReadYourWritesMiddleware, window=settings.READ_YOUR_WRITES_WINDOW)
+app.add_middleware(ConditionalGetMiddleware)
+app.add_middleware(RequestStatsMiddleware, server_timing=settings.SERVER_TIMING_ENABLED)
 
 app.include_router(menus.router)
 app.include_router(submenus.router)
 app.include_router(dishes.router)
+app.include_router(catalog.router)
+app.include_router(metrics.router)
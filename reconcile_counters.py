@@ -0,0 +1,9 @@
+import asyncio
+import logging
+
+from source.db.counters import reconcile_counters
+from source.db.database import session
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    asyncio.run(reconcile_counters(session))
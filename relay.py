@@ -0,0 +1,36 @@
+import argparse
+import asyncio
+import logging
+import signal
+
+from config import Settings
+from source.broker.producer import producer
+from source.db.database import session
+from source.outbox.relay import OutboxRelay
+
+
+async def run(batch_size: int, poll_interval: float, report_interval: float) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await producer.start()
+    relay = OutboxRelay(session, producer, batch_size=batch_size,
+                        poll_interval=poll_interval, report_interval=report_interval)
+    try:
+        await relay.run(stop)
+    finally:
+        await producer.stop()
+
+
+if __name__ == '__main__':
+    settings = Settings()
+    parser = argparse.ArgumentParser(description='Relay deferred_tasks outbox events to Kafka')
+    parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE)
+    parser.add_argument('--poll-interval', type=float, default=settings.OUTBOX_POLL_INTERVAL)
+    parser.add_argument('--report-interval', type=float, default=settings.OUTBOX_REPORT_INTERVAL)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    asyncio.run(run(args.batch_size, args.poll_interval, args.report_interval))
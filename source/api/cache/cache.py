@@ -1,46 +1,346 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+
 import redis.asyncio as redis
 
+from config import Settings
+from source.api.cache.local import LocalCache
+from source.metrics import Counter, Histogram
+from source.request_stats import record_cache, redis_call
+
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
 # redis_client = redis.StrictRedis(host='test_redis', port=6379)
 redis_client = redis.StrictRedis(host='localhost', port=6379)
 
+INVALIDATION_CHANNEL = 'cache:invalidation'
+local_cache = LocalCache(maxsize=settings.LOCAL_CACHE_MAXSIZE if settings.LOCAL_CACHE_ENABLED else 0,
+                         ttl=settings.LOCAL_CACHE_TTL)
+
+REDIS_ROUND_TRIPS = Counter('redis_round_trips_total', 'Round trips made by the cache layer', ('operation',))
+REDIS_LATENCY = Histogram('redis_round_trip_seconds', 'Duration of cache layer round trips to Redis', ('operation',))
+CACHE_LOOKUPS = Counter('cache_lookups_total', 'Cache lookups by tier and result (hit, stale, miss)',
+                        ('tier', 'result'))
+
+# Скрипты обращаются к ключам, вычисленным внутри, поэтому рассчитаны на одиночный Redis, а не на кластер
+_get_list_page = redis_client.register_script('''
+local generation = redis.call('GET', KEYS[1]) or '0'
+local key = ARGV[1] .. ':v' .. generation .. '_' .. ARGV[2]
+local entry = redis.call('HMGET', key, 'body', 'fresh_until', 'etag')
+return {key, entry[1], entry[2], entry[3], generation}
+''')
+
+# Поколения элементов и тегов растут при их инвалидации, как поколения семейств списков.
+# Наполнение кэша запоминает их до похода в БД и не сохраняет значение, если за это время они изменились
+# (иначе ответ, прочитанный до записи, лег бы в кэш после ее инвалидации и жил бы до ttl).
+# ARGV[5] - сколько секунд хранить поколение: оно нужно, только пока идут начатые до инвалидации наполнения.
+_invalidate = redis_client.register_script('''
+local generations, items = tonumber(ARGV[1]), tonumber(ARGV[2])
+for i = 1, generations do
+    redis.call('INCR', KEYS[i])
+end
+local doomed = {}
+for i = generations + 1, #KEYS do
+    redis.call('INCR', KEYS[i] .. ':generation')
+    redis.call('EXPIRE', KEYS[i] .. ':generation', ARGV[5])
+end
+for i = generations + 1, generations + items do
+    doomed[#doomed + 1] = KEYS[i]
+end
+for i = generations + items + 1, #KEYS do
+    for _, member in ipairs(redis.call('SMEMBERS', KEYS[i])) do
+        doomed[#doomed + 1] = member
+    end
+    doomed[#doomed + 1] = KEYS[i]
+end
+for i = 1, #doomed, 1000 do
+    redis.call('UNLINK', unpack(doomed, i, math.min(i + 999, #doomed)))
+end
+redis.call('PUBLISH', ARGV[3], ARGV[4])
+return #doomed
+''')
+
+# KEYS: ключ значения, его теги, затем ключи поколений из guard; ARGV: тело, ETag, fresh_until, время жизни
+# ('' - до инвалидации), число тегов, затем прочитанные до наполнения значения поколений.
+# UNLINK перед HSET убирает значение старого формата (строку), иначе HSET упал бы с WRONGTYPE.
+_store = redis_client.register_script('''
+local tags = tonumber(ARGV[5])
+for i = 1, #ARGV - 5 do
+    if (redis.call('GET', KEYS[1 + tags + i]) or '0') ~= ARGV[5 + i] then
+        return 0
+    end
+end
+redis.call('UNLINK', KEYS[1])
+redis.call('HSET', KEYS[1], 'body', ARGV[1], 'etag', ARGV[2], 'fresh_until', ARGV[3])
+if ARGV[4] ~= '' then
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+end
+for i = 2, 1 + tags do
+    redis.call('SADD', KEYS[i], KEYS[1])
+    if ARGV[4] ~= '' then
+        redis.call('EXPIRE', KEYS[i], ARGV[4])
+    end
+end
+return 1
+''')
+
+_release_fill_lock = redis_client.register_script('''
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+''')
+
+FILL_LOCK_TTL = 5.0
+# Поколения элементов и тегов живут с запасом дольше любого наполнения
+GENERATION_TTL = 3600
+
+# Ключ поколения -> значение, прочитанное до наполнения кэша
+Guard = dict[str, str]
+
+REPLICAS_ENABLED = bool(settings.get_db_replica_urls)
+_delayed_invalidations: set[asyncio.Task] = set()
+
+
+@contextmanager
+def round_trip(operation: str):
+    """ Учитывает round trip в Redis: в метриках процесса и в статистике текущего запроса """
+    REDIS_ROUND_TRIPS.inc(operation=operation)
+    started_at = time.perf_counter()
+    with redis_call():
+        yield
+    REDIS_LATENCY.observe(time.perf_counter() - started_at, operation=operation)
+
+
+def cache_lookup(tier: str, result: str) -> None:
+    CACHE_LOOKUPS.inc(tier=tier, result=result)
+    record_cache(f'{tier}-{result}')
+
+
+def make_etag(body: bytes) -> str:
+    """ Сильный ETag - хэш тела: одинаков во всех воркерах и меняется вместе с телом после инвалидации """
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _etag(body: bytes | None, etag: bytes | None) -> str | None:
+    # у значений, закэшированных до появления поля etag, он считается на лету
+    if body is None:
+        return None
+    return etag.decode('ascii') if etag else make_etag(body)
+
+
+def generation_key(key_list: str) -> str:
+    return f'{key_list}:generation'
+
+
+async def get_list_key(key_list: str, suffix: str) -> str:
+    """ Ключ страницы списка содержит номер поколения семейства key_list.
+    Увеличение поколения в clear_cache делает недостижимыми сразу все закэшированные страницы семейства.
+    """
+    with round_trip('get_list_key'):
+        generation = await redis_client.get(generation_key(key_list))
+    return f'{key_list}:v{int(generation or 0)}_{suffix}'
+
+
+class CacheInvalidation:
+    """ Накапливает инвалидации и применяет их за один round trip одним атомарным Lua-скриптом.
+    Тот же скрипт публикует инвалидацию в INVALIDATION_CHANNEL для локальных кэшей других воркеров.
+
+    Пример:
+        await CacheInvalidation().lists(MENU_LIST_CACHE_KEY).items(f'{MENU_ITEM_CACHE_KEY}_{menu_id}').flush()
+    """
+
+    def __init__(self):
+        self._lists: set[str] = set()
+        self._items: set[str] = set()
+        self._tags: set[str] = set()
+
+    def lists(self, *keys_list: str) -> 'CacheInvalidation':
+        self._lists.update(keys_list)
+        return self
+
+    def items(self, *keys_item: str | None) -> 'CacheInvalidation':
+        self._items.update(key for key in keys_item if key)
+        return self
+
+    def tags(self, *tags: str) -> 'CacheInvalidation':
+        self._tags.update(tags)
+        return self
+
+    async def flush(self) -> None:
+        if not (self._lists or self._items or self._tags):
+            return
+        lists, items, tags = sorted(self._lists), sorted(self._items), sorted(self._tags)
+        await _apply_invalidation(lists, items, tags)
+        if REPLICAS_ENABLED:
+            # Промах кэша в течение окна может прочитать еще не доехавшую до реплики версию и положить ее в кэш,
+            # поэтому по истечении READ_YOUR_WRITES_WINDOW инвалидация повторяется
+            task = asyncio.create_task(_delayed_invalidation(lists, items, tags))
+            _delayed_invalidations.add(task)
+            task.add_done_callback(_delayed_invalidations.discard)
+        self._lists.clear()
+        self._items.clear()
+        self._tags.clear()
+
 
-async def clear_cache(key_list: str, key_item: str | None = None, keys_sublist: list[str] | None = None, keys_subitem: list[str] | None = None) -> None:
-    """ Это функция очистки кэша. Благодаря ней мы можем забыть про использование ttl, и наши данные всегда будут актуальными.
+async def _apply_invalidation(lists: list[str], items: list[str], tags: list[str]) -> None:
+    # свой локальный кэш сбрасываем сразу, остальные воркеры узнают об инвалидации из канала
+    local_cache.invalidate(items=items, tags=[*lists, *tags])
+    message = json.dumps({'lists': lists, 'items': items, 'tags': tags})
+    with round_trip('invalidate'):
+        await _invalidate(keys=[*map(generation_key, lists), *items, *tags],
+                          args=[len(lists), len(items), INVALIDATION_CHANNEL, message, GENERATION_TTL])
+
+
+async def _delayed_invalidation(lists: list[str], items: list[str], tags: list[str]) -> None:
+    await asyncio.sleep(settings.READ_YOUR_WRITES_WINDOW)
+    try:
+        await _apply_invalidation(lists, items, tags)
+    except Exception:
+        logger.exception('Delayed cache invalidation failed')
+
+
+async def clear_cache(key_list: str, key_item: str | None = None, keys_sublist: list[str] | None = None,
+                      keys_subitem: list[str] | None = None, tags: list[str] | None = None) -> None:
+    """ Это функция очистки кэша. Благодаря ней наши данные всегда актуальны,
+    а ttl лишь страхует от пропущенной очистки.
     Основная сущность - сущность из которой мы вызываем эту функцию
-    Подсущности - сущности, данные которых мы должны удалить, в ходе удаления данных основной сущности, чтобы не потерять согласованность
+    Подсущности - сущности, данные которых мы должны удалить, в ходе удаления данных основной сущности,
+    чтобы не потерять согласованность
+    Стоимость очистки не зависит от количества закэшированных страниц: списки сбрасываются увеличением поколения,
+    а ключи элементов подсущностей удаляются по тегам (множествам ключей, собранным при кэшировании).
+    Вся очистка выполняется одним pipeline'ом, см. CacheInvalidation.
 
     Args:
         key_list (str): Ключ get_all эндпоинта основной сущности
         key_item (str | None, optional): Ключ get эндпоинта основной сущности. Defaults to None.
         keys_sublist (list[str] | None, optional): Список с ключами get_all эндпоинтов подсущностей. Defaults to None.
         keys_subitem (list[str] | None, optional): Список с ключами get эндпоинтов подсущностей. Defaults to None.
+        tags (list[str] | None, optional): Теги, все ключи которых нужно удалить. Defaults to None.
+    """
+    invalidation = CacheInvalidation().lists(key_list, *(keys_sublist or []))
+    invalidation.items(key_item, *(keys_subitem or [])).tags(*(tags or []))
+    await invalidation.flush()
+
+
+def _is_fresh(fresh_until: bytes | None) -> bool:
+    return not fresh_until or float(fresh_until) > time.time()
+
+
+def _is_wrong_type(result) -> bool:
+    return isinstance(result, redis.ResponseError) and str(result).startswith('WRONGTYPE')
+
+
+async def get_list_cache_data(key_list: str, suffix: str) -> tuple[str, bytes | None, str | None, bool, Guard]:
+    """ За один round trip читает поколение семейства и страницу.
+    Возвращает ключ страницы, ее содержимое, ETag, признак свежести (False - значение устарело,
+    но еще в окне stale_ttl) и прочитанное поколение для create_cache_data(guard=...).
+    """
+    with round_trip('get'):
+        key, cached_data, fresh_until, etag, generation = await _get_list_page(keys=[generation_key(key_list)],
+                                                                               args=[key_list, suffix])
+    guard = {generation_key(key_list): generation.decode('ascii')}
+    return key.decode('utf-8'), cached_data, _etag(cached_data, etag), _is_fresh(fresh_until), guard
+
+
+async def get_cache_entry(key: str, tags: list[str] | None = None) -> tuple[bytes | None, str | None, bool, Guard]:
+    """ Содержимое, ETag, признак свежести значения элемента и поколения его и его тегов - за один round trip.
+    Значение старого формата (строка, а не hash) считается промахом и удаляется.
     """
+    generation_keys = [generation_key(name) for name in [key, *(tags or [])]]
+    with round_trip('get'):
+        async with redis_client.pipeline(transaction=False) as pipe:
+            entry, generations = await pipe.hmget(key, 'body', 'fresh_until', 'etag').mget(
+                generation_keys).execute(raise_on_error=False)
+    guard = {name: (value or b'0').decode('ascii') for name, value in zip(generation_keys, generations)}
+    if _is_wrong_type(entry):
+        with round_trip('delete'):
+            await redis_client.unlink(key)
+        return None, None, True, guard
+    cached_data, fresh_until, etag = entry
+    return cached_data, _etag(cached_data, etag), _is_fresh(fresh_until), guard
 
-    keys = []
-    async for key in redis_client.scan_iter(f'{key_list}*'):
-        keys.append(key)
-    if keys:
-        await redis_client.unlink(*keys)
 
-    if key_item:
-        await redis_client.delete(key_item)
+async def get_cache_data(key: str) -> tuple[bytes | None, bool]:
+    cached_data, _, fresh, _ = await get_cache_entry(key)
+    return cached_data, fresh
+
+
+async def create_cache_data(key: str, object: bytes, tags: list[str] | None = None, ttl: int | None = None,
+                            stale_ttl: int = 0, etag: str | None = None, guard: Guard | None = None) -> bool:
+    """ Значение хранится ttl + stale_ttl секунд, из них последние stale_ttl оно считается устаревшим:
+    его еще можно отдать, но нужно пересобрать в фоне. Без ttl значение живет до инвалидации.
+    Рядом с телом хранится его ETag, чтобы не хэшировать тело на каждом попадании.
+
+    guard - поколения, прочитанные до похода в БД (get_cache_entry, get_list_cache_data). Если с тех пор
+    прошла инвалидация, значение могло устареть и не сохраняется. Возвращает, сохранено ли значение.
+    """
+    tags, guard = tags or [], guard or {}
+    fresh_until = time.time() + ttl if ttl is not None else ''
+    expire = ttl + stale_ttl if ttl is not None else ''
+    with round_trip('set'):
+        stored = await _store(keys=[key, *tags, *guard],
+                              args=[object, etag or make_etag(object), fresh_until, expire, len(tags), *guard.values()])
+    return bool(stored)
+
+
+async def listen_for_invalidations() -> None:
+    """ Фоновая задача воркера: применяет к локальному кэшу инвалидации, опубликованные другими воркерами.
+    После переподключения локальный кэш очищается целиком, так как сообщения за время разрыва потеряны.
+    """
+    while True:
+        try:
+            async with redis_client.pubsub() as pubsub:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                local_cache.clear()
+                async for message in pubsub.listen():
+                    if message['type'] != 'message':
+                        continue
+                    invalidation = json.loads(message['data'])
+                    local_cache.invalidate(items=invalidation['items'],
+                                           tags=[*invalidation['lists'], *invalidation['tags']])
+        except (redis.ConnectionError, redis.TimeoutError):
+            logger.warning('cache invalidation channel is unavailable, local cache is dropped')
+            local_cache.clear()
+            await asyncio.sleep(1)
 
-    if keys_sublist:
-        keys = []
-        for key_list_ in keys_sublist:
-            async for key in redis_client.scan_iter(f'{key_list_}*'):
-                keys.append(key)
-            if keys:
-                await redis_client.unlink(*keys)
 
-    if keys_subitem:
-        await redis_client.unlink(*keys_subitem)
+async def acquire_fill_lock(key: str) -> str | None:
+    """ Короткая блокировка на пересборку ключа: между воркерами в БД за значением идет только ее владелец """
+    token = uuid.uuid4().hex
+    with round_trip('lock'):
+        acquired = await redis_client.set(f'lock:{key}', token, nx=True, px=int(FILL_LOCK_TTL * 1000))
+    if acquired:
+        return token
+    return None
 
 
-async def get_cache_data(key: str) -> bytes | None:
-    cached_data = await redis_client.get(key)
-    return cached_data
+async def release_fill_lock(key: str, token: str) -> None:
+    with round_trip('lock'):
+        await _release_fill_lock(keys=[f'lock:{key}'], args=[token])
 
 
-async def create_cache_data(key: str, object: str) -> None:
-    await redis_client.set(key, object)
+async def wait_for_cache_data(key: str, timeout: float = FILL_LOCK_TTL) -> bytes | None:
+    """ Ждет, пока владелец блокировки положит значение в кэш. None - не дождались, значение нужно собрать самим. """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = 0.01
+    while loop.time() < deadline:
+        await asyncio.sleep(delay)
+        # значение кладется до снятия блокировки, поэтому EXISTS проверяется раньше GET
+        with round_trip('get'):
+            async with redis_client.pipeline(transaction=True) as pipe:
+                locked, cached_data = await pipe.exists(f'lock:{key}').hget(key, 'body').execute(raise_on_error=False)
+        if _is_wrong_type(cached_data):
+            cached_data = None
+        if cached_data or not locked:
+            return cached_data
+        delay = min(delay * 2, 0.2)
+    return None
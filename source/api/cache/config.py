@@ -1,9 +1,21 @@
 MENU_LIST_CACHE_KEY = 'menus:list'
 MENU_ITEM_CACHE_KEY = 'menu:item'
+MENU_TAG = 'tag:menu'
 
 SUBMENU_LIST_CACHE_KEY = 'submenus:list'
 SUBMENU_ITEM_CACHE_KEY = 'submenu:item'
+SUBMENU_TAG = 'tag:submenu'
 
 
 DISH_LIST_CACHE_KEY = 'dishes:list'
 DISH_ITEM_CACHE_KEY = 'dish:item'
+
+# Свежесть определяется инвалидацией, ttl лишь ограничивает жизнь значения при пропущенной очистке и память Redis
+LIST_CACHE_TTL = 300
+LIST_CACHE_STALE_TTL = 60
+ITEM_CACHE_TTL = 300
+ITEM_CACHE_STALE_TTL = 60
+
+# Клиенты и CDN могут хранить ответ, но перед каждым использованием переспрашивают с If-None-Match:
+# неизменившийся ответ - это 304 без тела, а запись в каталог видна сразу, без ожидания max-age
+HTTP_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
@@ -1,39 +1,193 @@
-import json
-from functools import wraps
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from functools import partial, wraps
 
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
-from source.api.cache.cache import create_cache_data, get_cache_data
+from source.api.cache.cache import (
+    Guard,
+    acquire_fill_lock,
+    cache_lookup,
+    create_cache_data,
+    get_cache_entry,
+    get_list_cache_data,
+    local_cache,
+    make_etag,
+    release_fill_lock,
+    wait_for_cache_data,
+)
+from source.api.cache.config import HTTP_CACHE_CONTROL
+from source.api.cache.singleflight import SingleFlight
+from source.db.database import READ_YOUR_WRITES
 
+logger = logging.getLogger(__name__)
 
-def cache_list_response(cache_key_prefix: str):
+flights = SingleFlight()
+_revalidations: set[asyncio.Task] = set()
+
+
+def cached_response(cache_data: bytes, etag: str | None = None, status_code: int = status.HTTP_200_OK) -> Response:
+    """ Закэшированное тело уже сериализовано, поэтому отдается как есть, без json.loads и повторного json.dumps.
+    ETag и Cache-Control позволяют клиентам и CDN переспрашивать с If-None-Match, см. ConditionalGetMiddleware
+    """
+    headers = None
+    if etag and status_code == status.HTTP_200_OK:
+        headers = {'ETag': etag, 'Cache-Control': HTTP_CACHE_CONTROL}
+    return Response(content=cache_data, status_code=status_code, media_type='application/json', headers=headers)
+
+
+async def fill_cache(cache_key: str, tags: list[str], local_key: str, local_tags: list[str], epoch: int,
+                     call: Callable[[], Awaitable[Response]], ttl: int | None, stale_ttl: int,
+                     guard: Guard) -> Response:
+    """ Промах кэша: одновременные запросы за одним ключом объединяются, и в БД идет ровно один из них.
+    Внутри воркера ожидающие разделяют future ведущего запроса, между воркерами - ждут снятия блокировки в Redis.
+    Если пока шло чтение из БД ключ был инвалидирован (сменилось поколение из guard), ответ отдается, но не кэшируется.
+    """
+    async def load() -> tuple[int, bytes, str | None]:
+        token = await acquire_fill_lock(cache_key)
+        if token is None:
+            cache_data = await wait_for_cache_data(cache_key)
+            if cache_data:
+                etag = make_etag(cache_data)
+                local_cache.set(local_key, (cache_data, etag), tags=local_tags, epoch=epoch)
+                return status.HTTP_200_OK, cache_data, etag
+        try:
+            response = await call()
+            etag = None
+            if response.status_code == status.HTTP_200_OK:
+                etag = make_etag(response.body)
+                if await create_cache_data(key=cache_key, object=response.body, tags=tags, ttl=ttl,
+                                           stale_ttl=stale_ttl, etag=etag, guard=guard):
+                    local_cache.set(local_key, (response.body, etag), tags=local_tags, epoch=epoch)
+            return response.status_code, response.body, etag
+        finally:
+            if token is not None:
+                await release_fill_lock(cache_key, token)
+
+    status_code, body, etag = await flights.do(cache_key, load)
+    return cached_response(body, etag, status_code)
+
+
+def bypasses_cache(service) -> bool:
+    """ Клиент недавно писал и читает с primary: кэш мог получить версию с отстающей реплики, см. ReadRouter """
+    db = getattr(service, 'db', None)
+    return db is not None and db.info.get(READ_YOUR_WRITES, False)
+
+
+def revalidate(cache_key: str, tags: list[str], rebuild: Callable[[AsyncSession], Awaitable[Response]],
+               session_factory: Callable[[], AsyncSession], ttl: int | None, stale_ttl: int, guard: Guard) -> None:
+    """ Устаревшее значение уже отдано клиенту, здесь оно пересобирается в фоне.
+    Сессия запроса к этому моменту может быть закрыта, поэтому rebuild получает новую сессию из session_factory.
+    Пересборкой занимается один воркер (блокировка в Redis) и одна задача в нем (SingleFlight).
+    Результат не сохраняется, если после чтения устаревшего значения ключ был инвалидирован (см. guard).
+    """
+    async def refresh() -> None:
+        token = await acquire_fill_lock(cache_key)
+        if token is None:
+            return
+        try:
+            async with session_factory() as db:
+                response = await rebuild(db)
+            if response.status_code == status.HTTP_200_OK:
+                await create_cache_data(key=cache_key, object=response.body, tags=tags, ttl=ttl, stale_ttl=stale_ttl,
+                                        guard=guard)
+        finally:
+            await release_fill_lock(cache_key, token)
+
+    refresh_key = f'{cache_key}:refresh'
+    if refresh_key in flights:
+        return
+    task = asyncio.create_task(flights.do(refresh_key, refresh))
+    _revalidations.add(task)
+    task.add_done_callback(_revalidation_done)
+
+
+def _revalidation_done(task: asyncio.Task) -> None:
+    _revalidations.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error('cache revalidation failed', exc_info=task.exception())
+
+
+def cache_list_response(cache_key_prefix: str, scope_kwargs: tuple[str, ...] = (),
+                        ttl: int | None = None, stale_ttl: int = 0):
+    """
+    Args:
+        cache_key_prefix (str): Префикс (семейство) ключей списка
+        scope_kwargs (tuple[str, ...], optional): Аргументы с id родителя, по которому отфильтрован список:
+            попадают в ключ, чтобы списки разных родителей не перемешивались. Defaults to ().
+        ttl (int | None, optional): Сколько секунд значение считается свежим. Defaults to None (до инвалидации).
+        stale_ttl (int, optional): Сколько секунд после ttl устаревшее значение еще отдается,
+            пока оно пересобирается в фоне. Defaults to 0.
+    """
     def decorator(func):
         @wraps(func)
-        async def wrapper(*args, **kwargs):
-            skip, limit = kwargs['skip'], kwargs['limit']
-            cache_key = f'{cache_key_prefix}_skip:{skip}_limit:{limit}'
-            cache_data = await get_cache_data(cache_key)
+        async def wrapper(self, *args, **kwargs):
+            if bypasses_cache(self):
+                return await func(self, *args, **kwargs)
+            if 'cursor' in kwargs:
+                suffix = f'cursor:{kwargs["cursor"]}_limit:{kwargs["limit"]}'
+            else:
+                suffix = f'skip:{kwargs["skip"]}_limit:{kwargs["limit"]}'
+            for kwarg in reversed(scope_kwargs):
+                suffix = f'{kwarg}:{kwargs[kwarg]}_{suffix}'
+            local_key = f'{cache_key_prefix}_{suffix}'
+            cached = local_cache.get(local_key)
+            if cached:
+                cache_lookup('local', 'hit')
+                return cached_response(*cached)
+            epoch = local_cache.epoch
+            cache_key, cache_data, etag, fresh, guard = await get_list_cache_data(cache_key_prefix, suffix)
+            cache_lookup('redis', 'miss' if not cache_data else 'hit' if fresh else 'stale')
             if cache_data:
-                return JSONResponse(content=json.loads(cache_data), status_code=status.HTTP_200_OK)
-            response = await func(*args, **kwargs)
-            content = response.body.decode('utf-8')
-            await create_cache_data(key=cache_key, object=content)
-            return response
+                if fresh:
+                    local_cache.set(local_key, (cache_data, etag), tags=[cache_key_prefix], epoch=epoch)
+                else:
+                    revalidate(cache_key, [], lambda db: func(type(self)(db), *args, **kwargs),
+                               partial(AsyncSession, bind=self.db.bind), ttl, stale_ttl, guard)
+                return cached_response(cache_data, etag)
+            return await fill_cache(cache_key, [], local_key, [cache_key_prefix], epoch,
+                                    lambda: func(self, *args, **kwargs), ttl, stale_ttl, guard)
         return wrapper
     return decorator
 
 
-def cache_item_response(cache_key_prefix: str):
+def cache_item_response(cache_key_prefix: str, key_kwarg: str, tag_kwargs: dict[str, str] | None = None,
+                        ttl: int | None = None, stale_ttl: int = 0):
+    """
+    Args:
+        cache_key_prefix (str): Префикс ключа элемента
+        key_kwarg (str): Аргумент с id элемента
+        tag_kwargs (dict[str, str] | None, optional): Аргументы с id родителей и префиксы их тегов:
+            при удалении родителя ключ элемента будет удален по тегу. Defaults to None.
+        ttl (int | None, optional): Сколько секунд значение считается свежим. Defaults to None (до инвалидации).
+        stale_ttl (int, optional): Сколько секунд после ttl устаревшее значение еще отдается,
+            пока оно пересобирается в фоне. Defaults to 0.
+    """
     def decorator(func):
         @wraps(func)
-        async def wrapper(*args, **kwargs):
-            cache_key = f'{cache_key_prefix}_{list(kwargs.values())[-1]}'
-            cache_data = await get_cache_data(cache_key)
+        async def wrapper(self, *args, **kwargs):
+            if bypasses_cache(self):
+                return await func(self, *args, **kwargs)
+            cache_key = f'{cache_key_prefix}_{kwargs[key_kwarg]}'
+            tags = [f'{tag}_{kwargs[kwarg]}' for kwarg, tag in (tag_kwargs or {}).items()]
+            cached = local_cache.get(cache_key)
+            if cached:
+                cache_lookup('local', 'hit')
+                return cached_response(*cached)
+            epoch = local_cache.epoch
+            cache_data, etag, fresh, guard = await get_cache_entry(cache_key, tags)
+            cache_lookup('redis', 'miss' if not cache_data else 'hit' if fresh else 'stale')
             if cache_data:
-                return JSONResponse(content=json.loads(cache_data), status_code=status.HTTP_200_OK)
-            response = await func(*args, **kwargs)
-            await create_cache_data(key=cache_key, object=response.body.decode('utf-8'))
-            return response
+                if fresh:
+                    local_cache.set(cache_key, (cache_data, etag), tags=tags, epoch=epoch)
+                else:
+                    revalidate(cache_key, tags, lambda db: func(type(self)(db), *args, **kwargs),
+                               partial(AsyncSession, bind=self.db.bind), ttl, stale_ttl, guard)
+                return cached_response(cache_data, etag)
+            return await fill_cache(cache_key, tags, cache_key, tags, epoch,
+                                    lambda: func(self, *args, **kwargs), ttl, stale_ttl, guard)
         return wrapper
     return decorator
@@ -0,0 +1,70 @@
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from typing import Any
+
+
+class LocalCache:
+    """ LRU-кэш воркера перед Redis с ограничением по размеру и ttl.
+
+    Значение - любой объект: декораторы кэша кладут тело ответа вместе с его ETag.
+    Записи можно привязать к тегам (семейство списка или тег родителя) и сбрасывать по ним, как в Redis.
+    epoch увеличивается при каждой инвалидации: значение, прочитанное из Redis до инвалидации, не попадет в кэш
+    после нее (set с устаревшим epoch игнорируется).
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 5.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.epoch = 0
+        self._data: OrderedDict[str, tuple[float, Any, tuple[str, ...]]] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Any | None:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value, _ = entry
+        if expires_at < time.monotonic():
+            self._pop(key)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, tags: Iterable[str] = (), epoch: int | None = None) -> None:
+        if self.maxsize <= 0 or (epoch is not None and epoch != self.epoch):
+            return
+        self._pop(key)
+        tags = tuple(tags)
+        self._data[key] = (time.monotonic() + self.ttl, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._data) > self.maxsize:
+            self._pop(next(iter(self._data)))
+
+    def invalidate(self, items: Iterable[str] = (), tags: Iterable[str] = ()) -> None:
+        self.epoch += 1
+        for key in items:
+            self._pop(key)
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                self._pop(key)
+
+    def clear(self) -> None:
+        self.epoch += 1
+        self._data.clear()
+        self._tags.clear()
+
+    def _pop(self, key: str) -> None:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
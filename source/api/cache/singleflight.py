@@ -0,0 +1,51 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+T = TypeVar('T')
+
+
+class _LeaderCancelled(Exception):
+    pass
+
+
+class SingleFlight:
+    """ Объединяет одновременные вызовы с одинаковым ключом внутри воркера: выполняется только первый,
+    остальные ждут его результат (или его исключение).
+    Отмена ведущего вызова (например, клиент отключился) ожидающим не передается: один из них становится ведущим.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        while (future := self._calls.get(key)) is not None:
+            try:
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await func()
+        except Exception as exc:
+            future.set_exception(exc)
+            # исключение получит ведущий вызов, ожидающих может и не быть
+            future.exception()
+            raise
+        except BaseException:
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
@@ -0,0 +1,121 @@
+import math
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from source.db.database import LAST_WRITE_COOKIE
+from source.metrics import Histogram
+from source.request_stats import RequestStats, current_request
+
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+TIMING_REQUEST_HEADER = b'x-request-timing'
+
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Time to the end of the response body',
+                            ('method', 'route', 'status'))
+
+
+class ReadYourWritesMiddleware:
+    """ После успешной записи ставит клиенту cookie с ее временем: пока она свежая, его чтения идут на primary """
+
+    def __init__(self, app: ASGIApp, window: float):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or scope['method'] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message) -> None:
+            if message['type'] == 'http.response.start' and message['status'] < 400:
+                headers = MutableHeaders(scope=message)
+                headers.append('set-cookie', f'{LAST_WRITE_COOKIE}={time.time():.3f}; '
+                                             f'Max-Age={math.ceil(self.window)}; Path=/; HttpOnly; SameSite=Lax')
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+class RequestStatsMiddleware:
+    """ Гистограмма длительности запросов по шаблону маршрута и статистика запроса (БД, Redis, кэш).
+    Клиент, приславший заголовок X-Request-Timing, получает ее в Server-Timing (если server_timing включен).
+    Server-Timing уходит вместе с заголовками ответа, поэтому у стриминговых ответов он покрывает только начало.
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = True):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = current_request.set(stats)
+        wants_timing = self.server_timing and any(name == TIMING_REQUEST_HEADER for name, _ in scope['headers'])
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                if wants_timing:
+                    MutableHeaders(scope=message).append('server-timing', stats.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request.reset(token)
+            # маршрут известен только после роутинга; шаблон пути вместо самого пути держит число меток конечным
+            route = getattr(scope.get('route'), 'path', 'unmatched')
+            REQUEST_LATENCY.observe(time.perf_counter() - stats.started_at, method=scope['method'], route=route,
+                                    status=str(status_code))
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match сравнивается слабо (RFC 9110, 13.1.2): W/"x" совпадает с "x"
+    if if_none_match.strip() == '*':
+        return True
+    candidates = (candidate.strip() for candidate in if_none_match.split(','))
+    return etag.removeprefix('W/') in (candidate.removeprefix('W/') for candidate in candidates)
+
+
+class ConditionalGetMiddleware:
+    """ Отвечает 304 Not Modified без тела на GET с If-None-Match, совпавшим с ETag ответа.
+    ETag ставят декораторы кэша, поэтому совпадение проверяется для ответа, собранного из кэша без похода в Postgres:
+    экономится передача тела клиенту, а не работа воркера по чтению кэша.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or scope['method'] != 'GET':
+            await self.app(scope, receive, send)
+            return
+        if_none_match = next((value.decode('latin-1') for name, value in scope['headers'] if name == b'if-none-match'),
+                             None)
+        if if_none_match is None:
+            await self.app(scope, receive, send)
+            return
+        not_modified = False
+
+        async def send_conditional(message: Message) -> None:
+            nonlocal not_modified
+            if message['type'] == 'http.response.start':
+                headers = MutableHeaders(scope=message)
+                etag = headers.get('etag')
+                if message['status'] == 200 and etag and _etag_matches(if_none_match, etag):
+                    not_modified = True
+                    del headers['content-length']
+                    del headers['content-type']
+                    await send({'type': 'http.response.start', 'status': 304, 'headers': headers.raw})
+                    await send({'type': 'http.response.body', 'body': b''})
+                    return
+            elif not_modified:
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_conditional)
@@ -0,0 +1,36 @@
+from collections.abc import AsyncIterator
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from source.api.responses import dumps
+from source.db.models import Dish, Menu, Submenu
+
+EXPORT_CHUNK_SIZE = 1000
+
+# Родители выгружаются раньше детей: сначала все меню, потом подменю, потом блюда. На этот порядок опирается импорт.
+# Выбираются только колонки, без ORM-объектов, чтобы память не зависела от размера каталога.
+EXPORT_QUERIES = (
+    ('menu', select(Menu.id, Menu.title, Menu.description).order_by(Menu.id)),
+    ('submenu', select(Submenu.id, Submenu.menu_id, Submenu.title, Submenu.description).order_by(Submenu.id)),
+    ('dish', select(Dish.id, Dish.submenu_id, Dish.title, Dish.description, Dish.price).order_by(Dish.id)),
+)
+
+
+def to_ndjson(entity: str, row) -> bytes:
+    """ Одна строка NDJSON: {"type":"dish","id":...,...}. id и цены пишутся строками """
+    return dumps({'type': entity, **row}) + b'\n'
+
+
+class CatalogRepository:
+    """ Выгрузка всего каталога. Не наследует BaseRepository: у каталога нет своей модели и CRUD-операций """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def export(self, chunk_size: int = EXPORT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """ Читает таблицы серверным курсором и отдает NDJSON пачками по chunk_size строк """
+        for entity, stmt in EXPORT_QUERIES:
+            result = await self.db.stream(stmt.execution_options(yield_per=chunk_size))
+            async for rows in result.mappings().partitions():
+                yield b''.join(to_ndjson(entity, row) for row in rows)
@@ -0,0 +1,15 @@
+from source.db.models import Dish, Submenu
+
+# Что читают запросы списков и карточек. Читаются колонки, а не ORM-объекты: строки не попадают в identity map
+# и unit of work, не нужен .unique() - строка сразу становится dict'ом ответа.
+# Модели объявлены с lazy='raise', поэтому связи нельзя подгрузить случайно, скрытыми запросами при обращении.
+# Порядок колонок - порядок ключей в ответе.
+
+DISH_COLUMNS = (Dish.id, Dish.submenu_id, Dish.title, Dish.description, Dish.price)
+DISH_ITEM_COLUMNS = (Dish.id, Dish.title, Dish.description, Dish.price)
+
+SUBMENU_COLUMNS = (Submenu.id, Submenu.title, Submenu.description)
+SUBMENU_ITEM_COLUMNS = (Submenu.id, Submenu.title, Submenu.description, Submenu.dishes_count)
+# Блюда подменю страницы: второй запрос SELECT ... FROM dishes WHERE submenu_id IN (...);
+# submenu_id нужен только для раскладки по подменю и в ответ не попадает
+SUBMENU_DISH_COLUMNS = (Dish.submenu_id, Dish.id, Dish.title, Dish.description, Dish.price)
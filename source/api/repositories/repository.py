@@ -1,15 +1,37 @@
-import json
 from decimal import Decimal
 from uuid import UUID
 
-from easy_profile import SessionProfiler
-from sqlalchemy import delete, func, insert, select, text, update
+from sqlalchemy import select, text
 
-from config import producer
 from source.api.repositories.interfaces import BaseRepository
+from source.api.repositories.loading import (
+    DISH_COLUMNS,
+    DISH_ITEM_COLUMNS,
+    SUBMENU_COLUMNS,
+    SUBMENU_DISH_COLUMNS,
+    SUBMENU_ITEM_COLUMNS,
+)
 from source.db.models import Dish, Menu, Submenu
-
-profiler = SessionProfiler()
+from source.db.snapshots import MENU_DOCUMENT, SNAPSHOT_READS
+
+# Страница меню читается из menu_snapshots. Если снимка нет или его версия отстала от menus.version
+# (релей еще не обработал событие), документ собирается на лету - ответ никогда не бывает устаревшим.
+MENU_DOCUMENTS = '''
+    SELECT
+        COALESCE(menu_snapshots.document, fresh.document) AS document,
+        menu_snapshots.menu_id IS NOT NULL AS from_snapshot
+    FROM (
+        SELECT menus.id, menus.title, menus.description, menus.version
+        FROM menus
+        {{page}}
+    ) AS menus
+    LEFT JOIN menu_snapshots ON menu_snapshots.menu_id = menus.id AND menu_snapshots.version = menus.version
+    LEFT JOIN LATERAL (
+        SELECT {document} AS document
+        WHERE menu_snapshots.menu_id IS NULL
+    ) AS fresh ON true
+    ORDER BY menus.id
+'''.format(document=MENU_DOCUMENT)
 
 
 class MenuRepository(BaseRepository):
@@ -17,70 +39,35 @@ class MenuRepository(BaseRepository):
     model = Menu
 
     async def get_all(self, skip: int, limit: int) -> list[dict[str, str]]:
-
-        res = await self.db.execute(text('''
-            SELECT
-                cast(menus.id as text) AS menu_id,
-                menus.title AS menu_title,
-                menus.description AS menu_description,
-                COALESCE(
-                    JSON_AGG(
-                        JSON_BUILD_OBJECT(
-                            'submenu_id', cast(submenus.id as text),
-                            'submenu_title', submenus.title,
-                            'dishes', COALESCE(submenus_dishes.dishes, '[]'::json)
-                        )
-                    ) FILTER (WHERE submenus.id IS NOT NULL),
-                    '[]'::json
-                ) AS submenus
-            FROM menus
-            LEFT JOIN submenus ON menus.id = submenus.menu_id
-            LEFT JOIN (
-                SELECT
-                    dishes.submenu_id,
-                    JSON_AGG(
-                        JSON_BUILD_OBJECT(
-                            'dish_id', cast(dishes.id as text),
-                            'dish_title', dishes.title,
-                            'dish_price', dishes.price
-                        )
-                    ) AS dishes
-                FROM dishes
-                GROUP BY dishes.submenu_id
-            ) AS submenus_dishes ON submenus.id = submenus_dishes.submenu_id
-            GROUP BY menus.id
-            ORDER BY menus.id
-            LIMIT :limit
-            OFFSET :skip;
-            '''), {'limit': limit, 'skip': skip})
-
-        rows = res.mappings().all()
-        return [
-            {
-                'id': row.menu_id,
-                'title': row.menu_title,
-                'description': row.menu_description,
-                'submenus': row.submenus
-            }
-            for row in rows
-        ]
+        res = await self.db.execute(text(MENU_DOCUMENTS.format(page='ORDER BY menus.id LIMIT :limit OFFSET :skip')),
+                                    {'limit': limit, 'skip': skip})
+        return self._documents(res.mappings().all())
+
+    async def get_page(self, limit: int, after: UUID | None = None) -> list[dict[str, str]]:
+        where = 'WHERE menus.id > :after' if after else ''
+        res = await self.db.execute(text(MENU_DOCUMENTS.format(page=f'{where} ORDER BY menus.id LIMIT :limit')),
+                                    {'limit': limit + 1, 'after': after})
+        return self._documents(res.mappings().all())
+
+    @staticmethod
+    def _documents(rows) -> list[dict[str, str]]:
+        hits = sum(row.from_snapshot for row in rows)
+        SNAPSHOT_READS.inc(hits, result='hit')
+        SNAPSHOT_READS.inc(len(rows) - hits, result='miss')
+        return [row.document for row in rows]
 
     async def get(self, menu_id: UUID) -> dict[str, str | int] | None:
 
         res = await self.db.execute(text(
             '''
-            select menus.id, menus.description, menus.title, count(distinct submenus.id) as submenus_count, count(distinct dishes.id) as dishes_count from menus
-            LEFT JOIN submenus ON menus.id = submenus.menu_id
-            LEFT JOIN dishes ON submenus.id = dishes.submenu_id
-            where menus.id = :id
-            group by menus.id
-            ORDER BY menus.id'''
+            select menus.id, menus.description, menus.title, menus.submenus_count, menus.dishes_count from menus
+            where menus.id = :id'''
         ), {'id': menu_id})
         menu_data = res.mappings().fetchone()
 
         if menu_data:
             return {
-                'id': str(menu_data.id),
+                'id': menu_data.id,
                 'title': menu_data.title,
                 'description': menu_data.description,
                 'submenus_count': menu_data.submenus_count,
@@ -107,7 +94,7 @@ class MenuRepository(BaseRepository):
         async with self.db.begin():
             res = await self.db.execute(stmt, {'title': title, 'description': description})
         new_menu_id = res.mappings().fetchone()['menu_id']
-        return {'id': str(new_menu_id), 'title': title, 'description': description}
+        return {'id': new_menu_id, 'title': title, 'description': description}
 
     async def update(self, id: UUID, title: str | None, description: str | None) -> dict[str, str] | None:
         stmt = text('''
@@ -115,7 +102,8 @@ class MenuRepository(BaseRepository):
         UPDATE menus
         SET
             title = :title,
-            description = :description
+            description = :description,
+            version = version + 1
         WHERE id = :id
         RETURNING id, title, description
         )
@@ -162,143 +150,679 @@ class MenuRepository(BaseRepository):
 
         return {'id': deleted_values['menu_id'], 'title': deleted_values['title'], 'description': deleted_values['description']}
 
+    async def import_many(self, menus: list[dict[str, str | UUID]]) -> dict[str, int]:
+        """ Вставка меню с заданными id. Уже существующие id пропускаются, поэтому пачку можно повторить.
+
+        Returns:
+            dict[str, int]: Сколько строк вставлено. Родителей у меню нет, поэтому чужие счетчики не меняются
+        """
+        stmt = text('''
+        WITH input AS (
+            SELECT * FROM unnest(CAST(:ids AS uuid[]), CAST(:titles AS text[]), CAST(:descriptions AS text[]))
+                AS input(id, title, description)
+        ), new_menus AS (
+            INSERT INTO menus (id, title, description)
+            SELECT id, title, description FROM input
+            ON CONFLICT (id) DO NOTHING
+            RETURNING id, title, description
+        ), event AS (
+            INSERT INTO deferred_tasks (topic, key, value, created_at)
+            SELECT
+                'menu_topic' AS topic,
+                new_menus.id AS key,
+                json_build_object('action', 'create', 'menu_id', new_menus.id,
+                                  'title', new_menus.title, 'description', new_menus.description) AS value,
+                now() AS created_at
+            FROM new_menus
+        )
+        SELECT count(*) AS imported FROM new_menus
+        ''')
+        async with self.db.begin():
+            res = await self.db.execute(stmt, {'ids': [menu['id'] for menu in menus],
+                                               'titles': [menu['title'] for menu in menus],
+                                               'descriptions': [menu['description'] for menu in menus]})
+        return {'imported': res.scalar_one()}
+
 
 class SubMenuRepository(BaseRepository):
 
     model = Submenu
 
-    async def get_all(self, skip: int, limit: int) -> list[dict[str, str]]:
-        stmt = select(self.model, Dish).outerjoin(Dish, self.model.id ==
-                                                  Dish.submenu_id).order_by(self.model.id).offset(skip).limit(limit)
+    async def get_all(self, menu_id: UUID, skip: int, limit: int) -> list[dict[str, str]]:
+        stmt = select(*SUBMENU_COLUMNS).where(
+            self.model.menu_id == menu_id).order_by(self.model.id).offset(skip).limit(limit)
+        return await self._with_dishes(stmt)
+
+    async def get_page(self, menu_id: UUID, limit: int, after: UUID | None = None) -> list[dict[str, str]]:
+        stmt = select(*SUBMENU_COLUMNS).where(self.model.menu_id == menu_id).order_by(self.model.id).limit(limit + 1)
+        if after:
+            stmt = stmt.where(self.model.id > after)
+        return await self._with_dishes(stmt)
+
+    async def _with_dishes(self, stmt) -> list[dict[str, str]]:
+        """ Страница подменю и их блюда двумя запросами по колонкам, блюда раскладываются по подменю здесь """
         res = await self.db.execute(stmt)
-        submenu_rows = res.scalars().unique().all()
-
-        return [
-            {
-                'id': str(submenu.id),
-                'title': submenu.title,
-                'description': submenu.description,
-                'dishes': [
-                    {
-                        'id': str(dish.id),
-                        'title': dish.title,
-                        'description': dish.description,
-                        'price': str(dish.price)
-                    } for dish in submenu.dishes
-                ]
-            } for submenu in submenu_rows
-        ]
+        submenus = [dict(row, dishes=[]) for row in res.mappings()]
+        if not submenus:
+            return submenus
+        by_id = {submenu['id']: submenu['dishes'] for submenu in submenus}
+        res = await self.db.execute(
+            select(*SUBMENU_DISH_COLUMNS).where(Dish.submenu_id.in_(list(by_id))).order_by(Dish.submenu_id, Dish.id))
+        for submenu_id, *dish in res.tuples():
+            by_id[submenu_id].append(dict(zip(('id', 'title', 'description', 'price'), dish)))
+        return submenus
 
     async def get(self, id: UUID) -> dict[str, str | int] | None:
-        stmt = select(self.model, func.count(Dish.id)).where(self.model.id == id).outerjoin(
-            Dish, id == Dish.submenu_id).group_by(self.model.id)
-        _ = await self.db.execute(stmt)
-        res = _.unique().fetchall()
-
-        if res:
-            submenu, dishes_count = res[0]
-            return {
-                'id': str(id),
-                'title': submenu.title,
-                'description': submenu.description,
-                'dishes_count': dishes_count
-            }
+        res = await self.db.execute(select(*SUBMENU_ITEM_COLUMNS).where(self.model.id == id))
+        submenu = res.mappings().one_or_none()
+        if submenu:
+            return dict(submenu)
 
     async def create(self, title: str, description: str, menu_id: UUID) -> dict[str, str]:
+        stmt = text('''
+        WITH new_submenu AS (
+            INSERT INTO submenus (title, description, menu_id)
+            VALUES (:title, :description, :menu_id)
+            RETURNING id, title, description, menu_id
+        ), event AS (
+            INSERT INTO deferred_tasks (topic, key, value, created_at)
+            SELECT
+                'submenu_topic' AS topic,
+                new_submenu.id AS key,
+                json_build_object(
+                    'action', 'create',
+                    'submenu_id', new_submenu.id,
+                    'menu_id', new_submenu.menu_id,
+                    'title', new_submenu.title,
+                    'description', new_submenu.description
+                ) AS value,
+                now() AS created_at
+            FROM new_submenu
+        ), counters AS (
+            UPDATE menus
+            SET submenus_count = menus.submenus_count + 1, version = menus.version + 1
+            FROM new_submenu
+            WHERE menus.id = new_submenu.menu_id
+        )
+        SELECT cast(id as text) AS id, title, description FROM new_submenu
+        ''')
         async with self.db.begin():
-            stmt = insert(self.model).values(title=title, description=description,
-                                             menu_id=menu_id).returning(self.model.id)
-            res = await self.db.execute(stmt)
-            new_submenu_id = str(res.scalar_one())
-            producer.produce('submenu_topic', key=new_submenu_id, value=json.dumps(
-                {'id': new_submenu_id, 'title': title, 'description': description}).encode('utf-8'))
-        return {'id': new_submenu_id, 'title': title, 'description': description}
+            res = await self.db.execute(stmt, {'title': title, 'description': description, 'menu_id': menu_id})
+        new_submenu = res.mappings().fetchone()
+        return {'id': new_submenu['id'], 'title': new_submenu['title'], 'description': new_submenu['description']}
 
     async def update(self, title: str | None, description: str | None, id: UUID) -> dict[str, str] | None:
+        stmt = text('''
+        WITH updated_submenu AS (
+            UPDATE submenus
+            SET
+                title = COALESCE(:title, title),
+                description = COALESCE(:description, description)
+            WHERE id = :id
+            RETURNING id, title, description, menu_id
+        ), event AS (
+            INSERT INTO deferred_tasks (topic, key, value, created_at)
+            SELECT
+                'submenu_topic' AS topic,
+                updated_submenu.id AS key,
+                json_build_object(
+                    'action', 'update',
+                    'submenu_id', updated_submenu.id,
+                    'menu_id', updated_submenu.menu_id,
+                    'title', updated_submenu.title,
+                    'description', updated_submenu.description
+                ) AS value,
+                now() AS created_at
+            FROM updated_submenu
+        ), menu_version AS (
+            UPDATE menus
+            SET version = menus.version + 1
+            FROM updated_submenu
+            WHERE menus.id = updated_submenu.menu_id
+        )
+        SELECT cast(id as text) AS id, title, description FROM updated_submenu
+        ''')
         async with self.db.begin():
-            values = {}
-            if title:
-                values['title'] = title
-            if description:
-                values['description'] = description
-            if values:
-                stmt = update(self.model).where(self.model.id == id).values(
-                    **values).returning(self.model.title, self.model.description)
-                res = await self.db.execute(stmt)
-                updated_values = res.fetchone()
-            producer.produce('submenu_topic', key=str(id), value=json.dumps(
-                {'id': str(id), 'title': updated_values.title, 'description': updated_values.description}).encode('utf-8'))
-        return {'id': str(id), 'title': updated_values.title, 'description': updated_values.description}
+            res = await self.db.execute(stmt, {'id': id, 'title': title or None, 'description': description or None})
+        updated_values = res.mappings().fetchone()
+
+        if updated_values:
+            return {'id': updated_values['id'], 'title': updated_values['title'],
+                    'description': updated_values['description']}
 
     async def delete(self, id: UUID) -> dict[str, str] | None:
+        stmt = text('''
+        WITH deleted_submenu AS (
+            DELETE FROM submenus WHERE id = :id RETURNING id, title, description, menu_id, dishes_count
+        ), event AS (
+            INSERT INTO deferred_tasks (topic, key, value, created_at)
+            SELECT
+                'submenu_topic' AS topic,
+                deleted_submenu.id AS key,
+                json_build_object(
+                    'action', 'delete',
+                    'submenu_id', deleted_submenu.id,
+                    'menu_id', deleted_submenu.menu_id,
+                    'title', deleted_submenu.title,
+                    'description', deleted_submenu.description
+                ) AS value,
+                now() AS created_at
+            FROM deleted_submenu
+        ), counters AS (
+            UPDATE menus
+            SET
+                submenus_count = menus.submenus_count - 1,
+                dishes_count = menus.dishes_count - deleted_submenu.dishes_count,
+                version = menus.version + 1
+            FROM deleted_submenu
+            WHERE menus.id = deleted_submenu.menu_id
+        )
+        SELECT cast(id as text) AS id, title, description FROM deleted_submenu
+        ''')
+        async with self.db.begin():
+            res = await self.db.execute(stmt, {'id': id})
+        deleted_values = res.mappings().fetchone()
+
+        if deleted_values:
+            return {'id': deleted_values['id'], 'title': deleted_values['title'],
+                    'description': deleted_values['description']}
+
+    async def create_many(self, menu_id: UUID, submenus: list[dict[str, str]]) -> list[dict[str, str]]:
+        stmt = text('''
+        WITH input AS (
+            SELECT * FROM unnest(CAST(:titles AS text[]), CAST(:descriptions AS text[])) AS input(title, description)
+        ), new_submenus AS (
+            INSERT INTO submenus (title, description, menu_id)
+            SELECT title, description, CAST(:menu_id AS uuid) FROM input
+            RETURNING id, title, description, menu_id
+        ), event AS (
+            INSERT INTO deferred_tasks (topic, key, value, created_at)
+            SELECT
+                'submenu_topic' AS topic,
+                new_submenus.id AS key,
+                json_build_object(
+                    'action', 'create',
+                    'submenu_id', new_submenus.id,
+                    'menu_id', new_submenus.menu_id,
+                    'title', new_submenus.title,
+                    'description', new_submenus.description
+                ) AS value,
+                now() AS created_at
+            FROM new_submenus
+        ), counters AS (
+            UPDATE menus
+            SET submenus_count = menus.submenus_count + (SELECT count(*) FROM new_submenus), version = menus.version + 1
+            WHERE menus.id = :menu_id AND EXISTS (SELECT 1 FROM new_submenus)
+        )
+        SELECT cast(id as text) AS id, title, description FROM new_submenus
+        ''')
+        async with self.db.begin():
+            res = await self.db.execute(stmt, {'menu_id': menu_id,
+                                               'titles': [submenu['title'] for submenu in submenus],
+                                               'descriptions': [submenu['description'] for submenu in submenus]})
+        return [dict(row) for row in res.mappings().all()]
+
+    async def update_many(self, menu_id: UUID, submenus: list[dict[str, str]]) -> list[dict[str, str]]:
+        stmt = text('''
+        WITH input AS (
+            SELECT * FROM unnest(CAST(:ids AS uuid[]), CAST(:titles AS text[]), CAST(:descriptions AS text[]))
+                AS input(id, title, description)
+        ), updated_submenus AS (
+            UPDATE submenus
+            SET
+                title = COALESCE(input.title, submenus.title),
+                description = COALESCE(input.description, submenus.description)
+            FROM input
+            WHERE submenus.id = input.id AND submenus.menu_id = :menu_id
+            RETURNING submenus.id, submenus.title, submenus.description, submenus.menu_id
+        ), event AS (
+            INSERT INTO deferred_tasks (topic, key, value, created_at)
+            SELECT
+                'submenu_topic' AS topic,
+                updated_submenus.id AS key,
+                json_build_object(
+                    'action', 'update',
+                    'submenu_id', updated_submenus.id,
+                    'menu_id', updated_submenus.menu_id,
+                    'title', updated_submenus.title,
+                    'description', updated_submenus.description
+                ) AS value,
+                now() AS created_at
+            FROM updated_submenus
+        ), menu_version AS (
+            UPDATE menus
+            SET version = menus.version + 1
+            WHERE menus.id = :menu_id AND EXISTS (SELECT 1 FROM updated_submenus)
+        )
+        SELECT cast(id as text) AS id, title, description FROM updated_submenus
+        ''')
+        async with self.db.begin():
+            res = await self.db.execute(stmt, {'menu_id': menu_id,
+                                               'ids': [submenu['id'] for submenu in submenus],
+                                               'titles': [submenu['title'] or None for submenu in submenus],
+                                               'descriptions': [submenu['description'] or None
+                                                                for submenu in submenus]})
+        return [dict(row) for row in res.mappings().all()]
+
+    async def delete_many(self, menu_id: UUID, ids: list[UUID]) -> list[dict[str, str]]:
+        stmt = text('''
+        WITH deleted_submenus AS (
+            DELETE FROM submenus WHERE id = ANY(:ids) AND menu_id = :menu_id
+            RETURNING id, title, description, menu_id, dishes_count
+        ), event AS (
+            INSERT INTO deferred_tasks (topic, key, value, created_at)
+            SELECT
+                'submenu_topic' AS topic,
+                deleted_submenus.id AS key,
+                json_build_object(
+                    'action', 'delete',
+                    'submenu_id', deleted_submenus.id,
+                    'menu_id', deleted_submenus.menu_id,
+                    'title', deleted_submenus.title,
+                    'description', deleted_submenus.description
+                ) AS value,
+                now() AS created_at
+            FROM deleted_submenus
+        ), counters AS (
+            UPDATE menus
+            SET
+                submenus_count = menus.submenus_count - (SELECT count(*) FROM deleted_submenus),
+                dishes_count = menus.dishes_count - (SELECT sum(dishes_count) FROM deleted_submenus),
+                version = menus.version + 1
+            WHERE menus.id = :menu_id AND EXISTS (SELECT 1 FROM deleted_submenus)
+        )
+        SELECT cast(id as text) AS id, title, description FROM deleted_submenus
+        ''')
+        async with self.db.begin():
+            res = await self.db.execute(stmt, {'menu_id': menu_id, 'ids': ids})
+        return [dict(row) for row in res.mappings().all()]
+
+    async def import_many(self, submenus: list[dict[str, str | UUID]]) -> dict[str, int | list[str]]:
+        """ Вставка подменю с заданными id в разные меню. Уже существующие id пропускаются.
+
+        Returns:
+            dict[str, int | list[str]]: Сколько строк вставлено и id меню, у которых изменились счетчики
+        """
+        stmt = text('''
+        WITH input AS (
+            SELECT * FROM unnest(CAST(:ids AS uuid[]), CAST(:menu_ids AS uuid[]), CAST(:titles AS text[]),
+                                 CAST(:descriptions AS text[])) AS input(id, menu_id, title, description)
+        ), new_submenus AS (
+            INSERT INTO submenus (id, menu_id, title, description)
+            SELECT id, menu_id, title, description FROM input
+            ON CONFLICT (id) DO NOTHING
+            RETURNING id, title, description, menu_id
+        ), event AS (
+            INSERT INTO deferred_tasks (topic, key, value, created_at)
+            SELECT
+                'submenu_topic' AS topic,
+                new_submenus.id AS key,
+                json_build_object(
+                    'action', 'create',
+                    'submenu_id', new_submenus.id,
+                    'menu_id', new_submenus.menu_id,
+                    'title', new_submenus.title,
+                    'description', new_submenus.description
+                ) AS value,
+                now() AS created_at
+            FROM new_submenus
+        ), counters AS (
+            UPDATE menus
+            SET submenus_count = menus.submenus_count + new_counts.added, version = menus.version + 1
+            FROM (SELECT menu_id, count(*) AS added FROM new_submenus GROUP BY menu_id) AS new_counts
+            WHERE menus.id = new_counts.menu_id
+            RETURNING menus.id, new_counts.added
+        )
+        SELECT cast(id as text) AS id, added FROM counters
+        ''')
         async with self.db.begin():
-            stmt = delete(self.model).where(self.model.id == id).returning(self.model.title, self.model.description)
-            res = await self.db.execute(stmt)
-            deleted_values = res.fetchone()
-            producer.produce('submenu_topic', key=str(id), value=None)
-        return {'id': str(id), 'title': deleted_values.title, 'description': deleted_values.description}
+            res = await self.db.execute(stmt, {'ids': [submenu['id'] for submenu in submenus],
+                                               'menu_ids': [submenu['menu_id'] for submenu in submenus],
+                                               'titles': [submenu['title'] for submenu in submenus],
+                                               'descriptions': [submenu['description'] for submenu in submenus]})
+        menus = res.mappings().all()
+        return {'imported': sum(menu['added'] for menu in menus), 'menus': [menu['id'] for menu in menus]}
 
 
 class DishRepository(BaseRepository):
 
     model = Dish
 
-    async def get_all(self, skip: int, limit: int) -> list[dict[str, str]]:
-        stmt = select(self.model).order_by(self.model.id).offset(skip).limit(limit)
+    async def get_all(self, submenu_id: UUID, skip: int, limit: int) -> list[dict[str, str]]:
+        stmt = select(*DISH_COLUMNS).where(self.model.submenu_id == submenu_id).order_by(
+            self.model.id).offset(skip).limit(limit)
         res = await self.db.execute(stmt)
-        dishes_rows = res.scalars().unique().all()
-        return [
-            {
-                'id': str(dish.id),
-                'submenu_id': str(dish.submenu_id),
-                'title': dish.title,
-                'description': dish.description,
-                'price': str(dish.price)
-            }
-            for dish in dishes_rows
-        ]
+        return [dict(row) for row in res.mappings()]
 
-    async def get(self, dish_id: UUID) -> dict[str, str] | None:
-        stmt = select(self.model).where(self.model.id == dish_id)
+    async def get_page(self, submenu_id: UUID, limit: int, after: UUID | None = None) -> list[dict[str, str]]:
+        stmt = select(*DISH_COLUMNS).where(self.model.submenu_id == submenu_id).order_by(self.model.id).limit(limit + 1)
+        if after:
+            stmt = stmt.where(self.model.id > after)
         res = await self.db.execute(stmt)
-        dish = res.unique().scalar_one_or_none()
-        print(dish)
+        return [dict(row) for row in res.mappings()]
+
+    async def get(self, dish_id: UUID) -> dict[str, str] | None:
+        res = await self.db.execute(select(*DISH_ITEM_COLUMNS).where(self.model.id == dish_id))
+        dish = res.mappings().one_or_none()
         if dish:
-            return {'id': str(dish.id), 'title': dish.title, 'description': dish.description, 'price': str(dish.price)}
+            return dict(dish)
 
     async def create(self, title: str, price: Decimal, description: str, submenu_id: UUID) -> dict[str, str]:
+        stmt = text('''
+        WITH new_dish AS (
+            INSERT INTO dishes (title, price, description, submenu_id)
+            VALUES (:title, :price, :description, :submenu_id)
+            RETURNING id, title, price, description, submenu_id
+        ), event AS (
+            INSERT INTO deferred_tasks (topic, key, value, created_at)
+            SELECT
+                'dish_topic' AS topic,
+                new_dish.id AS key,
+                json_build_object(
+                    'action', 'create',
+                    'dish_id', new_dish.id,
+                    'submenu_id', new_dish.submenu_id,
+                    'title', new_dish.title,
+                    'description', new_dish.description,
+                    'price', new_dish.price
+                ) AS value,
+                now() AS created_at
+            FROM new_dish
+        ), submenu_counters AS (
+            UPDATE submenus
+            SET dishes_count = submenus.dishes_count + 1
+            FROM new_dish
+            WHERE submenus.id = new_dish.submenu_id
+            RETURNING submenus.menu_id
+        ), menu_counters AS (
+            UPDATE menus
+            SET dishes_count = menus.dishes_count + 1, version = menus.version + 1
+            FROM submenu_counters
+            WHERE menus.id = submenu_counters.menu_id
+        )
+        SELECT cast(id as text) AS id, title, description, price FROM new_dish
+        ''')
         async with self.db.begin():
-            stmt = insert(self.model).values(title=title, price=price, description=description,
-                                             submenu_id=submenu_id).returning(self.model.id)
-            res = await self.db.execute(stmt)
-            new_dish_id = str(res.scalar_one())
-            producer.produce('dish_topic', key=new_dish_id, value=json.dumps(
-                {'id': new_dish_id, 'title': title, 'description': description, 'price': str(price)}).encode('utf-8'))
-        return {'id': new_dish_id, 'title': title, 'description': description, 'price': str(price)}
-
-    async def update(self, id: UUID, title: str | None, price: Decimal | None, description: str | None) -> dict[str, str] | None:
+            res = await self.db.execute(stmt, {'title': title, 'price': price,
+                                               'description': description, 'submenu_id': submenu_id})
+        new_dish = res.mappings().fetchone()
+        return {
+            'id': new_dish['id'],
+            'title': new_dish['title'],
+            'description': new_dish['description'],
+            'price': new_dish['price'],
+        }
+
+    async def update(self, id: UUID, title: str | None, price: Decimal | None,
+                     description: str | None) -> dict[str, str] | None:
+        stmt = text('''
+        WITH updated_dish AS (
+            UPDATE dishes
+            SET
+                title = COALESCE(:title, title),
+                price = COALESCE(:price, price),
+                description = COALESCE(:description, description)
+            WHERE id = :id
+            RETURNING id, title, price, description, submenu_id
+        ), event AS (
+            INSERT INTO deferred_tasks (topic, key, value, created_at)
+            SELECT
+                'dish_topic' AS topic,
+                updated_dish.id AS key,
+                json_build_object(
+                    'action', 'update',
+                    'dish_id', updated_dish.id,
+                    'submenu_id', updated_dish.submenu_id,
+                    'title', updated_dish.title,
+                    'description', updated_dish.description,
+                    'price', updated_dish.price
+                ) AS value,
+                now() AS created_at
+            FROM updated_dish
+        ), menu_version AS (
+            UPDATE menus
+            SET version = menus.version + 1
+            FROM updated_dish
+            JOIN submenus ON submenus.id = updated_dish.submenu_id
+            WHERE menus.id = submenus.menu_id
+        )
+        SELECT cast(id as text) AS id, title, description, price FROM updated_dish
+        ''')
         async with self.db.begin():
-            values = {}
-            if title:
-                values['title'] = title
-            if description:
-                values['description'] = description
-            if price:
-                values['price'] = price
-            if values:
-                stmt = update(self.model).where(self.model.id == id).values(
-                    **values).returning(self.model.title, self.model.description, self.model.price)
-                res = await self.db.execute(stmt)
-                updated_values = res.fetchone()
-            producer.produce('dish_topic', key=str(id), value=json.dumps(
-                {'id': str(id), 'title': updated_values.title, 'description': updated_values.description, 'price': str(updated_values.price)}).encode('utf-8'))
-        return {'id': str(id), 'title': updated_values.title, 'description': updated_values.description, 'price': str(updated_values.price)}
+            res = await self.db.execute(stmt, {'id': id, 'title': title or None, 'price': price or None,
+                                               'description': description or None})
+        updated_values = res.mappings().fetchone()
+
+        if updated_values:
+            return {'id': updated_values['id'], 'title': updated_values['title'],
+                    'description': updated_values['description'], 'price': updated_values['price']}
 
     async def delete(self, id: UUID) -> dict[str, str] | None:
+        stmt = text('''
+        WITH deleted_dish AS (
+            DELETE FROM dishes WHERE id = :id RETURNING id, title, price, description, submenu_id
+        ), event AS (
+            INSERT INTO deferred_tasks (topic, key, value, created_at)
+            SELECT
+                'dish_topic' AS topic,
+                deleted_dish.id AS key,
+                json_build_object(
+                    'action', 'delete',
+                    'dish_id', deleted_dish.id,
+                    'submenu_id', deleted_dish.submenu_id,
+                    'title', deleted_dish.title,
+                    'description', deleted_dish.description,
+                    'price', deleted_dish.price
+                ) AS value,
+                now() AS created_at
+            FROM deleted_dish
+        ), submenu_counters AS (
+            UPDATE submenus
+            SET dishes_count = submenus.dishes_count - 1
+            FROM deleted_dish
+            WHERE submenus.id = deleted_dish.submenu_id
+            RETURNING submenus.menu_id
+        ), menu_counters AS (
+            UPDATE menus
+            SET dishes_count = menus.dishes_count - 1, version = menus.version + 1
+            FROM submenu_counters
+            WHERE menus.id = submenu_counters.menu_id
+        )
+        SELECT cast(id as text) AS id, title, description, price FROM deleted_dish
+        ''')
+        async with self.db.begin():
+            res = await self.db.execute(stmt, {'id': id})
+        deleted_values = res.mappings().fetchone()
+
+        if deleted_values:
+            return {'id': deleted_values['id'], 'title': deleted_values['title'],
+                    'description': deleted_values['description'], 'price': deleted_values['price']}
+
+    async def create_many(self, submenu_id: UUID, dishes: list[dict[str, str | Decimal]]) -> list[dict[str, str]]:
+        stmt = text('''
+        WITH input AS (
+            SELECT * FROM unnest(CAST(:titles AS text[]), CAST(:prices AS numeric[]), CAST(:descriptions AS text[]))
+                AS input(title, price, description)
+        ), new_dishes AS (
+            INSERT INTO dishes (title, price, description, submenu_id)
+            SELECT title, price, description, CAST(:submenu_id AS uuid) FROM input
+            RETURNING id, title, price, description, submenu_id
+        ), event AS (
+            INSERT INTO deferred_tasks (topic, key, value, created_at)
+            SELECT
+                'dish_topic' AS topic,
+                new_dishes.id AS key,
+                json_build_object(
+                    'action', 'create',
+                    'dish_id', new_dishes.id,
+                    'submenu_id', new_dishes.submenu_id,
+                    'title', new_dishes.title,
+                    'description', new_dishes.description,
+                    'price', new_dishes.price
+                ) AS value,
+                now() AS created_at
+            FROM new_dishes
+        ), submenu_counters AS (
+            UPDATE submenus
+            SET dishes_count = submenus.dishes_count + (SELECT count(*) FROM new_dishes)
+            WHERE submenus.id = :submenu_id AND EXISTS (SELECT 1 FROM new_dishes)
+            RETURNING submenus.menu_id
+        ), menu_counters AS (
+            UPDATE menus
+            SET dishes_count = menus.dishes_count + (SELECT count(*) FROM new_dishes), version = menus.version + 1
+            FROM submenu_counters
+            WHERE menus.id = submenu_counters.menu_id
+        )
+        SELECT cast(id as text) AS id, title, description, price FROM new_dishes
+        ''')
+        async with self.db.begin():
+            res = await self.db.execute(stmt, {'submenu_id': submenu_id,
+                                               'titles': [dish['title'] for dish in dishes],
+                                               'prices': [dish['price'] for dish in dishes],
+                                               'descriptions': [dish['description'] for dish in dishes]})
+        return [self._bulk_row(row) for row in res.mappings().all()]
+
+    async def update_many(self, submenu_id: UUID, dishes: list[dict[str, str | Decimal]]) -> list[dict[str, str]]:
+        stmt = text('''
+        WITH input AS (
+            SELECT * FROM unnest(CAST(:ids AS uuid[]), CAST(:titles AS text[]), CAST(:prices AS numeric[]),
+                                 CAST(:descriptions AS text[])) AS input(id, title, price, description)
+        ), updated_dishes AS (
+            UPDATE dishes
+            SET
+                title = COALESCE(input.title, dishes.title),
+                price = COALESCE(input.price, dishes.price),
+                description = COALESCE(input.description, dishes.description)
+            FROM input
+            WHERE dishes.id = input.id AND dishes.submenu_id = :submenu_id
+            RETURNING dishes.id, dishes.title, dishes.price, dishes.description, dishes.submenu_id
+        ), event AS (
+            INSERT INTO deferred_tasks (topic, key, value, created_at)
+            SELECT
+                'dish_topic' AS topic,
+                updated_dishes.id AS key,
+                json_build_object(
+                    'action', 'update',
+                    'dish_id', updated_dishes.id,
+                    'submenu_id', updated_dishes.submenu_id,
+                    'title', updated_dishes.title,
+                    'description', updated_dishes.description,
+                    'price', updated_dishes.price
+                ) AS value,
+                now() AS created_at
+            FROM updated_dishes
+        ), menu_version AS (
+            UPDATE menus
+            SET version = menus.version + 1
+            FROM submenus
+            WHERE submenus.id = :submenu_id AND menus.id = submenus.menu_id AND EXISTS (SELECT 1 FROM updated_dishes)
+        )
+        SELECT cast(id as text) AS id, title, description, price FROM updated_dishes
+        ''')
+        async with self.db.begin():
+            res = await self.db.execute(stmt, {'submenu_id': submenu_id,
+                                               'ids': [dish['id'] for dish in dishes],
+                                               'titles': [dish['title'] or None for dish in dishes],
+                                               'prices': [dish['price'] or None for dish in dishes],
+                                               'descriptions': [dish['description'] or None for dish in dishes]})
+        return [self._bulk_row(row) for row in res.mappings().all()]
+
+    async def delete_many(self, submenu_id: UUID, ids: list[UUID]) -> list[dict[str, str]]:
+        stmt = text('''
+        WITH deleted_dishes AS (
+            DELETE FROM dishes WHERE id = ANY(:ids) AND submenu_id = :submenu_id
+            RETURNING id, title, price, description, submenu_id
+        ), event AS (
+            INSERT INTO deferred_tasks (topic, key, value, created_at)
+            SELECT
+                'dish_topic' AS topic,
+                deleted_dishes.id AS key,
+                json_build_object(
+                    'action', 'delete',
+                    'dish_id', deleted_dishes.id,
+                    'submenu_id', deleted_dishes.submenu_id,
+                    'title', deleted_dishes.title,
+                    'description', deleted_dishes.description,
+                    'price', deleted_dishes.price
+                ) AS value,
+                now() AS created_at
+            FROM deleted_dishes
+        ), submenu_counters AS (
+            UPDATE submenus
+            SET dishes_count = submenus.dishes_count - (SELECT count(*) FROM deleted_dishes)
+            WHERE submenus.id = :submenu_id AND EXISTS (SELECT 1 FROM deleted_dishes)
+            RETURNING submenus.menu_id
+        ), menu_counters AS (
+            UPDATE menus
+            SET dishes_count = menus.dishes_count - (SELECT count(*) FROM deleted_dishes), version = menus.version + 1
+            FROM submenu_counters
+            WHERE menus.id = submenu_counters.menu_id
+        )
+        SELECT cast(id as text) AS id, title, description, price FROM deleted_dishes
+        ''')
+        async with self.db.begin():
+            res = await self.db.execute(stmt, {'submenu_id': submenu_id, 'ids': ids})
+        return [self._bulk_row(row) for row in res.mappings().all()]
+
+    @staticmethod
+    def _bulk_row(row) -> dict[str, str]:
+        return {'id': row['id'], 'title': row['title'], 'description': row['description'], 'price': row['price']}
+
+    async def import_many(self, dishes: list[dict[str, str | UUID | Decimal]]) -> dict[str, int | list[str]]:
+        """ Вставка блюд с заданными id в разные подменю. Уже существующие id пропускаются.
+
+        Returns:
+            dict[str, int | list[str]]: Сколько строк вставлено и id меню и подменю, у которых изменились счетчики
+        """
+        stmt = text('''
+        WITH input AS (
+            SELECT * FROM unnest(CAST(:ids AS uuid[]), CAST(:submenu_ids AS uuid[]), CAST(:titles AS text[]),
+                                 CAST(:prices AS numeric[]), CAST(:descriptions AS text[]))
+                AS input(id, submenu_id, title, price, description)
+        ), new_dishes AS (
+            INSERT INTO dishes (id, submenu_id, title, price, description)
+            SELECT id, submenu_id, title, price, description FROM input
+            ON CONFLICT (id) DO NOTHING
+            RETURNING id, title, price, description, submenu_id
+        ), event AS (
+            INSERT INTO deferred_tasks (topic, key, value, created_at)
+            SELECT
+                'dish_topic' AS topic,
+                new_dishes.id AS key,
+                json_build_object(
+                    'action', 'create',
+                    'dish_id', new_dishes.id,
+                    'submenu_id', new_dishes.submenu_id,
+                    'title', new_dishes.title,
+                    'description', new_dishes.description,
+                    'price', new_dishes.price
+                ) AS value,
+                now() AS created_at
+            FROM new_dishes
+        ), submenu_counters AS (
+            UPDATE submenus
+            SET dishes_count = submenus.dishes_count + new_counts.added
+            FROM (SELECT submenu_id, count(*) AS added FROM new_dishes GROUP BY submenu_id) AS new_counts
+            WHERE submenus.id = new_counts.submenu_id
+            RETURNING submenus.id, submenus.menu_id, new_counts.added
+        ), menu_counters AS (
+            UPDATE menus
+            SET dishes_count = menus.dishes_count + new_counts.added, version = menus.version + 1
+            FROM (SELECT menu_id, sum(added) AS added FROM submenu_counters GROUP BY menu_id) AS new_counts
+            WHERE menus.id = new_counts.menu_id
+            RETURNING menus.id
+        )
+        SELECT 'submenu' AS entity, cast(id as text) AS id, added FROM submenu_counters
+        UNION ALL
+        SELECT 'menu' AS entity, cast(id as text) AS id, 0 AS added FROM menu_counters
+        ''')
         async with self.db.begin():
-            stmt = delete(self.model).where(self.model.id == id).returning(
-                self.model.title, self.model.description, self.model.price)
-            res = await self.db.execute(stmt)
-            deleted_values = res.fetchone()
-            producer.produce('dish_topic', key=str(id), value=None)
-        return {'id': str(id), 'title': deleted_values.title, 'description': deleted_values.description, 'price': str(deleted_values.price)}
+            res = await self.db.execute(stmt, {'ids': [dish['id'] for dish in dishes],
+                                               'submenu_ids': [dish['submenu_id'] for dish in dishes],
+                                               'titles': [dish['title'] for dish in dishes],
+                                               'prices': [dish['price'] for dish in dishes],
+                                               'descriptions': [dish['description'] for dish in dishes]})
+        parents = res.mappings().all()
+        return {'imported': sum(parent['added'] for parent in parents),
+                'menus': [parent['id'] for parent in parents if parent['entity'] == 'menu'],
+                'submenus': [parent['id'] for parent in parents if parent['entity'] == 'submenu']}
@@ -0,0 +1,26 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+def _default(value: Any) -> str:
+    # Numeric приходит из базы Decimal'ом: строка сохраняет масштаб цены ('1.50'), как раньше str() в репозиториях
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'Type is not JSON serializable: {type(value).__name__}')
+
+
+def dumps(content: Any) -> bytes:
+    """ Сериализация ответов API. UUID и datetime orjson пишет сам, Decimal - через _default.
+    Результат байт в байт совпадает с JSONResponse (компактные разделители, UTF-8 без экранирования).
+    """
+    return orjson.dumps(content, default=_default)
+
+
+class ORJSONResponse(JSONResponse):
+    """ JSONResponse на orjson: репозиториям не нужно заранее превращать id и цены в строки """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,27 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from source.api.services.service import CatalogService
+from source.db.database import get_db, get_read_db
+
+router = APIRouter(prefix='/api/v1/catalog', tags=['Catalog'])
+
+
+@router.get('/export', response_class=StreamingResponse)
+async def export_catalog(db: AsyncSession = Depends(get_read_db)) -> StreamingResponse:
+    catalog = CatalogService(db)
+    return await catalog.export()
+
+
+@router.post('/import')
+async def import_catalog(request: Request, format: Literal['ndjson', 'csv'] = 'ndjson',
+                         resume_from: int = Query(default=0, ge=0),
+                         db: AsyncSession = Depends(get_db)) -> JSONResponse:
+    """ Тело запроса - файл каталога целиком, читается потоком. При ошибке в ответе checkpoint:
+    повторите запрос с resume_from=checkpoint, и уже сохраненные записи будут пропущены
+    """
+    catalog = CatalogService(db)
+    return await catalog.load(request.stream(), format=format, resume_from=resume_from)
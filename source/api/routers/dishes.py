@@ -1,26 +1,59 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Body, Depends, Query
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from source.api.schems.schemas import DishScheme
+from source.api.schems.schemas import BULK_MAX_ITEMS, DishBulkUpdateScheme, DishScheme
 from source.api.services.service import DishService
-from source.db.database import get_db
+from source.db.database import get_db, get_read_db
 
 router = APIRouter(prefix='/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes', tags=['Dishes'])
 
 
 @router.get('/list/{skip}/{limit}')
-async def get_all_dishes(skip: int, limit: int, db: AsyncSession = Depends(get_db)) -> JSONResponse:
+async def get_all_dishes(submenu_id: UUID, skip: int, limit: int,
+                         db: AsyncSession = Depends(get_read_db)) -> JSONResponse:
     dishes = DishService(db)
-    return await dishes.get_all(skip=skip, limit=limit)
+    return await dishes.get_all(submenu_id=submenu_id, skip=skip, limit=limit)
+
+
+@router.get('/list')
+async def get_dishes_page(submenu_id: UUID, limit: int = Query(default=100, ge=1, le=1000), cursor: str | None = None,
+                          db: AsyncSession = Depends(get_read_db)) -> JSONResponse:
+    dishes = DishService(db)
+    return await dishes.get_page(submenu_id=submenu_id, limit=limit, cursor=cursor)
+
+
+@router.post('/bulk')
+async def create_dishes(menu_id: UUID, submenu_id: UUID,
+                        dishes_schema: list[DishScheme] = Body(min_length=1, max_length=BULK_MAX_ITEMS),
+                        db: AsyncSession = Depends(get_db)) -> JSONResponse:
+    dishes = DishService(db)
+    return await dishes.create_many(menu_id=menu_id, submenu_id=submenu_id, dishes_schema=dishes_schema)
+
+
+@router.patch('/bulk')
+async def update_dishes(menu_id: UUID, submenu_id: UUID,
+                        dishes_schema: list[DishBulkUpdateScheme] = Body(min_length=1, max_length=BULK_MAX_ITEMS),
+                        db: AsyncSession = Depends(get_db)) -> JSONResponse:
+    dishes = DishService(db)
+    return await dishes.update_many(menu_id=menu_id, submenu_id=submenu_id, dishes_schema=dishes_schema)
+
+
+@router.post('/bulk/delete')
+async def delete_dishes(menu_id: UUID, submenu_id: UUID,
+                        dish_ids: list[UUID] = Body(min_length=1, max_length=BULK_MAX_ITEMS),
+                        db: AsyncSession = Depends(get_db)) -> JSONResponse:
+    dishes = DishService(db)
+    return await dishes.delete_many(menu_id=menu_id, submenu_id=submenu_id, dish_ids=dish_ids)
 
 
 @router.get('/{dish_id}')
-async def get_dish(dish_id: UUID, db: AsyncSession = Depends(get_db)) -> JSONResponse:
+async def get_dish(menu_id: UUID, submenu_id: UUID, dish_id: UUID,
+                   db: AsyncSession = Depends(get_read_db)) -> JSONResponse:
     dish = DishService(db)
-    return await dish.get(dish_id=dish_id)
+    return await dish.get(menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id)
 
 
 @router.post('/')
@@ -1,22 +1,29 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from source.api.schems.schemas import MenuScheme
 from source.api.services.service import MenuService
-from source.db.database import get_db
+from source.db.database import get_db, get_read_db
 
 router = APIRouter(prefix='/api/v1/menus', tags=['Menus'])
 
 
 @router.get('/list/{skip}/{limit}')
-async def get_menus(skip: int, limit: int, db: AsyncSession = Depends(get_db)) -> JSONResponse:
+async def get_menus(skip: int, limit: int, db: AsyncSession = Depends(get_read_db)) -> JSONResponse:
     menus_list = MenuService(db)
     return await menus_list.get_all(skip=skip, limit=limit)
 
 
+@router.get('/list')
+async def get_menus_page(limit: int = Query(default=100, ge=1, le=1000), cursor: str | None = None,
+                         db: AsyncSession = Depends(get_read_db)) -> JSONResponse:
+    menus_list = MenuService(db)
+    return await menus_list.get_page(limit=limit, cursor=cursor)
+
+
 @router.post('/')
 async def create_menu(menu_schema: MenuScheme, db: AsyncSession = Depends(get_db)) -> JSONResponse:
     menu = MenuService(db)
@@ -24,7 +31,7 @@ async def create_menu(menu_schema: MenuScheme, db: AsyncSession = Depends(get_db
 
 
 @router.get('/{menu_id}')
-async def get_menu(menu_id: UUID, db: AsyncSession = Depends(get_db)) -> JSONResponse:
+async def get_menu(menu_id: UUID, db: AsyncSession = Depends(get_read_db)) -> JSONResponse:
     menu = MenuService(db)
     return await menu.get(menu_id=menu_id)
 
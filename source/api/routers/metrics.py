@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from source.metrics import REGISTRY
+
+router = APIRouter(tags=['Metrics'])
+
+
+@router.get('/metrics', response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    return PlainTextResponse(REGISTRY.render(), media_type='text/plain; version=0.0.4')
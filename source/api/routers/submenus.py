@@ -1,26 +1,63 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Body, Depends, Query
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from source.api.schems.schemas import SubmenuScheme
+from source.api.schems.schemas import (
+    BULK_MAX_ITEMS,
+    SubmenuBulkUpdateScheme,
+    SubmenuScheme,
+)
 from source.api.services.service import SubMenuService
-from source.db.database import get_db
+from source.db.database import get_db, get_read_db
 
 router = APIRouter(prefix='/api/v1/menus/{menu_id}/submenus', tags=['Submenus'])
 
 
 @router.get('/list/{skip}/{limit}')
-async def get_all_submenu(skip: int, limit: int, db: AsyncSession = Depends(get_db)) -> JSONResponse:
+async def get_all_submenu(menu_id: UUID, skip: int, limit: int,
+                          db: AsyncSession = Depends(get_read_db)) -> JSONResponse:
     submenus = SubMenuService(db)
-    return await submenus.get_all(skip=skip, limit=limit)
+    return await submenus.get_all(menu_id=menu_id, skip=skip, limit=limit)
+
+
+@router.get('/list')
+async def get_submenus_page(menu_id: UUID, limit: int = Query(default=100, ge=1, le=1000), cursor: str | None = None,
+                            db: AsyncSession = Depends(get_read_db)) -> JSONResponse:
+    submenus = SubMenuService(db)
+    return await submenus.get_page(menu_id=menu_id, limit=limit, cursor=cursor)
+
+
+@router.post('/bulk')
+async def create_submenus(menu_id: UUID,
+                          submenus_schema: list[SubmenuScheme] = Body(min_length=1, max_length=BULK_MAX_ITEMS),
+                          db: AsyncSession = Depends(get_db)) -> JSONResponse:
+    submenus = SubMenuService(db)
+    return await submenus.create_many(menu_id=menu_id, submenus_schema=submenus_schema)
+
+
+@router.patch('/bulk')
+async def update_submenus(menu_id: UUID,
+                          submenus_schema: list[SubmenuBulkUpdateScheme] = Body(min_length=1,
+                                                                                max_length=BULK_MAX_ITEMS),
+                          db: AsyncSession = Depends(get_db)) -> JSONResponse:
+    submenus = SubMenuService(db)
+    return await submenus.update_many(menu_id=menu_id, submenus_schema=submenus_schema)
+
+
+@router.post('/bulk/delete')
+async def delete_submenus(menu_id: UUID,
+                          submenu_ids: list[UUID] = Body(min_length=1, max_length=BULK_MAX_ITEMS),
+                          db: AsyncSession = Depends(get_db)) -> JSONResponse:
+    submenus = SubMenuService(db)
+    return await submenus.delete_many(menu_id=menu_id, submenu_ids=submenu_ids)
 
 
 @router.get('/{submenu_id}')
-async def get_submenu(submenu_id: UUID, db: AsyncSession = Depends(get_db)) -> JSONResponse:
+async def get_submenu(menu_id: UUID, submenu_id: UUID, db: AsyncSession = Depends(get_read_db)) -> JSONResponse:
     submenu = SubMenuService(db)
-    return await submenu.get(submenu_id=submenu_id)
+    return await submenu.get(menu_id=menu_id, submenu_id=submenu_id)
 
 
 @router.post('/')
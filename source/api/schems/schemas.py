@@ -1,7 +1,11 @@
 from decimal import Decimal
+from uuid import UUID
 
 from pydantic import BaseModel
 
+# Сколько элементов принимает один bulk-запрос: весь каталог ресторана уходит одним INSERT'ом
+BULK_MAX_ITEMS = 50_000
+
 
 class MenuScheme(BaseModel):
     title: str
@@ -17,3 +21,27 @@ class DishScheme(BaseModel):
     title: str
     description: str
     price: Decimal
+
+
+class SubmenuBulkUpdateScheme(SubmenuScheme):
+    id: UUID
+
+
+class DishBulkUpdateScheme(DishScheme):
+    id: UUID
+
+
+# Записи импорта каталога: id задаются файлом (обычно это выгрузка /api/v1/catalog/export),
+# поэтому повторная загрузка той же пачки ничего не дублирует
+class MenuImportScheme(MenuScheme):
+    id: UUID
+
+
+class SubmenuImportScheme(SubmenuScheme):
+    id: UUID
+    menu_id: UUID
+
+
+class DishImportScheme(DishScheme):
+    id: UUID
+    submenu_id: UUID
@@ -0,0 +1,28 @@
+import base64
+import binascii
+from uuid import UUID
+
+
+def encode_cursor(last_id: UUID | str) -> str:
+    return base64.urlsafe_b64encode(str(last_id).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str | None) -> UUID | None:
+    """ Курсор непрозрачен для клиента: это base64 от id последней записи предыдущей страницы.
+
+    Raises:
+        ValueError: если курсор поврежден или не содержит uuid
+    """
+    if not cursor:
+        return None
+    try:
+        return UUID(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8'))
+    except (binascii.Error, UnicodeDecodeError) as exc:
+        raise ValueError('invalid cursor') from exc
+
+
+def build_page(rows: list[dict], limit: int) -> dict[str, list[dict] | str | None]:
+    """ Репозитории отдают limit + 1 строк: лишняя строка лишь показывает, что следующая страница существует """
+    items = rows[:limit]
+    next_cursor = encode_cursor(items[-1]['id']) if len(rows) > limit else None
+    return {'items': items, 'next_cursor': next_cursor}
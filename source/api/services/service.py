@@ -1,22 +1,39 @@
 from uuid import UUID
 
 from fastapi import status
-from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from source.api.cache.cache import clear_cache
+from source.api.cache.cache import CacheInvalidation, clear_cache
 from source.api.cache.config import (
     DISH_ITEM_CACHE_KEY,
     DISH_LIST_CACHE_KEY,
+    ITEM_CACHE_STALE_TTL,
+    ITEM_CACHE_TTL,
+    LIST_CACHE_STALE_TTL,
+    LIST_CACHE_TTL,
     MENU_ITEM_CACHE_KEY,
     MENU_LIST_CACHE_KEY,
+    MENU_TAG,
     SUBMENU_ITEM_CACHE_KEY,
     SUBMENU_LIST_CACHE_KEY,
+    SUBMENU_TAG,
 )
 from source.api.cache.decorators import cache_item_response, cache_list_response
 from source.api.factories.factory import RepositoryFactory
+from source.api.repositories.catalog import CatalogRepository
 from source.api.repositories.interfaces import BaseService
-from source.api.schems.schemas import DishScheme, MenuScheme, SubmenuScheme
+from source.api.responses import ORJSONResponse
+from source.api.schems.schemas import (
+    DishBulkUpdateScheme,
+    DishScheme,
+    MenuScheme,
+    SubmenuBulkUpdateScheme,
+    SubmenuScheme,
+)
+from source.api.services.pagination import build_page, decode_cursor
+from source.importer.loader import CatalogImporter, CatalogImportError
+from source.importer.parsers import parse
 
 
 class MenuService(BaseService):
@@ -24,40 +41,53 @@ class MenuService(BaseService):
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    # @cache_list_response(cache_key_prefix=MENU_LIST_CACHE_KEY)
-    async def get_all(self, skip: int, limit: int) -> JSONResponse:
+    @cache_list_response(cache_key_prefix=MENU_LIST_CACHE_KEY, ttl=LIST_CACHE_TTL, stale_ttl=LIST_CACHE_STALE_TTL)
+    async def get_all(self, skip: int, limit: int) -> ORJSONResponse:
         repository = await RepositoryFactory.create('menu', self.db)
         menus_list = await repository.get_all(skip=skip, limit=limit)
-        return JSONResponse(content=menus_list, status_code=status.HTTP_200_OK)
+        return ORJSONResponse(content=menus_list, status_code=status.HTTP_200_OK)
+
+    @cache_list_response(cache_key_prefix=MENU_LIST_CACHE_KEY, ttl=LIST_CACHE_TTL, stale_ttl=LIST_CACHE_STALE_TTL)
+    async def get_page(self, limit: int, cursor: str | None) -> ORJSONResponse:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            return ORJSONResponse(content={'detail': 'invalid cursor'}, status_code=status.HTTP_400_BAD_REQUEST)
+        repository = await RepositoryFactory.create('menu', self.db)
+        menus_list = await repository.get_page(limit=limit, after=after)
+        return ORJSONResponse(content=build_page(menus_list, limit), status_code=status.HTTP_200_OK)
 
-    # @cache_item_response(cache_key_prefix=MENU_ITEM_CACHE_KEY)
-    async def get(self, menu_id: UUID) -> JSONResponse:
+    @cache_item_response(cache_key_prefix=MENU_ITEM_CACHE_KEY, key_kwarg='menu_id',
+                         ttl=ITEM_CACHE_TTL, stale_ttl=ITEM_CACHE_STALE_TTL)
+    async def get(self, menu_id: UUID) -> ORJSONResponse:
         repository = await RepositoryFactory.create('menu', self.db)
         menu = await repository.get(menu_id)
         if menu is not None:
-            return JSONResponse(content=menu, status_code=status.HTTP_200_OK)
-        return JSONResponse(content={'detail': 'menu not found'}, status_code=status.HTTP_404_NOT_FOUND)
+            return ORJSONResponse(content=menu, status_code=status.HTTP_200_OK)
+        return ORJSONResponse(content={'detail': 'menu not found'}, status_code=status.HTTP_404_NOT_FOUND)
 
-    async def create(self, menu_schema: MenuScheme) -> JSONResponse:
-        await clear_cache(MENU_LIST_CACHE_KEY)
+    async def create(self, menu_schema: MenuScheme) -> ORJSONResponse:
         repository = await RepositoryFactory.create('menu', self.db)
         menu_data = await repository.create(title=menu_schema.title, description=menu_schema.description)
+        # Кэш сбрасывается после записи: иначе промах между сбросом и коммитом закэшировал бы старые данные
+        await clear_cache(MENU_LIST_CACHE_KEY)
 
-        return JSONResponse(content=menu_data, status_code=status.HTTP_201_CREATED)
+        return ORJSONResponse(content=menu_data, status_code=status.HTTP_201_CREATED)
 
-    async def update(self, menu_id: UUID, menu_schema: MenuScheme) -> JSONResponse:
-        await clear_cache(key_list=MENU_LIST_CACHE_KEY, key_item=f'{MENU_ITEM_CACHE_KEY}_{menu_id}')
+    async def update(self, menu_id: UUID, menu_schema: MenuScheme) -> ORJSONResponse:
         repository = await RepositoryFactory.create('menu', self.db)
         menu_data = await repository.update(id=menu_id, title=menu_schema.title, description=menu_schema.description)
+        await clear_cache(key_list=MENU_LIST_CACHE_KEY, key_item=f'{MENU_ITEM_CACHE_KEY}_{menu_id}')
 
-        return JSONResponse(content=menu_data, status_code=status.HTTP_200_OK)
+        return ORJSONResponse(content=menu_data, status_code=status.HTTP_200_OK)
 
-    async def delete(self, menu_id: UUID) -> JSONResponse:
-        await clear_cache(key_list=MENU_LIST_CACHE_KEY, key_item=f'{MENU_ITEM_CACHE_KEY}_{menu_id}')
+    async def delete(self, menu_id: UUID) -> ORJSONResponse:
         repository = await RepositoryFactory.create('menu', self.db)
         menu_data = await repository.delete(id=menu_id)
+        await clear_cache(key_list=MENU_LIST_CACHE_KEY, key_item=f'{MENU_ITEM_CACHE_KEY}_{menu_id}',
+                          keys_sublist=[SUBMENU_LIST_CACHE_KEY, DISH_LIST_CACHE_KEY], tags=[f'{MENU_TAG}_{menu_id}'])
 
-        return JSONResponse(content=menu_data, status_code=status.HTTP_200_OK)
+        return ORJSONResponse(content=menu_data, status_code=status.HTTP_200_OK)
 
 
 class SubMenuService(BaseService):
@@ -65,42 +95,93 @@ class SubMenuService(BaseService):
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    @cache_list_response(cache_key_prefix=SUBMENU_LIST_CACHE_KEY)
-    async def get_all(self, skip: int, limit: int) -> JSONResponse:
+    @cache_list_response(cache_key_prefix=SUBMENU_LIST_CACHE_KEY, scope_kwargs=('menu_id',),
+                         ttl=LIST_CACHE_TTL, stale_ttl=LIST_CACHE_STALE_TTL)
+    async def get_all(self, menu_id: UUID, skip: int, limit: int) -> ORJSONResponse:
         repository = await RepositoryFactory.create('submenu', self.db)
-        submenus_list = await repository.get_all(skip=skip, limit=limit)
-        return JSONResponse(content=submenus_list, status_code=status.HTTP_200_OK)
+        submenus_list = await repository.get_all(menu_id=menu_id, skip=skip, limit=limit)
+        return ORJSONResponse(content=submenus_list, status_code=status.HTTP_200_OK)
+
+    @cache_list_response(cache_key_prefix=SUBMENU_LIST_CACHE_KEY, scope_kwargs=('menu_id',),
+                         ttl=LIST_CACHE_TTL, stale_ttl=LIST_CACHE_STALE_TTL)
+    async def get_page(self, menu_id: UUID, limit: int, cursor: str | None) -> ORJSONResponse:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            return ORJSONResponse(content={'detail': 'invalid cursor'}, status_code=status.HTTP_400_BAD_REQUEST)
+        repository = await RepositoryFactory.create('submenu', self.db)
+        submenus_list = await repository.get_page(menu_id=menu_id, limit=limit, after=after)
+        return ORJSONResponse(content=build_page(submenus_list, limit), status_code=status.HTTP_200_OK)
 
-    @cache_item_response(cache_key_prefix=SUBMENU_ITEM_CACHE_KEY)
-    async def get(self, submenu_id: UUID) -> JSONResponse:
+    @cache_item_response(cache_key_prefix=SUBMENU_ITEM_CACHE_KEY, key_kwarg='submenu_id',
+                         tag_kwargs={'menu_id': MENU_TAG}, ttl=ITEM_CACHE_TTL, stale_ttl=ITEM_CACHE_STALE_TTL)
+    async def get(self, menu_id: UUID, submenu_id: UUID) -> ORJSONResponse:
         repository = await RepositoryFactory.create('submenu', self.db)
         submenu = await repository.get(id=submenu_id)
         if submenu is not None:
-            return JSONResponse(content=submenu, status_code=status.HTTP_200_OK)
-        return JSONResponse(content={'detail': 'submenu not found'}, status_code=status.HTTP_404_NOT_FOUND)
+            return ORJSONResponse(content=submenu, status_code=status.HTTP_200_OK)
+        return ORJSONResponse(content={'detail': 'submenu not found'}, status_code=status.HTTP_404_NOT_FOUND)
 
-    async def create(self, menu_id: UUID, submenu_schema: SubmenuScheme) -> JSONResponse:
-        await clear_cache(key_list=SUBMENU_LIST_CACHE_KEY, keys_sublist=[MENU_LIST_CACHE_KEY], keys_subitem=[f'{MENU_ITEM_CACHE_KEY}_{menu_id}'])
+    async def create(self, menu_id: UUID, submenu_schema: SubmenuScheme) -> ORJSONResponse:
         repository = await RepositoryFactory.create('submenu', self.db)
         submenu_data = await repository.create(menu_id=menu_id, title=submenu_schema.title,
                                                description=submenu_schema.description)
+        await clear_cache(key_list=SUBMENU_LIST_CACHE_KEY, keys_sublist=[MENU_LIST_CACHE_KEY],
+                          keys_subitem=[f'{MENU_ITEM_CACHE_KEY}_{menu_id}'])
 
-        return JSONResponse(content=submenu_data, status_code=status.HTTP_201_CREATED)
+        return ORJSONResponse(content=submenu_data, status_code=status.HTTP_201_CREATED)
 
-    async def update(self, menu_id: UUID, submenu_id: UUID, submenu_schema: SubmenuScheme) -> JSONResponse:
-        await clear_cache(key_list=SUBMENU_LIST_CACHE_KEY, key_item=f'{SUBMENU_ITEM_CACHE_KEY}_{submenu_id}', keys_sublist=[MENU_LIST_CACHE_KEY], keys_subitem=[f'{MENU_ITEM_CACHE_KEY}_{menu_id}'])
+    async def update(self, menu_id: UUID, submenu_id: UUID, submenu_schema: SubmenuScheme) -> ORJSONResponse:
         repository = await RepositoryFactory.create('submenu', self.db)
         submenu_data = await repository.update(id=submenu_id, title=submenu_schema.title,
                                                description=submenu_schema.description)
+        if submenu_data is None:
+            return ORJSONResponse(content={'detail': 'submenu not found'}, status_code=status.HTTP_404_NOT_FOUND)
+        await clear_cache(key_list=SUBMENU_LIST_CACHE_KEY, key_item=f'{SUBMENU_ITEM_CACHE_KEY}_{submenu_id}',
+                          keys_sublist=[MENU_LIST_CACHE_KEY], keys_subitem=[f'{MENU_ITEM_CACHE_KEY}_{menu_id}'])
 
-        return JSONResponse(content=submenu_data, status_code=status.HTTP_200_OK)
+        return ORJSONResponse(content=submenu_data, status_code=status.HTTP_200_OK)
 
-    async def delete(self, menu_id: UUID, submenu_id: UUID) -> JSONResponse:
-        await clear_cache(key_list=SUBMENU_LIST_CACHE_KEY, key_item=f'{SUBMENU_ITEM_CACHE_KEY}_{submenu_id}', keys_sublist=[MENU_LIST_CACHE_KEY], keys_subitem=[f'{MENU_ITEM_CACHE_KEY}_{menu_id}'])
+    async def delete(self, menu_id: UUID, submenu_id: UUID) -> ORJSONResponse:
         repository = await RepositoryFactory.create('submenu', self.db)
         submenu_data = await repository.delete(submenu_id)
+        if submenu_data is None:
+            return ORJSONResponse(content={'detail': 'submenu not found'}, status_code=status.HTTP_404_NOT_FOUND)
+        await clear_cache(key_list=SUBMENU_LIST_CACHE_KEY, key_item=f'{SUBMENU_ITEM_CACHE_KEY}_{submenu_id}',
+                          keys_sublist=[MENU_LIST_CACHE_KEY, DISH_LIST_CACHE_KEY],
+                          keys_subitem=[f'{MENU_ITEM_CACHE_KEY}_{menu_id}'], tags=[f'{SUBMENU_TAG}_{submenu_id}'])
+
+        return ORJSONResponse(content=submenu_data, status_code=status.HTTP_200_OK)
+
+    async def create_many(self, menu_id: UUID, submenus_schema: list[SubmenuScheme]) -> ORJSONResponse:
+        repository = await RepositoryFactory.create('submenu', self.db)
+        submenus_data = await repository.create_many(menu_id=menu_id,
+                                                     submenus=[submenu.model_dump() for submenu in submenus_schema])
+        # Кэш сбрасывается один раз на весь пакет, уже после записи
+        await CacheInvalidation().lists(SUBMENU_LIST_CACHE_KEY, MENU_LIST_CACHE_KEY).items(
+            f'{MENU_ITEM_CACHE_KEY}_{menu_id}').flush()
+
+        return ORJSONResponse(content=submenus_data, status_code=status.HTTP_201_CREATED)
+
+    async def update_many(self, menu_id: UUID, submenus_schema: list[SubmenuBulkUpdateScheme]) -> ORJSONResponse:
+        repository = await RepositoryFactory.create('submenu', self.db)
+        submenus_data = await repository.update_many(menu_id=menu_id,
+                                                     submenus=[submenu.model_dump() for submenu in submenus_schema])
+        await CacheInvalidation().lists(SUBMENU_LIST_CACHE_KEY, MENU_LIST_CACHE_KEY).items(
+            f'{MENU_ITEM_CACHE_KEY}_{menu_id}',
+            *(f'{SUBMENU_ITEM_CACHE_KEY}_{submenu["id"]}' for submenu in submenus_data)).flush()
+
+        return ORJSONResponse(content=submenus_data, status_code=status.HTTP_200_OK)
+
+    async def delete_many(self, menu_id: UUID, submenu_ids: list[UUID]) -> ORJSONResponse:
+        repository = await RepositoryFactory.create('submenu', self.db)
+        submenus_data = await repository.delete_many(menu_id=menu_id, ids=submenu_ids)
+        await CacheInvalidation().lists(SUBMENU_LIST_CACHE_KEY, MENU_LIST_CACHE_KEY, DISH_LIST_CACHE_KEY).items(
+            f'{MENU_ITEM_CACHE_KEY}_{menu_id}',
+            *(f'{SUBMENU_ITEM_CACHE_KEY}_{submenu["id"]}' for submenu in submenus_data)).tags(
+            *(f'{SUBMENU_TAG}_{submenu["id"]}' for submenu in submenus_data)).flush()
 
-        return JSONResponse(content=submenu_data, status_code=status.HTTP_200_OK)
+        return ORJSONResponse(content=submenus_data, status_code=status.HTTP_200_OK)
 
 
 class DishService(BaseService):
@@ -108,39 +189,120 @@ class DishService(BaseService):
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    @cache_list_response(cache_key_prefix=DISH_LIST_CACHE_KEY)
-    async def get_all(self, skip: int, limit: int) -> JSONResponse:
+    @cache_list_response(cache_key_prefix=DISH_LIST_CACHE_KEY, scope_kwargs=('submenu_id',),
+                         ttl=LIST_CACHE_TTL, stale_ttl=LIST_CACHE_STALE_TTL)
+    async def get_all(self, submenu_id: UUID, skip: int, limit: int) -> ORJSONResponse:
         repository = await RepositoryFactory.create('dish', self.db)
-        dishes_list = await repository.get_all(skip=skip, limit=limit)
-        return JSONResponse(content=dishes_list, status_code=status.HTTP_200_OK)
+        dishes_list = await repository.get_all(submenu_id=submenu_id, skip=skip, limit=limit)
+        return ORJSONResponse(content=dishes_list, status_code=status.HTTP_200_OK)
+
+    @cache_list_response(cache_key_prefix=DISH_LIST_CACHE_KEY, scope_kwargs=('submenu_id',),
+                         ttl=LIST_CACHE_TTL, stale_ttl=LIST_CACHE_STALE_TTL)
+    async def get_page(self, submenu_id: UUID, limit: int, cursor: str | None) -> ORJSONResponse:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            return ORJSONResponse(content={'detail': 'invalid cursor'}, status_code=status.HTTP_400_BAD_REQUEST)
+        repository = await RepositoryFactory.create('dish', self.db)
+        dishes_list = await repository.get_page(submenu_id=submenu_id, limit=limit, after=after)
+        return ORJSONResponse(content=build_page(dishes_list, limit), status_code=status.HTTP_200_OK)
 
-    # @cache_item_response(cache_key_prefix=DISH_ITEM_CACHE_KEY)
-    async def get(self, dish_id: UUID) -> JSONResponse:
+    @cache_item_response(cache_key_prefix=DISH_ITEM_CACHE_KEY, key_kwarg='dish_id',
+                         tag_kwargs={'menu_id': MENU_TAG, 'submenu_id': SUBMENU_TAG},
+                         ttl=ITEM_CACHE_TTL, stale_ttl=ITEM_CACHE_STALE_TTL)
+    async def get(self, menu_id: UUID, submenu_id: UUID, dish_id: UUID) -> ORJSONResponse:
         repository = await RepositoryFactory.create('dish', self.db)
         dish = await repository.get(dish_id=dish_id)
         if dish is not None:
-            return JSONResponse(content=dish, status_code=status.HTTP_200_OK)
-        return JSONResponse(content={'detail': 'dish not found'}, status_code=status.HTTP_404_NOT_FOUND)
+            return ORJSONResponse(content=dish, status_code=status.HTTP_200_OK)
+        return ORJSONResponse(content={'detail': 'dish not found'}, status_code=status.HTTP_404_NOT_FOUND)
 
-    async def create(self, dish_schema: DishScheme, menu_id: UUID, submenu_id: UUID) -> JSONResponse:
-        await clear_cache(key_list=DISH_LIST_CACHE_KEY, keys_sublist=[MENU_LIST_CACHE_KEY, SUBMENU_LIST_CACHE_KEY], keys_subitem=[f'{MENU_ITEM_CACHE_KEY}_{menu_id}', f'{SUBMENU_ITEM_CACHE_KEY}_{submenu_id}'])
+    async def create(self, dish_schema: DishScheme, menu_id: UUID, submenu_id: UUID) -> ORJSONResponse:
         repository = await RepositoryFactory.create('dish', self.db)
         dish_data = await repository.create(submenu_id=submenu_id, title=dish_schema.title,
                                             price=dish_schema.price, description=dish_schema.description)
+        await clear_cache(key_list=DISH_LIST_CACHE_KEY, keys_sublist=[MENU_LIST_CACHE_KEY, SUBMENU_LIST_CACHE_KEY],
+                          keys_subitem=[f'{MENU_ITEM_CACHE_KEY}_{menu_id}', f'{SUBMENU_ITEM_CACHE_KEY}_{submenu_id}'])
 
-        return JSONResponse(content=dish_data, status_code=status.HTTP_201_CREATED)
+        return ORJSONResponse(content=dish_data, status_code=status.HTTP_201_CREATED)
 
-    async def update(self, menu_id: UUID, submenu_id: UUID, dish_id: UUID, dish_schema: DishScheme) -> JSONResponse:
-        await clear_cache(key_list=DISH_LIST_CACHE_KEY, key_item=f'{DISH_ITEM_CACHE_KEY}_{dish_id}', keys_sublist=[MENU_LIST_CACHE_KEY, SUBMENU_LIST_CACHE_KEY], keys_subitem=[f'{MENU_ITEM_CACHE_KEY}_{menu_id}', f'{SUBMENU_ITEM_CACHE_KEY}_{submenu_id}'])
+    async def update(self, menu_id: UUID, submenu_id: UUID, dish_id: UUID, dish_schema: DishScheme) -> ORJSONResponse:
         repository = await RepositoryFactory.create('dish', self.db)
         dish_data = await repository.update(title=dish_schema.title, price=dish_schema.price,
                                             description=dish_schema.description, id=dish_id)
+        if dish_data is None:
+            return ORJSONResponse(content={'detail': 'dish not found'}, status_code=status.HTTP_404_NOT_FOUND)
+        await clear_cache(key_list=DISH_LIST_CACHE_KEY, key_item=f'{DISH_ITEM_CACHE_KEY}_{dish_id}',
+                          keys_sublist=[MENU_LIST_CACHE_KEY, SUBMENU_LIST_CACHE_KEY],
+                          keys_subitem=[f'{MENU_ITEM_CACHE_KEY}_{menu_id}', f'{SUBMENU_ITEM_CACHE_KEY}_{submenu_id}'])
 
-        return JSONResponse(content=dish_data, status_code=status.HTTP_200_OK)
+        return ORJSONResponse(content=dish_data, status_code=status.HTTP_200_OK)
 
-    async def delete(self, menu_id: UUID, submenu_id: UUID, dish_id: UUID) -> JSONResponse:
-        await clear_cache(key_list=DISH_LIST_CACHE_KEY, key_item=f'{DISH_ITEM_CACHE_KEY}_{dish_id}', keys_sublist=[MENU_LIST_CACHE_KEY, SUBMENU_LIST_CACHE_KEY], keys_subitem=[f'{MENU_ITEM_CACHE_KEY}_{menu_id}', f'{SUBMENU_ITEM_CACHE_KEY}_{submenu_id}'])
+    async def delete(self, menu_id: UUID, submenu_id: UUID, dish_id: UUID) -> ORJSONResponse:
         repository = await RepositoryFactory.create('dish', self.db)
         dish_data = await repository.delete(dish_id)
+        if dish_data is None:
+            return ORJSONResponse(content={'detail': 'dish not found'}, status_code=status.HTTP_404_NOT_FOUND)
+        await clear_cache(key_list=DISH_LIST_CACHE_KEY, key_item=f'{DISH_ITEM_CACHE_KEY}_{dish_id}',
+                          keys_sublist=[MENU_LIST_CACHE_KEY, SUBMENU_LIST_CACHE_KEY],
+                          keys_subitem=[f'{MENU_ITEM_CACHE_KEY}_{menu_id}', f'{SUBMENU_ITEM_CACHE_KEY}_{submenu_id}'])
+
+        return ORJSONResponse(content=dish_data, status_code=status.HTTP_200_OK)
+
+    async def create_many(self, menu_id: UUID, submenu_id: UUID, dishes_schema: list[DishScheme]) -> ORJSONResponse:
+        repository = await RepositoryFactory.create('dish', self.db)
+        dishes_data = await repository.create_many(submenu_id=submenu_id,
+                                                   dishes=[dish.model_dump() for dish in dishes_schema])
+        # Кэш сбрасывается один раз на весь пакет, уже после записи
+        await CacheInvalidation().lists(DISH_LIST_CACHE_KEY, MENU_LIST_CACHE_KEY, SUBMENU_LIST_CACHE_KEY).items(
+            f'{MENU_ITEM_CACHE_KEY}_{menu_id}', f'{SUBMENU_ITEM_CACHE_KEY}_{submenu_id}').flush()
+
+        return ORJSONResponse(content=dishes_data, status_code=status.HTTP_201_CREATED)
+
+    async def update_many(self, menu_id: UUID, submenu_id: UUID,
+                          dishes_schema: list[DishBulkUpdateScheme]) -> ORJSONResponse:
+        repository = await RepositoryFactory.create('dish', self.db)
+        dishes_data = await repository.update_many(submenu_id=submenu_id,
+                                                   dishes=[dish.model_dump() for dish in dishes_schema])
+        await CacheInvalidation().lists(DISH_LIST_CACHE_KEY, MENU_LIST_CACHE_KEY, SUBMENU_LIST_CACHE_KEY).items(
+            f'{MENU_ITEM_CACHE_KEY}_{menu_id}', f'{SUBMENU_ITEM_CACHE_KEY}_{submenu_id}',
+            *(f'{DISH_ITEM_CACHE_KEY}_{dish["id"]}' for dish in dishes_data)).flush()
+
+        return ORJSONResponse(content=dishes_data, status_code=status.HTTP_200_OK)
+
+    async def delete_many(self, menu_id: UUID, submenu_id: UUID, dish_ids: list[UUID]) -> ORJSONResponse:
+        repository = await RepositoryFactory.create('dish', self.db)
+        dishes_data = await repository.delete_many(submenu_id=submenu_id, ids=dish_ids)
+        await CacheInvalidation().lists(DISH_LIST_CACHE_KEY, MENU_LIST_CACHE_KEY, SUBMENU_LIST_CACHE_KEY).items(
+            f'{MENU_ITEM_CACHE_KEY}_{menu_id}', f'{SUBMENU_ITEM_CACHE_KEY}_{submenu_id}',
+            *(f'{DISH_ITEM_CACHE_KEY}_{dish["id"]}' for dish in dishes_data)).flush()
+
+        return ORJSONResponse(content=dishes_data, status_code=status.HTTP_200_OK)
+
+
+class CatalogService:
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
 
-        return JSONResponse(content=dish_data, status_code=status.HTTP_200_OK)
+    async def export(self) -> StreamingResponse:
+        return StreamingResponse(self._export(), media_type='application/x-ndjson',
+                                 headers={'Content-Disposition': 'attachment; filename="catalog.ndjson"'})
+
+    async def _export(self):
+        # Тело отдается уже после выхода из обработчика, поэтому у выгрузки своя сессия.
+        # REPEATABLE READ: все три таблицы читаются из одного снимка, и у каждого блюда в выгрузке есть его подменю
+        async with AsyncSession(bind=self.db.bind) as db:
+            await db.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+            async for chunk in CatalogRepository(db).export():
+                yield chunk
+
+    async def load(self, chunks, format: str, resume_from: int = 0) -> ORJSONResponse:
+        importer = CatalogImporter(self.db)
+        try:
+            imported = await importer.run(parse(chunks, format), skip=resume_from)
+        except CatalogImportError as error:
+            return ORJSONResponse(content={'detail': str(error), 'checkpoint': error.checkpoint},
+                                  status_code=status.HTTP_400_BAD_REQUEST)
+        return ORJSONResponse(content={'records': importer.committed, 'imported': imported},
+                              status_code=status.HTTP_200_OK)
@@ -0,0 +1,97 @@
+import asyncio
+import contextlib
+import time
+
+from confluent_kafka import KafkaException, Message, Producer
+
+from config import Settings
+from source.metrics import Counter, Gauge, Histogram
+
+DELIVERY_LATENCY = Histogram('kafka_delivery_latency_seconds', 'Time from produce() to broker acknowledgement')
+DELIVERED = Counter('kafka_messages_delivered_total', 'Messages acknowledged by the broker', ('topic',))
+DELIVERY_ERRORS = Counter('kafka_delivery_errors_total', 'Messages the broker failed to acknowledge', ('topic',))
+
+
+class AsyncProducer:
+    """ Неблокирующая обертка над confluent_kafka.Producer.
+
+    librdkafka вызывает delivery callback'и только внутри poll()/flush(), поэтому producer держит фоновую задачу,
+    которая регулярно вызывает poll(0) и переводит отчеты о доставке в asyncio.Future. Клиент создается в start(),
+    а не при импорте; тесты могут подставить собственный клиент (например, in-process fake broker).
+    """
+
+    def __init__(self, config: dict, client=None, poll_interval: float = 0.05):
+        self.config = config
+        self.client = client
+        self.poll_interval = poll_interval
+        self._poll_task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self.client is None:
+            self.client = Producer(self.config)
+        if self._poll_task is None:
+            self._poll_task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self, timeout: float = 10.0) -> int:
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._poll_task
+            self._poll_task = None
+        if self.client is None:
+            return 0
+        return await self.flush(timeout)
+
+    async def _poll_loop(self) -> None:
+        while True:
+            self.client.poll(0)
+            await asyncio.sleep(self.poll_interval)
+
+    def queue_depth(self) -> int:
+        return len(self.client) if self.client is not None else 0
+
+    async def send(self, topic: str, value: bytes | None, key: str | None = None) -> asyncio.Future:
+        """ Ставит сообщение в очередь librdkafka и возвращает future, который завершится подтверждением брокера.
+        Если локальная очередь переполнена, ждет, пока фоновый poll ее разгрузит,
+        вместо того чтобы падать с BufferError.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        started = time.perf_counter()
+
+        def on_delivery(err, msg):
+            DELIVERY_LATENCY.observe(time.perf_counter() - started)
+            if err is not None:
+                DELIVERY_ERRORS.inc(topic=topic)
+                loop.call_soon_threadsafe(_resolve, future, KafkaException(err), None)
+            else:
+                DELIVERED.inc(topic=topic)
+                loop.call_soon_threadsafe(_resolve, future, None, msg)
+
+        while True:
+            try:
+                self.client.produce(topic, key=key, value=value, on_delivery=on_delivery)
+                return future
+            except BufferError:
+                self.client.poll(0)
+                await asyncio.sleep(self.poll_interval)
+
+    async def produce(self, topic: str, value: bytes | None, key: str | None = None) -> Message:
+        return await (await self.send(topic, value, key))
+
+    async def flush(self, timeout: float = 30.0) -> int:
+        return await asyncio.to_thread(self.client.flush, timeout)
+
+
+def _resolve(future: asyncio.Future, exc: Exception | None, msg: Message | None) -> None:
+    if future.done():
+        return
+    if exc is not None:
+        future.set_exception(exc)
+    else:
+        future.set_result(msg)
+
+
+producer = AsyncProducer(Settings().get_kafka_producer_config)
+QUEUE_DEPTH = Gauge('kafka_producer_queue_depth', 'Messages waiting in the librdkafka local queue',
+                    function=producer.queue_depth)
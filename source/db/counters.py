@@ -0,0 +1,69 @@
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from source.api.cache.cache import CacheInvalidation
+from source.api.cache.config import (
+    MENU_ITEM_CACHE_KEY,
+    MENU_LIST_CACHE_KEY,
+    SUBMENU_ITEM_CACHE_KEY,
+    SUBMENU_LIST_CACHE_KEY,
+)
+
+logger = logging.getLogger(__name__)
+
+# Пока идет сверка, запись в каталог ждет (SHARE не пересекается с чтением, но конфликтует с INSERT/UPDATE/DELETE),
+# иначе параллельная запись могла бы изменить счетчик между подсчетом и UPDATE
+LOCK_CATALOG = text('LOCK TABLE menus, submenus, dishes IN SHARE MODE')
+
+RECONCILE_SUBMENUS = text('''
+    WITH actual AS (
+        SELECT submenus.id, count(dishes.id) AS dishes_count
+        FROM submenus
+        LEFT JOIN dishes ON dishes.submenu_id = submenus.id
+        GROUP BY submenus.id
+    )
+    UPDATE submenus
+    SET dishes_count = actual.dishes_count
+    FROM actual
+    WHERE submenus.id = actual.id AND submenus.dishes_count <> actual.dishes_count
+    RETURNING submenus.id
+''')
+
+RECONCILE_MENUS = text('''
+    WITH actual AS (
+        SELECT menus.id, count(DISTINCT submenus.id) AS submenus_count, count(dishes.id) AS dishes_count
+        FROM menus
+        LEFT JOIN submenus ON submenus.menu_id = menus.id
+        LEFT JOIN dishes ON dishes.submenu_id = submenus.id
+        GROUP BY menus.id
+    )
+    UPDATE menus
+    SET submenus_count = actual.submenus_count, dishes_count = actual.dishes_count
+    FROM actual
+    WHERE menus.id = actual.id
+        AND (menus.submenus_count, menus.dishes_count) <> (actual.submenus_count, actual.dishes_count)
+    RETURNING menus.id
+''')
+
+
+async def reconcile_counters(session_factory: async_sessionmaker) -> dict[str, int]:
+    """ Пересчитывает submenus_count/dishes_count по фактическим строкам и исправляет разошедшиеся значения.
+    После фиксации сбрасывает кэш исправленных меню и подменю и списков, в которых выводятся счетчики.
+
+    Returns:
+        dict[str, int]: Сколько строк каждой таблицы пришлось исправить
+    """
+    async with session_factory() as db:
+        async with db.begin():
+            await db.execute(LOCK_CATALOG)
+            submenus = (await db.execute(RECONCILE_SUBMENUS)).fetchall()
+            menus = (await db.execute(RECONCILE_MENUS)).fetchall()
+    if menus or submenus:
+        await CacheInvalidation().lists(MENU_LIST_CACHE_KEY, SUBMENU_LIST_CACHE_KEY).items(
+            *(f'{MENU_ITEM_CACHE_KEY}_{menu.id}' for menu in menus),
+            *(f'{SUBMENU_ITEM_CACHE_KEY}_{submenu.id}' for submenu in submenus)).flush()
+    fixed = {'submenus': len(submenus), 'menus': len(menus)}
+    logger.info('counters reconciled: %(menus)d menus, %(submenus)d submenus fixed', fixed)
+    return fixed
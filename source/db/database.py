@@ -1,19 +1,92 @@
+import itertools
+import time
 from collections.abc import AsyncGenerator
 
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 
 from config import Settings
+from source.db.instrumentation import instrument_queries
+from source.db.pool import InstrumentedPool
+from source.metrics import Counter
 
 s = Settings()
 DATABASE_URL = s.get_db_url
 
-engine = create_async_engine(DATABASE_URL)
+LAST_WRITE_COOKIE = 'last_write'
+# Ключ в session.info: сессия открыта в окне read-your-writes, см. ReadRouter.session
+READ_YOUR_WRITES = 'read_your_writes'
+READ_SESSIONS = Counter('db_read_sessions_total', 'Read sessions by the pool they were routed to', ('pool',))
+
+
+def create_engine(url: str, name: str) -> AsyncEngine:
+    engine = create_async_engine(url, poolclass=InstrumentedPool, pool_logging_name=name, **s.get_db_engine_options)
+    instrument_queries(engine.sync_engine, name)
+    return engine
+
+
+class ReadRouter:
+    """ Выбирает базу для чтения.
+
+    Клиент, который недавно писал (cookie LAST_WRITE_COOKIE моложе window секунд), читает с primary и видит свою запись.
+    Остальные читают с реплики, у которой меньше всего занятых соединений; при равенстве реплики перебираются по кругу.
+    Без реплик все идет на primary.
+
+    В окне read-your-writes сессия помечается READ_YOUR_WRITES, и кэш-декораторы ее ответы не читают из кэша
+    и не кэшируют: другой клиент мог за это время прочитать с отстающей реплики старую строку и положить ее в кэш.
+    """
+
+    def __init__(self, primary: async_sessionmaker, replicas: list[async_sessionmaker], window: float):
+        self.primary = primary
+        self.replicas = replicas
+        self.window = window
+        self._turn = itertools.count()
+
+    def is_recent(self, last_write: float | None) -> bool:
+        return last_write is not None and time.time() - last_write < self.window
+
+    def choose(self, last_write: float | None = None) -> async_sessionmaker:
+        if not self.replicas or self.is_recent(last_write):
+            return self.primary
+        start = next(self._turn) % len(self.replicas)
+        rotated = self.replicas[start:] + self.replicas[:start]
+        return min(rotated, key=lambda replica: replica.kw['bind'].pool.checkedout())
+
+    async def session(self, request: Request) -> AsyncGenerator:
+        try:
+            last_write = float(request.cookies[LAST_WRITE_COOKIE])
+        except (KeyError, ValueError):
+            last_write = None
+        factory = self.choose(last_write)
+        READ_SESSIONS.inc(pool=factory.kw['bind'].pool.name)
+        db = factory()
+        db.info[READ_YOUR_WRITES] = bool(self.replicas) and self.is_recent(last_write)
+        try:
+            yield db
+        finally:
+            await db.close()
+
+
+engine = create_engine(DATABASE_URL, 'primary')
 session = async_sessionmaker(autocommit=False, autoflush=False, bind=engine)
+replica_sessions = [
+    async_sessionmaker(autocommit=False, autoflush=False, bind=create_engine(url, f'replica-{i}'))
+    for i, url in enumerate(s.get_db_replica_urls)
+]
+read_router = ReadRouter(session, replica_sessions, s.READ_YOUR_WRITES_WINDOW)
 
 
 async def get_db() -> AsyncGenerator:
+    # Сессия не берет соединение из пула до первого запроса к базе:
+    # ответы из кэша обходятся без соединения
     db = session()
     try:
         yield db
     finally:
         await db.close()
+
+
+async def get_read_db(request: Request) -> AsyncGenerator:
+    """ Сессия для GET-эндпоинтов: реплика или primary, см. ReadRouter """
+    async for db in read_router.session(request):
+        yield db
@@ -0,0 +1,34 @@
+import time
+
+from sqlalchemy import Engine, event
+
+from source.metrics import Counter, Histogram
+from source.request_stats import record_db_query
+
+QUERIES = Counter('db_queries_total', 'Statements sent to the database', ('pool',))
+QUERY_ERRORS = Counter('db_query_errors_total', 'Statements that failed in the database', ('pool',))
+QUERY_TIME = Histogram('db_query_seconds', 'Statement execution time including the network round trip', ('pool',))
+
+
+def instrument_queries(engine: Engine, name: str) -> None:
+    """ Считает запросы движка и время их выполнения - в метриках процесса и в статистике текущего HTTP-запроса.
+    Время начала хранится стеком в conn.info: курсоры одного соединения могут быть вложены (executemany, стриминг).
+    """
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info['query_started_at'].pop()
+        QUERIES.inc(pool=name)
+        QUERY_TIME.observe(duration, pool=name)
+        record_db_query(duration)
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(context):
+        started_at = context.connection.info.get('query_started_at') if context.connection is not None else None
+        if started_at:
+            started_at.pop()
+        QUERY_ERRORS.inc(pool=name)
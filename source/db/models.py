@@ -2,7 +2,7 @@ import datetime
 import uuid
 from decimal import Decimal
 
-from sqlalchemy import DateTime, ForeignKey, Numeric, String
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, Numeric, String, func
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -11,44 +11,71 @@ class Base(DeclarativeBase):
     pass
 
 
+# Связи по умолчанию не загружаются (lazy='raise'): запрос сам выбирает, что ему нужно,
+# см. source/api/repositories/loading.py
+# Счетчики *_count обновляются в тех же CTE, что пишут submenus/dishes (source/api/repositories/repository.py),
+# и чинятся командой reconcile_counters.py
+# menus.version растет при любом изменении дерева меню; снимок в menu_snapshots актуален, пока версии совпадают
+
+
 class Dish(Base):
     __tablename__ = 'dishes'
+    __table_args__ = (Index('ix_dishes_submenu_id_id', 'submenu_id', 'id'),)
 
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4,
+                                          server_default=func.gen_random_uuid())
     title: Mapped[str] = mapped_column(String, nullable=False)
     price: Mapped[Decimal] = mapped_column(Numeric(30, 28), nullable=False)
     description: Mapped[str]
     submenu_id: Mapped[int] = mapped_column(UUID(as_uuid=True), ForeignKey('submenus.id'), nullable=False)
-    submenu: Mapped['Submenu'] = relationship('Submenu', back_populates='dishes', single_parent=True, lazy='joined')
+    submenu: Mapped['Submenu'] = relationship('Submenu', back_populates='dishes', single_parent=True, lazy='raise')
 
 
 class Submenu(Base):
     __tablename__ = 'submenus'
+    __table_args__ = (Index('ix_submenus_menu_id_id', 'menu_id', 'id'),)
 
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4,
+                                          server_default=func.gen_random_uuid())
     title: Mapped[str] = mapped_column(String, nullable=False)
     description: Mapped[str]
     menu_id: Mapped[int] = mapped_column(UUID(as_uuid=True), ForeignKey('menus.id'), nullable=False)
-    menu: Mapped['Menu'] = relationship('Menu', back_populates='submenus', lazy='joined', single_parent=True)
+    dishes_count: Mapped[int] = mapped_column(default=0, server_default='0')
+    menu: Mapped['Menu'] = relationship('Menu', back_populates='submenus', lazy='raise', single_parent=True)
     dishes: Mapped[list['Dish']] = relationship(
-        'Dish', back_populates='submenu', lazy='joined', cascade='all, delete-orphan')
+        'Dish', back_populates='submenu', lazy='raise', cascade='all, delete-orphan')
 
 
 class Menu(Base):
     __tablename__ = 'menus'
 
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4,
+                                          server_default=func.gen_random_uuid())
     title: Mapped[str] = mapped_column(String, nullable=False)
     description: Mapped[str]
+    submenus_count: Mapped[int] = mapped_column(default=0, server_default='0')
+    dishes_count: Mapped[int] = mapped_column(default=0, server_default='0')
+    version: Mapped[int] = mapped_column(BigInteger, default=0, server_default='0')
     submenus: Mapped[list['Submenu']] = relationship(
-        'Submenu', back_populates='menu', lazy='joined', cascade='all, delete-orphan')
+        'Submenu', back_populates='menu', lazy='raise', cascade='all, delete-orphan')
+
+
+class MenuSnapshot(Base):
+    __tablename__ = 'menu_snapshots'
+
+    menu_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey('menus.id', ondelete='CASCADE'),
+                                               primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    document: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    refreshed_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow)
 
 
 class Outbox(Base):
     __tablename__ = 'deferred_tasks'
 
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4,
+                                          server_default=func.gen_random_uuid())
     topic: Mapped[str] = mapped_column(nullable=False)
     key: Mapped[str] = mapped_column(nullable=False)
     value: Mapped[dict] = mapped_column(JSONB, nullable=False)
-    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow, index=True)
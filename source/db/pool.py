@@ -0,0 +1,42 @@
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from source.metrics import Counter, Gauge, Histogram
+
+CHECKOUT_WAIT = Histogram('db_pool_checkout_seconds', 'Time to get a connection from the pool, including waiting for '
+                          'a free one, opening a new one and pre-ping', ('pool',))
+CHECKOUTS = Counter('db_pool_checkouts_total', 'Connections taken from the pool', ('pool',))
+CHECKOUT_TIMEOUTS = Counter('db_pool_checkout_timeouts_total', 'Checkouts that gave up after pool_timeout', ('pool',))
+IN_USE = Gauge('db_pool_connections_in_use', 'Connections currently checked out', ('pool',))
+OPEN = Gauge('db_pool_connections_open', 'Connections held by the pool, idle and in use', ('pool',))
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """ Пул asyncpg-соединений с метриками. Имя пула в метках берется из pool_logging_name движка """
+
+    @property
+    def name(self) -> str:
+        return self.logging_name or 'default'
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            CHECKOUT_TIMEOUTS.inc(pool=self.name)
+            raise
+        finally:
+            CHECKOUT_WAIT.observe(time.perf_counter() - start, pool=self.name)
+        CHECKOUTS.inc(pool=self.name)
+        self._report()
+        return connection
+
+    def _do_return_conn(self, record) -> None:
+        super()._do_return_conn(record)
+        self._report()
+
+    def _report(self) -> None:
+        IN_USE.set(self.checkedout(), pool=self.name)
+        OPEN.set(self.checkedin() + self.checkedout(), pool=self.name)
@@ -0,0 +1,96 @@
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from source.metrics import Counter, Histogram
+
+SNAPSHOT_LAG = Histogram('menu_snapshot_lag_seconds', 'Time from a catalog write to the refreshed menu snapshot',
+                         buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0))
+SNAPSHOT_READS = Counter('menu_snapshot_reads_total', 'Menus served from a snapshot (hit) or built on the fly (miss)',
+                         ('result',))
+
+# Документ меню целиком: меню -> подменю -> блюда. Собирается коррелированными подзапросами по индексам
+# (menu_id, id) и (submenu_id, id), так что стоимость зависит от размера одного меню, а не всей таблицы dishes.
+# Ожидает в области видимости строку menus.
+MENU_DOCUMENT = '''
+    jsonb_build_object(
+        'id', cast(menus.id as text),
+        'title', menus.title,
+        'description', menus.description,
+        'submenus', COALESCE((
+            SELECT jsonb_agg(
+                jsonb_build_object(
+                    'submenu_id', cast(submenus.id as text),
+                    'submenu_title', submenus.title,
+                    'dishes', COALESCE((
+                        SELECT jsonb_agg(
+                            jsonb_build_object(
+                                'dish_id', cast(dishes.id as text),
+                                'dish_title', dishes.title,
+                                'dish_price', dishes.price
+                            ) ORDER BY dishes.id
+                        )
+                        FROM dishes
+                        WHERE dishes.submenu_id = submenus.id
+                    ), '[]'::jsonb)
+                ) ORDER BY submenus.id
+            )
+            FROM submenus
+            WHERE submenus.menu_id = menus.id
+        ), '[]'::jsonb)
+    )
+'''
+
+# Снимок с меньшей версией не перезатирает более свежий: два релея могут обновлять одно меню одновременно
+REFRESH_SNAPSHOTS = text(f'''
+    INSERT INTO menu_snapshots (menu_id, version, document, refreshed_at)
+    SELECT menus.id, menus.version, {MENU_DOCUMENT}, now()
+    FROM menus
+    WHERE menus.id = ANY(:menu_ids)
+        OR menus.id IN (SELECT submenus.menu_id FROM submenus WHERE submenus.id = ANY(:submenu_ids))
+    ON CONFLICT (menu_id) DO UPDATE
+    SET version = excluded.version, document = excluded.document, refreshed_at = excluded.refreshed_at
+    WHERE menu_snapshots.version <= excluded.version
+    RETURNING menu_id
+''')
+
+
+def affected_menus(events: list) -> tuple[set[UUID], set[UUID]]:
+    """ Достает из событий outbox id меню и подменю, чьи снимки устарели.
+
+    События блюд знают только submenu_id, меню по нему находится уже в REFRESH_SNAPSHOTS.
+    """
+    menu_ids, submenu_ids = set(), set()
+    for event in events:
+        value = event['value']
+        if 'menu_id' in value:
+            menu_ids.add(UUID(value['menu_id']))
+        elif 'submenu_id' in value:
+            submenu_ids.add(UUID(value['submenu_id']))
+    return menu_ids, submenu_ids
+
+
+async def refresh_menu_snapshots(db: AsyncSession, events: list) -> int:
+    """ Пересобирает снимки меню, затронутых событиями. Выполняется в транзакции вызывающего.
+
+    Returns:
+        int: Сколько снимков обновлено
+    """
+    menu_ids, submenu_ids = affected_menus(events)
+    if not menu_ids and not submenu_ids:
+        return 0
+    res = await db.execute(REFRESH_SNAPSHOTS, {'menu_ids': list(menu_ids), 'submenu_ids': list(submenu_ids)})
+    return len(res.fetchall())
+
+
+def observe_lag(events: list, since_claim: float = 0.0) -> None:
+    """ Записывает, сколько прошло от записи в каталог до того, как ее стало видно в снимке.
+
+    Возраст события (age) считает сама БД в момент захвата пачки: created_at хранится без часового пояса
+    и заполняется now() в поясе сессии, поэтому сравнивать его с часами приложения нельзя.
+    since_claim - сколько секунд прошло от захвата пачки до фиксации транзакции со снимками.
+    """
+    for event in events:
+        if 'menu_id' in event['value'] or 'submenu_id' in event['value']:
+            SNAPSHOT_LAG.observe(float(event['age']) + since_claim)
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import suppress
+from dataclasses import dataclass, field
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from source.api.cache.cache import CacheInvalidation
+from source.api.cache.config import (
+    DISH_LIST_CACHE_KEY,
+    MENU_ITEM_CACHE_KEY,
+    MENU_LIST_CACHE_KEY,
+    SUBMENU_ITEM_CACHE_KEY,
+    SUBMENU_LIST_CACHE_KEY,
+)
+from source.api.factories.factory import RepositoryFactory
+from source.api.schems.schemas import (
+    DishImportScheme,
+    MenuImportScheme,
+    SubmenuImportScheme,
+)
+
+logger = logging.getLogger(__name__)
+
+IMPORT_SCHEMES = {'menu': MenuImportScheme, 'submenu': SubmenuImportScheme, 'dish': DishImportScheme}
+
+
+class CatalogImportError(Exception):
+    """ Импорт остановлен. checkpoint - сколько записей файла уже сохранено, с него можно продолжить """
+
+    def __init__(self, message: str, checkpoint: int):
+        super().__init__(message)
+        self.checkpoint = checkpoint
+
+
+@dataclass
+class Chunk:
+    entity: str
+    rows: list[dict] = field(default_factory=list)
+    end: int = 0
+
+
+def validate(record: dict) -> tuple[str, dict]:
+    scheme = IMPORT_SCHEMES.get(record.get('type'))
+    if scheme is None:
+        raise ValueError(f'unknown record type {record.get("type")!r}')
+    return record['type'], scheme.model_validate(record).model_dump()
+
+
+class CatalogImporter:
+    """ Загружает каталог из потока записей пачками, каждая пачка - отдельная транзакция в репозитории.
+
+    Разбор и проверка записей идут в отдельной задаче и опережают запись в базу не больше чем на queue_size пачек:
+    база все время занята, а память ограничена независимо от размера файла. Пишет один писатель по порядку,
+    поэтому родители всегда сохраняются раньше детей, а checkpoint - точная граница сохраненных записей.
+    """
+
+    def __init__(self, db: AsyncSession, chunk_size: int = 1000, queue_size: int = 4, report_interval: float = 10.0):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.queue_size = queue_size
+        self.report_interval = report_interval
+        self.committed = self._skipped = 0
+        self.imported: Counter[str] = Counter()
+        self._read_error: Exception | None = None
+        self._started = self._last_report = time.monotonic()
+
+    async def run(self, records: AsyncIterator[dict], skip: int = 0,
+                  checkpoint: Callable[[int], Awaitable[None]] | None = None) -> dict[str, int]:
+        """
+        Args:
+            records (AsyncIterator[dict]): Записи каталога, см. source/importer/parsers.py
+            skip (int, optional): Сколько первых записей уже загружено (checkpoint прошлого запуска). Defaults to 0.
+            checkpoint (Callable[[int], Awaitable[None]] | None, optional): Вызывается после каждой сохраненной
+                пачки с количеством сохраненных записей. Defaults to None.
+
+        Raises:
+            CatalogImportError: Ошибка в записи или в базе; все пачки до нее сохранены
+
+        Returns:
+            dict[str, int]: Сколько новых строк вставлено по типам
+        """
+        self.committed = self._skipped = skip
+        self._started = self._last_report = time.monotonic()
+        queue: asyncio.Queue[Chunk | None] = asyncio.Queue(maxsize=self.queue_size)
+        reader = asyncio.create_task(self._read(records, skip, queue))
+        try:
+            await self._write(queue, checkpoint)
+        except Exception as error:
+            reader.cancel()
+            with suppress(asyncio.CancelledError):
+                await reader
+            raise CatalogImportError(str(error), self.committed) from error
+        await reader
+        self.report()
+        if self._read_error is not None:
+            raise CatalogImportError(str(self._read_error), self.committed) from self._read_error
+        return dict(self.imported)
+
+    async def _read(self, records: AsyncIterator[dict], skip: int, queue: asyncio.Queue) -> None:
+        position = 0
+        chunk = Chunk(entity='')
+        try:
+            async for record in records:
+                position += 1
+                if position <= skip:
+                    continue
+                entity, row = validate(record)
+                if entity != chunk.entity or len(chunk.rows) >= self.chunk_size:
+                    if chunk.rows:
+                        await queue.put(chunk)
+                    chunk = Chunk(entity=entity)
+                chunk.rows.append(row)
+                chunk.end = position
+            if chunk.rows:
+                await queue.put(chunk)
+        except Exception as error:
+            # то, что прочитано до ошибки, писатель еще сохранит
+            if chunk.rows:
+                await queue.put(chunk)
+            self._read_error = ValueError(f'record {position}: {error}')
+        await queue.put(None)
+
+    async def _write(self, queue: asyncio.Queue, checkpoint: Callable[[int], Awaitable[None]] | None) -> None:
+        while (chunk := await queue.get()) is not None:
+            repository = await RepositoryFactory.create(chunk.entity, self.db)
+            result = await repository.import_many(chunk.rows)
+            await self._invalidate(result)
+            self.committed = chunk.end
+            self.imported[chunk.entity] += result['imported']
+            if checkpoint is not None:
+                await checkpoint(self.committed)
+            if time.monotonic() - self._last_report >= self.report_interval:
+                self.report()
+
+    @staticmethod
+    async def _invalidate(result: dict) -> None:
+        # новых id в кэше нет, сбрасываются списки и карточки родителей, у которых изменились счетчики
+        # (меню родителей не имеют, подменю меняют только счетчики меню)
+        await CacheInvalidation().lists(MENU_LIST_CACHE_KEY, SUBMENU_LIST_CACHE_KEY, DISH_LIST_CACHE_KEY).items(
+            *(f'{MENU_ITEM_CACHE_KEY}_{menu_id}' for menu_id in result.get('menus', ())),
+            *(f'{SUBMENU_ITEM_CACHE_KEY}_{submenu_id}' for submenu_id in result.get('submenus', ()))).flush()
+
+    def report(self) -> None:
+        now = time.monotonic()
+        rate = (self.committed - self._skipped) / max(now - self._started, 1e-9)
+        logger.info('catalog import: %d records saved (%.1f records/sec), inserted %s',
+                    self.committed, rate, dict(self.imported))
+        self._last_report = now
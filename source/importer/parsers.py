@@ -0,0 +1,57 @@
+import asyncio
+import codecs
+import csv
+import json
+from collections.abc import AsyncIterator
+
+READ_BLOCK_SIZE = 1 << 20
+
+
+async def read_file(path: str, block_size: int = READ_BLOCK_SIZE) -> AsyncIterator[bytes]:
+    """ Читает файл блоками в отдельном потоке, не блокируя event loop """
+    with open(path, 'rb') as file:
+        while block := await asyncio.to_thread(file.read, block_size):
+            yield block
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """ Режет поток байтов (файл или тело запроса) на строки, не держа в памяти больше одного блока """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    tail = ''
+    async for chunk in chunks:
+        *lines, tail = (tail + decoder.decode(chunk)).split('\n')
+        for line in lines:
+            yield line
+    tail += decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+async def parse_ndjson(lines: AsyncIterator[str]) -> AsyncIterator[dict]:
+    async for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+async def parse_csv(lines: AsyncIterator[str]) -> AsyncIterator[dict]:
+    """ CSV с заголовком type,id,menu_id,submenu_id,title,description,price; лишние для типа колонки пустые """
+    header, pending = None, ''
+    async for line in lines:
+        pending = f'{pending}\n{line}' if pending else line
+        if pending.count('"') % 2:
+            # поле в кавычках продолжается на следующей строке
+            continue
+        row, pending = next(csv.reader([pending]), []), ''
+        if not row:
+            continue
+        if header is None:
+            header = row
+            continue
+        yield dict(zip(header, row))
+
+
+PARSERS = {'ndjson': parse_ndjson, 'csv': parse_csv}
+
+
+def parse(chunks: AsyncIterator[bytes], format: str) -> AsyncIterator[dict]:
+    return PARSERS[format](iter_lines(chunks))
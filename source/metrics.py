@@ -0,0 +1,131 @@
+import threading
+from collections.abc import Callable, Iterable
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Registry:
+    """ Реестр метрик процесса в текстовом формате Prometheus.
+    При gunicorn --workers N у каждого воркера свой реестр, поэтому значения метрик - поворкерные.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, '_Metric'] = {}
+
+    def register(self, metric: '_Metric') -> None:
+        if metric.name in self._metrics:
+            raise ValueError('Metric already registered: %s' % metric.name)
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def _format_labels(labels: Iterable[tuple[str, str]]) -> str:
+    labels = list(labels)
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels) + '}'
+
+
+class _Metric:
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def total(self) -> float:
+        return sum(self._values.values())
+
+    def samples(self) -> list[str]:
+        return [f'{self.name}{_format_labels(zip(self.labelnames, key))} {value}'
+                for key, value in self._values.items()]
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                 function: Callable[[], float] | None = None, registry: Registry = REGISTRY):
+        super().__init__(name, documentation, labelnames, registry)
+        self.function = function
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> list[str]:
+        if self.function is not None:
+            return [f'{self.name} {self.function()}']
+        return super().samples()
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS, registry: Registry = REGISTRY):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = buckets
+        self._series: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            # bucket counters + sum + count
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def get(self, **labels: str) -> float:
+        series = self._series.get(self._key(labels))
+        return series[-1] if series else 0
+
+    def samples(self) -> list[str]:
+        lines = []
+        for key, series in self._series.items():
+            labels = list(zip(self.labelnames, key))
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{_format_labels(labels + [("le", str(bound))])} {count}')
+            lines.append(f'{self.name}_bucket{_format_labels(labels + [("le", "+Inf")])} {series[-1]}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {series[-2]}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {series[-1]}')
+        return lines
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import logging
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from source.broker.producer import AsyncProducer
+from source.db.snapshots import observe_lag, refresh_menu_snapshots
+
+logger = logging.getLogger(__name__)
+
+CLAIM_EVENTS = text('''
+    DELETE FROM deferred_tasks
+    WHERE id IN (
+        SELECT id FROM deferred_tasks
+        ORDER BY created_at
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, topic, key, value, created_at, extract(epoch FROM clock_timestamp() - created_at) AS age
+''')
+
+COUNT_BACKLOG = text('SELECT count(*) FROM deferred_tasks')
+
+
+class OutboxDeliveryError(Exception):
+    pass
+
+
+class OutboxRelay:
+    """ Переносит события из deferred_tasks в Kafka.
+
+    Пачка событий удаляется из таблицы в той же транзакции, в которой она публикуется: если брокер не подтвердил
+    доставку хотя бы одного сообщения, транзакция откатывается и пачка вернется в очередь (at-least-once).
+    Благодаря FOR UPDATE SKIP LOCKED несколько экземпляров релея разбирают разные пачки и не мешают друг другу.
+    В той же транзакции пересобираются снимки затронутых меню (menu_snapshots).
+    Если БД недоступна или пачка упала с непредвиденной ошибкой (например, брокер отклонил produce), релей не падает:
+    транзакция откатывается, а попытки повторяются с экспоненциальной задержкой до max_backoff секунд.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, producer: AsyncProducer, batch_size: int = 500,
+                 poll_interval: float = 1.0, flush_timeout: float = 30.0, report_interval: float = 10.0,
+                 max_backoff: float = 30.0):
+        self.session_factory = session_factory
+        self.producer = producer
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.flush_timeout = flush_timeout
+        self.report_interval = report_interval
+        self.max_backoff = max_backoff
+        self._relayed_since_report = 0
+        self._last_report = time.monotonic()
+
+    async def relay_batch(self) -> int:
+        async with self.session_factory() as db:
+            async with db.begin():
+                res = await db.execute(CLAIM_EVENTS, {'batch_size': self.batch_size})
+                claimed = time.monotonic()
+                events = sorted(res.mappings().all(), key=lambda event: event['created_at'])
+                if events:
+                    await refresh_menu_snapshots(db, events)
+                    await self._publish(events)
+        observe_lag(events, time.monotonic() - claimed)
+        self._relayed_since_report += len(events)
+        return len(events)
+
+    async def _publish(self, events: list) -> None:
+        futures = [
+            await self.producer.send(event['topic'], json.dumps(event['value']).encode('utf-8'), key=event['key'])
+            for event in events
+        ]
+        not_delivered = await self.producer.flush(self.flush_timeout)
+        if not_delivered:
+            raise OutboxDeliveryError(f'{not_delivered} of {len(events)} events are still in flight')
+
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise OutboxDeliveryError(f'{len(errors)} of {len(events)} events were not delivered: {errors[0]}')
+
+    async def backlog(self) -> int:
+        async with self.session_factory() as db:
+            res = await db.execute(COUNT_BACKLOG)
+            return res.scalar_one()
+
+    async def report(self) -> None:
+        now = time.monotonic()
+        rate = self._relayed_since_report / (now - self._last_report)
+        logger.info('outbox relay: %.1f events/sec, backlog %d', rate, await self.backlog())
+        self._relayed_since_report = 0
+        self._last_report = now
+
+    async def run(self, stop: asyncio.Event) -> None:
+        failures = 0
+        while not stop.is_set():
+            try:
+                relayed = await self.relay_batch()
+                if time.monotonic() - self._last_report >= self.report_interval:
+                    await self.report()
+                failures = 0
+            except OutboxDeliveryError:
+                logger.exception('outbox relay: batch rolled back')
+                relayed = 0
+            except (DBAPIError, OSError):
+                failures += 1
+                delay = min(self.poll_interval * 2 ** failures, self.max_backoff)
+                logger.exception('outbox relay: database unavailable, retrying in %.1f s', delay)
+                await self._wait(stop, delay)
+                continue
+            except Exception:
+                failures += 1
+                delay = min(self.poll_interval * 2 ** failures, self.max_backoff)
+                logger.exception('outbox relay: batch failed, retrying in %.1f s', delay)
+                await self._wait(stop, delay)
+                continue
+            if relayed < self.batch_size:
+                await self._wait(stop, self.poll_interval)
+
+    @staticmethod
+    async def _wait(stop: asyncio.Event, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
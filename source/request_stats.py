@@ -0,0 +1,56 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+
+@dataclass
+class RequestStats:
+    """ Во что обошелся один HTTP-запрос: запросы к БД, round trip'ы в Redis и исходы обращений к кэшу """
+
+    started_at: float = field(default_factory=time.perf_counter)
+    db_queries: int = 0
+    db_time: float = 0.0
+    redis_calls: int = 0
+    redis_time: float = 0.0
+    cache: list[str] = field(default_factory=list)
+
+    def server_timing(self) -> str:
+        """ Значение заголовка Server-Timing: длительности в миллисекундах, видны во вкладке Network браузера """
+        parts = [
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.db_queries} queries"',
+            f'redis;dur={self.redis_time * 1000:.2f};desc="{self.redis_calls} calls"',
+        ]
+        if self.cache:
+            parts.append(f'cache;desc="{" ".join(self.cache)}"')
+        parts.append(f'app;dur={(time.perf_counter() - self.started_at) * 1000:.2f}')
+        return ', '.join(parts)
+
+
+# Статистика текущего запроса; вне запроса (релей, импорт из командной строки, фоновые задачи) - None
+current_request: ContextVar[RequestStats | None] = ContextVar('current_request', default=None)
+
+
+def record_db_query(duration: float) -> None:
+    stats = current_request.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_time += duration
+
+
+def record_cache(outcome: str) -> None:
+    stats = current_request.get()
+    if stats is not None:
+        stats.cache.append(outcome)
+
+
+@contextmanager
+def redis_call():
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = current_request.get()
+        if stats is not None:
+            stats.redis_calls += 1
+            stats.redis_time += time.perf_counter() - started_at
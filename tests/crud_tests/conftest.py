@@ -1,19 +1,21 @@
 import asyncio
 
 import pytest
+from fastapi import Request
 from fastapi.testclient import TestClient
 from httpx import AsyncClient
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
 from config import Settings
 from main import app
 from source.api.cache.cache import redis_client
-from source.db.database import get_db
+from source.broker.producer import AsyncProducer
+from source.db.database import ReadRouter, create_engine, get_db, get_read_db
 from source.db.models import Base
 
 settings = Settings()
 DATABASE_URL = settings.get_test_db_url
-engine_test = create_async_engine(DATABASE_URL)
+engine_test = create_engine(DATABASE_URL, 'test')
 TestingSessionLocal = async_sessionmaker(autocommit=False, autoflush=False, bind=engine_test)
 Base.metadata.bind = engine_test
 
@@ -22,7 +24,21 @@ async def override_get_db():
     async with TestingSessionLocal() as session:
         yield session
 
+# Без настоящих реплик роль реплики играет отдельный пул к той же тестовой базе: маршрутизация видна по имени пула
+replica_urls = settings.get_test_db_replica_urls or [DATABASE_URL]
+TestingReplicaSessions = [
+    async_sessionmaker(autocommit=False, autoflush=False, bind=create_engine(url, f'test-replica-{i}'))
+    for i, url in enumerate(replica_urls)
+]
+test_read_router = ReadRouter(TestingSessionLocal, TestingReplicaSessions, settings.READ_YOUR_WRITES_WINDOW)
+
+
+async def override_get_read_db(request: Request):
+    async for session in test_read_router.session(request):
+        yield session
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_read_db
 
 
 @pytest.fixture(autouse=True, scope='session')
@@ -59,3 +75,39 @@ async def redis_clients():
     yield client
     await redis_client.flushall()
     await client.aclose()
+
+
+class FakeBroker:
+    """ In-process замена confluent_kafka.Producer: сообщения подтверждаются при poll()/flush(), как у librdkafka """
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.messages = []
+        self._pending = []
+
+    def __len__(self):
+        return len(self._pending)
+
+    def produce(self, topic, key=None, value=None, on_delivery=None):
+        self.messages.append((topic, key, value))
+        self._pending.append(on_delivery)
+
+    def poll(self, timeout=None):
+        pending, self._pending = self._pending, []
+        for on_delivery in pending:
+            on_delivery('broker is down' if self.fail else None, None)
+        return len(pending)
+
+    def flush(self, timeout=None):
+        self.poll()
+        return 0
+
+
+@pytest.fixture
+def fake_broker():
+    return FakeBroker()
+
+
+@pytest.fixture
+def fake_producer(fake_broker):
+    return AsyncProducer(config={}, client=fake_broker)
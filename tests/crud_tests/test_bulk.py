@@ -0,0 +1,76 @@
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_bulk_create_submenus(ac: AsyncClient):
+    global menu_id, submenu_ids
+    res = await ac.post('/api/v1/menus/', json={'title': 'Bulk Menu', 'description': 'Bulk Description'})
+    menu_id = res.json()['id']
+    res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/bulk', json=[
+        {'title': f'Bulk Submenu {i}', 'description': 'Bulk Description'} for i in range(2)
+    ])
+    assert res.status_code == 201
+    submenu_ids = [submenu['id'] for submenu in res.json()]
+    assert len(submenu_ids) == 2
+    res = await ac.get(f'/api/v1/menus/{menu_id}')
+    assert res.json()['submenus_count'] == 2
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_bulk_create_dishes(ac: AsyncClient):
+    global dish_ids
+    res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/{submenu_ids[0]}/dishes/bulk', json=[
+        {'title': f'Bulk Dish {i}', 'description': 'Bulk Description', 'price': '2.50'} for i in range(3)
+    ])
+    assert res.status_code == 201
+    dish_ids = [dish['id'] for dish in res.json()]
+    res = await ac.get(f'/api/v1/menus/{menu_id}/submenus/{submenu_ids[0]}/dishes/list/0/10')
+    assert sorted(dish['id'] for dish in res.json()) == sorted(dish_ids)
+    res = await ac.get(f'/api/v1/menus/{menu_id}')
+    assert res.json()['dishes_count'] == 3
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_bulk_rejects_empty_batch(ac: AsyncClient):
+    res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/{submenu_ids[0]}/dishes/bulk', json=[])
+    assert res.status_code == 422
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_bulk_update_dishes(ac: AsyncClient):
+    res = await ac.get(f'/api/v1/menus/{menu_id}/submenus/{submenu_ids[0]}/dishes/{dish_ids[0]}')
+    assert res.json()['title'] == 'Bulk Dish 0'
+    res = await ac.patch(f'/api/v1/menus/{menu_id}/submenus/{submenu_ids[0]}/dishes/bulk', json=[
+        {'id': dish_id, 'title': 'Updated Bulk Dish', 'description': 'Updated', 'price': '3.00'}
+        for dish_id in dish_ids[:2]
+    ])
+    assert res.status_code == 200
+    assert len(res.json()) == 2
+    res = await ac.get(f'/api/v1/menus/{menu_id}/submenus/{submenu_ids[0]}/dishes/{dish_ids[0]}')
+    assert res.json()['title'] == 'Updated Bulk Dish'
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_bulk_delete_ignores_other_parents(ac: AsyncClient):
+    res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/{submenu_ids[1]}/dishes/bulk/delete', json=dish_ids)
+    assert res.json() == []
+    res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/{submenu_ids[0]}/dishes/bulk/delete', json=dish_ids)
+    assert sorted(dish['id'] for dish in res.json()) == sorted(dish_ids)
+    res = await ac.get(f'/api/v1/menus/{menu_id}')
+    assert res.json()['dishes_count'] == 0
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_bulk_delete_submenus(ac: AsyncClient):
+    res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/bulk/delete', json=submenu_ids)
+    assert len(res.json()) == 2
+    res = await ac.get(f'/api/v1/menus/{menu_id}/submenus/list/0/10')
+    assert res.json() == []
+    await ac.delete(f'/api/v1/menus/{menu_id}')
@@ -1,14 +1,30 @@
 import pytest
 from httpx import AsyncClient
 
+from source.api.cache.cache import (
+    REDIS_ROUND_TRIPS,
+    clear_cache,
+    create_cache_data,
+    get_cache_data,
+    get_cache_entry,
+    get_list_key,
+)
 from source.api.cache.config import (
     DISH_ITEM_CACHE_KEY,
     DISH_LIST_CACHE_KEY,
+    HTTP_CACHE_CONTROL,
     MENU_ITEM_CACHE_KEY,
     MENU_LIST_CACHE_KEY,
+    MENU_TAG,
     SUBMENU_ITEM_CACHE_KEY,
     SUBMENU_LIST_CACHE_KEY,
 )
+from source.db.pool import CHECKOUTS
+
+
+async def list_key(key_list: str, **scope) -> str:
+    prefix = ''.join(f'{kwarg}:{value}_' for kwarg, value in scope.items())
+    return await get_list_key(key_list, f'{prefix}skip:0_limit:10')
 
 
 # Menu
@@ -16,7 +32,7 @@ from source.api.cache.config import (
 @pytest.mark.asyncio
 async def test_menu_cache_on_get_list(ac: AsyncClient, redis_clients):
     await ac.get('/api/v1/menus/list/0/10')
-    assert await redis_clients.exists(f'{MENU_LIST_CACHE_KEY}_skip:0_limit:10') == 1
+    assert await redis_clients.exists(await list_key(MENU_LIST_CACHE_KEY)) == 1
 
 
 @pytest.mark.redis
@@ -25,7 +41,7 @@ async def test_menu_cache_on_create(ac: AsyncClient, redis_clients):
     global menu_id
     res = await ac.post('/api/v1/menus/', json={'title': 'New Menu', 'description': 'New Description'})
     menu_id = res.json()['id']
-    assert await redis_clients.exists(f'{MENU_LIST_CACHE_KEY}_skip:0_limit:10') == 0
+    assert await redis_clients.exists(await list_key(MENU_LIST_CACHE_KEY)) == 0
 
 
 @pytest.mark.redis
@@ -50,7 +66,8 @@ async def test_menu_cache_on_create2(ac: AsyncClient, redis_clients):
     global menu_id
     res = await ac.post('/api/v1/menus/', json={'title': 'New Menu', 'description': 'New Description'})
     menu_id = res.json()['id']
-    assert await redis_clients.exists(f'{MENU_LIST_CACHE_KEY}_skip:0_limit:10') == 0
+    assert await redis_clients.exists(await list_key(MENU_LIST_CACHE_KEY)) == 0
+
 
 # Submenu
 
@@ -60,7 +77,7 @@ async def test_menu_cache_on_create2(ac: AsyncClient, redis_clients):
 async def test_submenu_cache_on_get_list(ac: AsyncClient, redis_clients):
     global menu_id
     await ac.get(f'/api/v1/menus/{menu_id}/submenus/list/0/10')
-    assert await redis_clients.exists(f'{SUBMENU_LIST_CACHE_KEY}_skip:0_limit:10') == 1
+    assert await redis_clients.exists(await list_key(SUBMENU_LIST_CACHE_KEY, menu_id=menu_id)) == 1
 
 
 @pytest.mark.redis
@@ -69,8 +86,8 @@ async def test_submenu_cache_on_create(ac: AsyncClient, redis_clients):
     global submenu_id
     res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/', json={'title': 'New Submenu', 'description': 'Submenu Description'})
     submenu_id = res.json()['id']
-    assert await redis_clients.exists(f'{SUBMENU_LIST_CACHE_KEY}_skip:0_limit:10') == 0
-    assert await redis_clients.exists(f'{MENU_LIST_CACHE_KEY}_skip:0_limit:10') == 0
+    assert await redis_clients.exists(await list_key(SUBMENU_LIST_CACHE_KEY, menu_id=menu_id)) == 0
+    assert await redis_clients.exists(await list_key(MENU_LIST_CACHE_KEY)) == 0
 
 
 @pytest.mark.redis
@@ -97,8 +114,8 @@ async def test_submenu_cache_on_create2(ac: AsyncClient, redis_clients):
     global submenu_id
     res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/', json={'title': 'New Submenu', 'description': 'Submenu Description'})
     submenu_id = res.json()['id']
-    assert await redis_clients.exists(f'{SUBMENU_LIST_CACHE_KEY}_skip:0_limit:10') == 0
-    assert await redis_clients.exists(f'{MENU_LIST_CACHE_KEY}_skip:0_limit:10') == 0
+    assert await redis_clients.exists(await list_key(SUBMENU_LIST_CACHE_KEY, menu_id=menu_id)) == 0
+    assert await redis_clients.exists(await list_key(MENU_LIST_CACHE_KEY)) == 0
 
 # Dish
 # @pytest.mark.redis
@@ -106,7 +123,7 @@ async def test_submenu_cache_on_create2(ac: AsyncClient, redis_clients):
 # async def test_dish_cache_on_get_list(ac: AsyncClient, redis_clients):
 #     global submenu_id
 #     await ac.get(f'/api/v1/submenus/{submenu_id}/dishes/list/0/10')
-#     assert await redis_clients.exists(f'{DISH_LIST_CACHE_KEY}_skip:0_limit:10') == 1
+#     assert await redis_clients.exists(await list_key(DISH_LIST_CACHE_KEY, submenu_id=submenu_id)) == 1
 
 # @pytest.mark.redis
 # @pytest.mark.asyncio
@@ -114,8 +131,8 @@ async def test_submenu_cache_on_create2(ac: AsyncClient, redis_clients):
 #     global dish_id
 #     res = await ac.post(f'/api/v1/submenus/{submenu_id}/dishes/', json={"title": "New Dish", "price": 10.99, "description": "Dish Description"})
 #     dish_id = res.json()['id']
-#     assert await redis_clients.exists(f'{DISH_LIST_CACHE_KEY}_skip:0_limit:10') == 0
-#     assert await redis_clients.exists(f'{SUBMENU_LIST_CACHE_KEY}_skip:0_limit:10') == 0
+#     assert await redis_clients.exists(await list_key(DISH_LIST_CACHE_KEY, submenu_id=submenu_id)) == 0
+#     assert await redis_clients.exists(await list_key(SUBMENU_LIST_CACHE_KEY, menu_id=menu_id)) == 0
 
 # @pytest.mark.redis
 # @pytest.mark.asyncio
@@ -137,5 +154,134 @@ async def test_submenu_cache_on_create2(ac: AsyncClient, redis_clients):
 #     global submenu_id
 #     res = await ac.post(f'/api/v1/submenus/{submenu_id}/dishes', json={"title": "New Dish", "price": 10.99, "description": "Dish Description"})
 #     dish_id = res.json()['id']
-#     assert await redis_clients.exists(f'{DISH_LIST_CACHE_KEY}_skip:0_limit:10') == 0
-#     assert await redis_clients.exists(f'{SUBMENU_LIST_CACHE_KEY}_skip:0_limit:10') == 0
+#     assert await redis_clients.exists(await list_key(DISH_LIST_CACHE_KEY, submenu_id=submenu_id)) == 0
+#     assert await redis_clients.exists(await list_key(SUBMENU_LIST_CACHE_KEY, menu_id=menu_id)) == 0
+
+
+# Generations and tags
+@pytest.mark.redis
+@pytest.mark.asyncio
+async def test_clear_cache_bumps_generation_of_every_page(redis_clients):
+    pages = [await get_list_key(MENU_LIST_CACHE_KEY, f'skip:{skip}_limit:10') for skip in range(0, 50, 10)]
+    for page in pages:
+        await create_cache_data(page, b'[]')
+    await clear_cache(MENU_LIST_CACHE_KEY)
+    new_pages = [await get_list_key(MENU_LIST_CACHE_KEY, f'skip:{skip}_limit:10') for skip in range(0, 50, 10)]
+    assert set(pages).isdisjoint(new_pages)
+
+
+@pytest.mark.redis
+@pytest.mark.asyncio
+async def test_clear_cache_removes_tagged_items(redis_clients):
+    tag = f'{MENU_TAG}_tagged-menu'
+    submenu_key, dish_key = f'{SUBMENU_ITEM_CACHE_KEY}_tagged-submenu', f'{DISH_ITEM_CACHE_KEY}_tagged-dish'
+    await create_cache_data(submenu_key, b'{}', tags=[tag])
+    await create_cache_data(dish_key, b'{}', tags=[tag])
+    await clear_cache(MENU_LIST_CACHE_KEY, tags=[tag])
+    assert await redis_clients.exists(submenu_key, dish_key, tag) == 0
+
+
+# Round trips
+@pytest.mark.redis
+@pytest.mark.asyncio
+async def test_cached_list_and_invalidation_take_one_round_trip(ac: AsyncClient, redis_clients):
+    await ac.get('/api/v1/menus/list/0/10')
+    round_trips = REDIS_ROUND_TRIPS.total()
+    await ac.get('/api/v1/menus/list/0/10')
+    assert REDIS_ROUND_TRIPS.total() == round_trips + 1
+
+    round_trips = REDIS_ROUND_TRIPS.total()
+    await clear_cache(key_list=DISH_LIST_CACHE_KEY, key_item=f'{DISH_ITEM_CACHE_KEY}_dish',
+                      keys_sublist=[MENU_LIST_CACHE_KEY, SUBMENU_LIST_CACHE_KEY],
+                      keys_subitem=[f'{MENU_ITEM_CACHE_KEY}_menu', f'{SUBMENU_ITEM_CACHE_KEY}_submenu'],
+                      tags=[f'{MENU_TAG}_menu'])
+    assert REDIS_ROUND_TRIPS.total() == round_trips + 1
+
+
+# Stored bytes
+@pytest.mark.redis
+@pytest.mark.asyncio
+async def test_cache_hit_returns_stored_bytes(ac: AsyncClient, redis_clients):
+    res = await ac.post('/api/v1/menus/', json={'title': 'Bytes Menu', 'description': 'New Description'})
+    bytes_menu_id = res.json()['id']
+    miss = await ac.get(f'/api/v1/menus/{bytes_menu_id}')
+    hit = await ac.get(f'/api/v1/menus/{bytes_menu_id}')
+    assert hit.status_code == 200
+    assert hit.headers['content-type'] == 'application/json'
+    assert hit.content == miss.content == await redis_clients.hget(f'{MENU_ITEM_CACHE_KEY}_{bytes_menu_id}', 'body')
+
+
+# Stale window and stored format
+@pytest.mark.redis
+@pytest.mark.asyncio
+async def test_cache_data_expires_after_stale_window(redis_clients):
+    await create_cache_data('menu:item_stale', b'{}', ttl=0, stale_ttl=60)
+    assert await get_cache_data('menu:item_stale') == (b'{}', False)
+    assert 0 < await redis_clients.ttl('menu:item_stale') <= 60
+
+    await create_cache_data('menu:item_fresh', b'{}', ttl=60, stale_ttl=60)
+    assert await get_cache_data('menu:item_fresh') == (b'{}', True)
+    assert 60 < await redis_clients.ttl('menu:item_fresh') <= 120
+
+
+@pytest.mark.redis
+@pytest.mark.asyncio
+async def test_old_string_cache_entry_is_a_miss(ac: AsyncClient, redis_clients):
+    res = await ac.post('/api/v1/menus/', json={'title': 'Legacy Menu', 'description': 'New Description'})
+    legacy_id = res.json()['id']
+    await redis_clients.set(f'{MENU_ITEM_CACHE_KEY}_{legacy_id}', '{"title": "Old"}')
+    res = await ac.get(f'/api/v1/menus/{legacy_id}')
+    assert res.status_code == 200
+    assert res.json()['title'] == 'Legacy Menu'
+    assert await redis_clients.hget(f'{MENU_ITEM_CACHE_KEY}_{legacy_id}', 'body') == res.content
+
+
+@pytest.mark.redis
+@pytest.mark.asyncio
+async def test_fill_started_before_invalidation_is_not_stored(redis_clients):
+    key = f'{MENU_ITEM_CACHE_KEY}_guarded'
+    *_, guard = await get_cache_entry(key, [f'{MENU_TAG}_guarded'])
+    await clear_cache(MENU_LIST_CACHE_KEY, tags=[f'{MENU_TAG}_guarded'])
+    assert not await create_cache_data(key, b'{}', guard=guard)
+    assert await redis_clients.exists(key) == 0
+
+    *_, guard = await get_cache_entry(key, [f'{MENU_TAG}_guarded'])
+    assert await create_cache_data(key, b'{}', guard=guard)
+    assert await get_cache_data(key) == (b'{}', True)
+
+
+# ETag
+@pytest.mark.redis
+@pytest.mark.asyncio
+async def test_if_none_match_answers_304_from_cache(ac: AsyncClient, redis_clients):
+    res = await ac.post('/api/v1/menus/', json={'title': 'ETag Menu', 'description': 'New Description'})
+    etag_menu_id = res.json()['id']
+    res = await ac.get(f'/api/v1/menus/{etag_menu_id}')
+    etag = res.headers['etag']
+    assert etag == (await redis_clients.hget(f'{MENU_ITEM_CACHE_KEY}_{etag_menu_id}', 'etag')).decode()
+    assert res.headers['cache-control'] == HTTP_CACHE_CONTROL
+
+    checkouts = CHECKOUTS.total()
+    res = await ac.get(f'/api/v1/menus/{etag_menu_id}', headers={'If-None-Match': etag})
+    assert res.status_code == 304
+    assert res.content == b''
+    assert res.headers['etag'] == etag
+    assert CHECKOUTS.total() == checkouts
+
+    res = await ac.get('/api/v1/menus/list/0/10')
+    res = await ac.get('/api/v1/menus/list/0/10', headers={'If-None-Match': res.headers['etag']})
+    assert res.status_code == 304
+
+
+@pytest.mark.redis
+@pytest.mark.asyncio
+async def test_etag_changes_after_update(ac: AsyncClient):
+    res = await ac.post('/api/v1/menus/', json={'title': 'ETag Menu', 'description': 'New Description'})
+    etag_menu_id = res.json()['id']
+    etag = (await ac.get(f'/api/v1/menus/{etag_menu_id}')).headers['etag']
+    await ac.patch(f'/api/v1/menus/{etag_menu_id}',
+                   json={'title': 'Updated ETag Menu', 'description': 'New Description'})
+    res = await ac.get(f'/api/v1/menus/{etag_menu_id}', headers={'If-None-Match': etag})
+    assert res.status_code == 200
+    assert res.json()['title'] == 'Updated ETag Menu'
+    assert res.headers['etag'] != etag
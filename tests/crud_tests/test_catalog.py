@@ -0,0 +1,32 @@
+import json
+
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_export_catalog(ac: AsyncClient):
+    res = await ac.post('/api/v1/menus/', json={'title': 'Export Menu', 'description': 'Export Description'})
+    menu_id = res.json()['id']
+    res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/',
+                        json={'title': 'Export Submenu', 'description': 'Export Description'})
+    submenu_id = res.json()['id']
+    res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/',
+                        json={'title': 'Export Dish', 'description': 'Export Description', 'price': '3.25'})
+    dish_id = res.json()['id']
+
+    res = await ac.get('/api/v1/catalog/export')
+    assert res.status_code == 200
+    assert res.headers['content-type'] == 'application/x-ndjson'
+    lines = [json.loads(line) for line in res.text.splitlines()]
+    positions = {line['id']: i for i, line in enumerate(lines)}
+    assert positions[menu_id] < positions[submenu_id] < positions[dish_id]
+    dish = lines[positions[dish_id]]
+    assert dish['type'] == 'dish'
+    assert dish['submenu_id'] == submenu_id
+    assert dish['price'] == '3.2500000000000000000000000000'
+
+    await ac.delete(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}')
+    await ac.delete(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}')
+    await ac.delete(f'/api/v1/menus/{menu_id}')
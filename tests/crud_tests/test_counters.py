@@ -0,0 +1,65 @@
+from uuid import UUID
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import update
+
+from source.db.counters import reconcile_counters
+from source.db.models import Menu, Submenu
+from tests.crud_tests.conftest import TestingSessionLocal
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_counters_follow_writes(ac: AsyncClient):
+    global menu_id, submenu_id, dish_ids
+    res = await ac.post('/api/v1/menus/', json={'title': 'Counted Menu', 'description': 'Counted Description'})
+    menu_id = res.json()['id']
+    res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/',
+                        json={'title': 'Counted Submenu', 'description': 'Counted Description'})
+    submenu_id = res.json()['id']
+    dish_ids = []
+    for i in range(3):
+        res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/',
+                            json={'title': f'Dish {i}', 'description': 'Counted Description', 'price': '1.00'})
+        dish_ids.append(res.json()['id'])
+    await ac.delete(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_ids.pop()}')
+
+    res = await ac.get(f'/api/v1/menus/{menu_id}')
+    assert res.json()['submenus_count'] == 1
+    assert res.json()['dishes_count'] == 2
+    res = await ac.get(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}')
+    assert res.json()['dishes_count'] == 2
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_reconcile_counters_repairs_drift(ac: AsyncClient):
+    async with TestingSessionLocal() as db:
+        async with db.begin():
+            await db.execute(update(Menu).where(Menu.id == UUID(menu_id)).values(submenus_count=7, dishes_count=0))
+            await db.execute(update(Submenu).where(Submenu.id == UUID(submenu_id)).values(dishes_count=42))
+    # сбрасываем кэш, чтобы в него попали разошедшиеся счетчики
+    await ac.patch(f'/api/v1/menus/{menu_id}', json={'title': 'Counted Menu', 'description': 'Counted Description'})
+    assert (await ac.get(f'/api/v1/menus/{menu_id}')).json()['submenus_count'] == 7
+
+    assert await reconcile_counters(TestingSessionLocal) == {'submenus': 1, 'menus': 1}
+    assert await reconcile_counters(TestingSessionLocal) == {'submenus': 0, 'menus': 0}
+
+    async with TestingSessionLocal() as db:
+        menu = await db.get(Menu, UUID(menu_id))
+        submenu = await db.get(Submenu, UUID(submenu_id))
+    assert (menu.submenus_count, menu.dishes_count) == (1, 2)
+    assert submenu.dishes_count == 2
+    assert (await ac.get(f'/api/v1/menus/{menu_id}')).json()['submenus_count'] == 1
+    assert (await ac.get(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}')).json()['dishes_count'] == 2
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_counters_cleanup(ac: AsyncClient):
+    for dish_id in dish_ids:
+        await ac.delete(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}')
+    await ac.delete(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}')
+    res = await ac.delete(f'/api/v1/menus/{menu_id}')
+    assert res.status_code == 200
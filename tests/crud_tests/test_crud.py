@@ -21,6 +21,23 @@ async def test_create_menu(ac: AsyncClient):
     assert len(resa.json()) == 1
 
 
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_get_menus_page(ac: AsyncClient):
+    global menu_id
+    res = await ac.get('/api/v1/menus/list', params={'limit': 1})
+    assert res.status_code == 200
+    assert [menu['id'] for menu in res.json()['items']] == [menu_id]
+    assert res.json()['next_cursor'] is None
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_get_menus_page_invalid_cursor(ac: AsyncClient):
+    res = await ac.get('/api/v1/menus/list', params={'limit': 1, 'cursor': 'not-a-cursor'})
+    assert res.status_code == 400
+
+
 @pytest.mark.crud
 @pytest.mark.asyncio
 async def test_update_menu(ac: AsyncClient):
@@ -90,6 +107,20 @@ async def test_create_dish(ac: AsyncClient):
     assert len(res.json()) == 1
 
 
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_get_dishes_scoped_to_submenu(ac: AsyncClient):
+    global menu_id
+    res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/',
+                        json={'title': 'Other submenu', 'description': 'Other submenu description'})
+    other_submenu_id = res.json()['id']
+    res = await ac.get(f'/api/v1/menus/{menu_id}/submenus/{other_submenu_id}/dishes/list/0/10')
+    assert res.json() == []
+    res = await ac.get(f'/api/v1/menus/{menu_id}/submenus/{other_submenu_id}/dishes/list', params={'limit': 10})
+    assert res.json()['items'] == []
+    await ac.delete(f'/api/v1/menus/{menu_id}/submenus/{other_submenu_id}')
+
+
 @pytest.mark.crud
 @pytest.mark.asyncio
 async def test_update_dish(ac: AsyncClient):
@@ -113,7 +144,7 @@ async def test_delete_dish(ac: AsyncClient):
     global dish_id
     response = await ac.delete(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}')
     assert response.status_code == 200
-    res = await ac.get('/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/list/0/10')
+    res = await ac.get(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/list/0/10')
     assert res.json() == []
 
 
@@ -124,7 +155,7 @@ async def test_delete_submenu(ac: AsyncClient):
     global submenu_id
     response = await ac.delete(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}')
     assert response.status_code == 200
-    res = await ac.get('/api/v1/menus/{menu_id}/submenus/list/0/10')
+    res = await ac.get(f'/api/v1/menus/{menu_id}/submenus/list/0/10')
     assert res.json() == []
 
 
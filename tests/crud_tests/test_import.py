@@ -0,0 +1,63 @@
+import json
+import uuid
+
+import pytest
+from httpx import AsyncClient
+
+menu_id, submenu_id = str(uuid.uuid4()), str(uuid.uuid4())
+dish_ids = [str(uuid.uuid4()) for _ in range(3)]
+
+RECORDS = [
+    {'type': 'menu', 'id': menu_id, 'title': 'Imported Menu', 'description': 'Imported'},
+    {'type': 'submenu', 'id': submenu_id, 'menu_id': menu_id, 'title': 'Imported Submenu', 'description': 'Imported'},
+    *({'type': 'dish', 'id': dish_id, 'submenu_id': submenu_id, 'title': 'Imported Dish',
+       'description': 'Imported', 'price': '4.50'} for dish_id in dish_ids),
+]
+
+
+def ndjson(records: list[dict]) -> str:
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_import_stops_at_invalid_record(ac: AsyncClient):
+    broken = [*RECORDS[:3], {'type': 'dish', 'id': dish_ids[1], 'title': 'No submenu'}, *RECORDS[4:]]
+    res = await ac.post('/api/v1/catalog/import', content=ndjson(broken))
+    assert res.status_code == 400
+    assert res.json()['checkpoint'] == 3
+    res = await ac.get(f'/api/v1/menus/{menu_id}')
+    assert res.json()['dishes_count'] == 1
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_import_resumes_from_checkpoint(ac: AsyncClient):
+    res = await ac.post('/api/v1/catalog/import', params={'resume_from': 3}, content=ndjson(RECORDS))
+    assert res.status_code == 200
+    assert res.json() == {'records': 5, 'imported': {'dish': 2}}
+    res = await ac.get(f'/api/v1/menus/{menu_id}')
+    assert res.json()['submenus_count'] == 1
+    assert res.json()['dishes_count'] == 3
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_import_is_idempotent(ac: AsyncClient):
+    header = 'type,id,menu_id,submenu_id,title,description,price\n'
+    rows = ''.join(f'{r["type"]},{r["id"]},{r.get("menu_id", "")},{r.get("submenu_id", "")},{r["title"]},'
+                   f'{r["description"]},{r.get("price", "")}\n' for r in RECORDS)
+    res = await ac.post('/api/v1/catalog/import', params={'format': 'csv'}, content=header + rows)
+    assert res.status_code == 200
+    assert res.json() == {'records': 5, 'imported': {'menu': 0, 'submenu': 0, 'dish': 0}}
+    res = await ac.get(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/list/0/10')
+    assert sorted(dish['id'] for dish in res.json()) == sorted(dish_ids)
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_import_cleanup(ac: AsyncClient):
+    await ac.post(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/bulk/delete', json=dish_ids)
+    await ac.delete(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}')
+    res = await ac.delete(f'/api/v1/menus/{menu_id}')
+    assert res.status_code == 200
@@ -0,0 +1,47 @@
+import time
+
+import pytest
+
+from source.api.cache.local import LocalCache
+
+
+@pytest.mark.redis
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalCache(maxsize=2, ttl=60)
+    cache.set('a', b'1')
+    cache.set('b', b'2')
+    assert cache.get('a') == b'1'
+    cache.set('c', b'3')
+    assert cache.get('b') is None
+    assert cache.get('a') == b'1'
+    assert cache.get('c') == b'3'
+
+
+@pytest.mark.redis
+def test_local_cache_expires_entries():
+    cache = LocalCache(maxsize=2, ttl=0.01)
+    cache.set('a', b'1')
+    time.sleep(0.02)
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+@pytest.mark.redis
+def test_local_cache_invalidates_by_tag():
+    cache = LocalCache(maxsize=10, ttl=60)
+    cache.set('menus:list_skip:0_limit:10', b'[]', tags=['menus:list'])
+    cache.set('menus:list_skip:10_limit:10', b'[]', tags=['menus:list'])
+    cache.set('submenu:item_1', b'{}', tags=['tag:menu_1'])
+    cache.invalidate(tags=['menus:list'])
+    assert cache.get('menus:list_skip:0_limit:10') is None
+    assert cache.get('menus:list_skip:10_limit:10') is None
+    assert cache.get('submenu:item_1') == b'{}'
+
+
+@pytest.mark.redis
+def test_local_cache_ignores_values_read_before_invalidation():
+    cache = LocalCache(maxsize=10, ttl=60)
+    epoch = cache.epoch
+    cache.invalidate(items=['menu:item_1'])
+    cache.set('menu:item_1', b'{"title": "stale"}', epoch=epoch)
+    assert cache.get('menu:item_1') is None
@@ -0,0 +1,192 @@
+import asyncio
+import json
+from uuid import UUID
+
+import pytest
+from confluent_kafka import KafkaException
+from httpx import AsyncClient
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import OperationalError
+
+from source.api.repositories.repository import MenuRepository
+from source.broker.producer import AsyncProducer
+from source.db.models import Menu, MenuSnapshot, Outbox
+from source.db.snapshots import SNAPSHOT_LAG, SNAPSHOT_READS
+from source.outbox.relay import OutboxDeliveryError, OutboxRelay
+from tests.crud_tests.conftest import FakeBroker, TestingSessionLocal
+
+
+@pytest.fixture(autouse=True)
+async def empty_outbox():
+    async with TestingSessionLocal() as db:
+        async with db.begin():
+            await db.execute(delete(Outbox))
+
+
+async def add_events(count: int) -> None:
+    async with TestingSessionLocal() as db:
+        async with db.begin():
+            await db.execute(insert(Outbox), [
+                {'topic': 'menu_topic', 'key': str(i), 'value': {'action': 'create', 'n': i}} for i in range(count)
+            ])
+
+
+async def outbox_size() -> int:
+    async with TestingSessionLocal() as db:
+        return (await db.execute(select(func.count()).select_from(Outbox))).scalar_one()
+
+
+@pytest.mark.outbox
+@pytest.mark.asyncio
+async def test_relay_publishes_and_drains_batches(fake_broker, fake_producer):
+    await add_events(5)
+    relay = OutboxRelay(TestingSessionLocal, fake_producer, batch_size=3)
+
+    assert await relay.relay_batch() == 3
+    assert await relay.relay_batch() == 2
+    assert await relay.relay_batch() == 0
+    assert sorted(json.loads(value)['n'] for _, _, value in fake_broker.messages) == [0, 1, 2, 3, 4]
+    assert await outbox_size() == 0
+
+
+@pytest.mark.outbox
+@pytest.mark.asyncio
+async def test_relay_keeps_events_on_delivery_failure(fake_producer):
+    await add_events(2)
+    relay = OutboxRelay(TestingSessionLocal, AsyncProducer(config={}, client=FakeBroker(fail=True)), batch_size=10)
+
+    with pytest.raises(OutboxDeliveryError):
+        await relay.relay_batch()
+    assert await relay.backlog() == 2
+
+    relay.producer = fake_producer
+    assert await relay.relay_batch() == 2
+    assert await outbox_size() == 0
+
+
+@pytest.mark.outbox
+@pytest.mark.asyncio
+async def test_relay_backs_off_while_database_is_unavailable(fake_producer):
+    await add_events(2)
+    failures = []
+
+    def flaky_sessions():
+        if len(failures) < 2:
+            failures.append(1)
+            raise OperationalError('DELETE FROM deferred_tasks', {}, ConnectionRefusedError())
+        return TestingSessionLocal()
+
+    stop = asyncio.Event()
+    relay = OutboxRelay(flaky_sessions, fake_producer, poll_interval=0.01, max_backoff=0.02)
+    task = asyncio.create_task(relay.run(stop))
+    async with asyncio.timeout(5):
+        while await outbox_size():
+            await asyncio.sleep(0.01)
+    stop.set()
+    await task
+    assert len(failures) == 2
+
+
+class RejectingBroker(FakeBroker):
+    def produce(self, topic, key=None, value=None, on_delivery=None):
+        self.messages.append((topic, key, value))
+        raise KafkaException('broker rejected the message')
+
+
+@pytest.mark.outbox
+@pytest.mark.asyncio
+async def test_relay_survives_broker_errors():
+    await add_events(2)
+    broker = RejectingBroker()
+    stop = asyncio.Event()
+    relay = OutboxRelay(TestingSessionLocal, AsyncProducer(config={}, client=broker), poll_interval=0.01,
+                        max_backoff=0.02)
+    task = asyncio.create_task(relay.run(stop))
+    async with asyncio.timeout(5):
+        while len(broker.messages) < 2:
+            await asyncio.sleep(0.01)
+    assert not task.done()
+    stop.set()
+    await task
+    assert await outbox_size() == 2
+
+
+@pytest.mark.outbox
+@pytest.mark.asyncio
+async def test_submenu_and_dish_writes_go_to_outbox(ac: AsyncClient):
+    res = await ac.post('/api/v1/menus/', json={'title': 'Outbox menu', 'description': 'Outbox menu'})
+    menu_id = res.json()['id']
+    res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/',
+                        json={'title': 'Outbox submenu', 'description': 'Outbox submenu'})
+    submenu_id = res.json()['id']
+    res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/',
+                        json={'title': 'Outbox dish', 'description': 'Outbox dish', 'price': 1.5})
+    dish_id = res.json()['id']
+    await ac.delete(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}')
+
+    async with TestingSessionLocal() as db:
+        res = await db.execute(select(Outbox.topic, Outbox.key, Outbox.value).order_by(Outbox.created_at))
+        events = [(topic, key, value['action']) for topic, key, value in res.all()]
+    assert events == [
+        ('menu_topic', menu_id, 'create'),
+        ('submenu_topic', submenu_id, 'create'),
+        ('dish_topic', dish_id, 'create'),
+        ('dish_topic', dish_id, 'delete'),
+    ]
+
+
+@pytest.mark.outbox
+@pytest.mark.asyncio
+async def test_missing_submenu_and_dish_writes_return_404(ac: AsyncClient):
+    res = await ac.post('/api/v1/menus/', json={'title': 'Missing menu', 'description': 'Missing menu'})
+    menu_id = res.json()['id']
+    missing_id = '00000000-0000-0000-0000-000000000000'
+    submenu_url = f'/api/v1/menus/{menu_id}/submenus/{missing_id}'
+    dish_url = f'/api/v1/menus/{menu_id}/submenus/{missing_id}/dishes/{missing_id}'
+
+    res = await ac.patch(submenu_url, json={'title': 'Missing', 'description': 'Missing'})
+    assert (res.status_code, res.json()) == (404, {'detail': 'submenu not found'})
+    res = await ac.delete(submenu_url)
+    assert (res.status_code, res.json()) == (404, {'detail': 'submenu not found'})
+    res = await ac.patch(dish_url, json={'title': 'Missing', 'description': 'Missing', 'price': 1.5})
+    assert (res.status_code, res.json()) == (404, {'detail': 'dish not found'})
+    res = await ac.delete(dish_url)
+    assert (res.status_code, res.json()) == (404, {'detail': 'dish not found'})
+
+
+async def menu_document(menu_id: str) -> dict:
+    async with TestingSessionLocal() as db:
+        documents = await MenuRepository(db).get_page(limit=1000)
+    return next(document for document in documents if document['id'] == menu_id)
+
+
+@pytest.mark.outbox
+@pytest.mark.asyncio
+async def test_relay_refreshes_menu_snapshots(ac: AsyncClient, fake_producer):
+    res = await ac.post('/api/v1/menus/', json={'title': 'Snapshot menu', 'description': 'Snapshot menu'})
+    menu_id = res.json()['id']
+    res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/',
+                        json={'title': 'Snapshot submenu', 'description': 'Snapshot submenu'})
+    submenu_id = res.json()['id']
+    res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/',
+                        json={'title': 'Snapshot dish', 'description': 'Snapshot dish', 'price': 1.5})
+    dish_id = res.json()['id']
+
+    # Пока релей не отработал, документ собирается на лету
+    misses = SNAPSHOT_READS.get(result='miss')
+    built = await menu_document(menu_id)
+    assert SNAPSHOT_READS.get(result='miss') > misses
+    assert built['submenus'][0]['dishes'][0]['dish_id'] == dish_id
+
+    lags = SNAPSHOT_LAG.get()
+    assert await OutboxRelay(TestingSessionLocal, fake_producer, batch_size=10).relay_batch() == 3
+    assert SNAPSHOT_LAG.get() == lags + 3
+
+    async with TestingSessionLocal() as db:
+        snapshot = await db.get(MenuSnapshot, UUID(menu_id))
+        menu = await db.get(Menu, UUID(menu_id))
+    assert snapshot.version == menu.version == 2
+
+    hits = SNAPSHOT_READS.get(result='hit')
+    assert await menu_document(menu_id) == built == snapshot.document
+    assert SNAPSHOT_READS.get(result='hit') > hits
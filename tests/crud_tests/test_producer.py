@@ -0,0 +1,30 @@
+import pytest
+from confluent_kafka import KafkaException
+
+from source.broker.producer import DELIVERED, AsyncProducer
+from tests.crud_tests.conftest import FakeBroker
+
+
+@pytest.mark.kafka
+@pytest.mark.asyncio
+async def test_produce_resolves_after_background_poll(fake_broker, fake_producer):
+    delivered = DELIVERED.get(topic='menu_topic')
+    await fake_producer.start()
+    try:
+        await fake_producer.produce('menu_topic', b'{}', key='1')
+    finally:
+        await fake_producer.stop()
+    assert fake_broker.messages == [('menu_topic', '1', b'{}')]
+    assert DELIVERED.get(topic='menu_topic') == delivered + 1
+
+
+@pytest.mark.kafka
+@pytest.mark.asyncio
+async def test_produce_raises_on_delivery_error():
+    producer = AsyncProducer(config={}, client=FakeBroker(fail=True))
+    await producer.start()
+    try:
+        with pytest.raises(KafkaException):
+            await producer.produce('menu_topic', b'{}', key='1')
+    finally:
+        await producer.stop()
@@ -0,0 +1,103 @@
+from contextlib import contextmanager
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+
+from source.db.pool import CHECKOUTS
+from tests.crud_tests.conftest import TestingReplicaSessions, engine_test
+
+TEST_ENGINES = [engine_test, *(replica.kw['bind'] for replica in TestingReplicaSessions)]
+
+
+@contextmanager
+def captured_queries():
+    """ Собирает SQL, который ушёл в тестовую базу (primary или реплику) внутри блока """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for engine in TEST_ENGINES:
+        event.listen(engine.sync_engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for engine in TEST_ENGINES:
+            event.remove(engine.sync_engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_queries_prepare(ac: AsyncClient):
+    global menu_id, submenu_id, dish_id
+    res = await ac.post('/api/v1/menus/', json={'title': 'Query Menu', 'description': 'Query Description'})
+    menu_id = res.json()['id']
+    res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/',
+                        json={'title': 'Query Submenu', 'description': 'Query Description'})
+    submenu_id = res.json()['id']
+    res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/',
+                        json={'title': 'Query Dish', 'description': 'Query Description', 'price': '1.50'})
+    dish_id = res.json()['id']
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_dish_get_without_joins(ac: AsyncClient):
+    with captured_queries() as statements:
+        res = await ac.get(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}')
+    assert res.status_code == 200
+    assert len(statements) == 1
+    assert 'JOIN' not in statements[0].upper()
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_submenu_list_loads_dishes_in_one_extra_query(ac: AsyncClient):
+    # Уникальный limit, чтобы не попасть в кеш предыдущих тестов
+    with captured_queries() as statements:
+        res = await ac.get(f'/api/v1/menus/{menu_id}/submenus/list/0/7')
+    assert res.status_code == 200
+    assert len(statements) == 2
+    assert all('JOIN' not in statement.upper() for statement in statements)
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_submenu_list_groups_dishes_by_submenu(ac: AsyncClient):
+    res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/',
+                        json={'title': 'Second Submenu', 'description': 'Query Description'})
+    second_id = res.json()['id']
+    res = await ac.post(f'/api/v1/menus/{menu_id}/submenus/{second_id}/dishes/',
+                        json={'title': 'Second Dish', 'description': 'Query Description', 'price': '2.50'})
+    second_dish_id = res.json()['id']
+
+    res = await ac.get(f'/api/v1/menus/{menu_id}/submenus/list/0/19')
+    assert res.status_code == 200
+    dishes = {submenu['id']: submenu['dishes'] for submenu in res.json()}
+    assert [(dish['id'], Decimal(dish['price'])) for dish in dishes[submenu_id]] == [(dish_id, Decimal('1.50'))]
+    assert [(dish['id'], Decimal(dish['price'])) for dish in dishes[second_id]] == [(second_dish_id, Decimal('2.50'))]
+    assert list(dishes[second_id][0]) == ['id', 'title', 'description', 'price']
+
+    await ac.delete(f'/api/v1/menus/{menu_id}/submenus/{second_id}/dishes/{second_dish_id}')
+    await ac.delete(f'/api/v1/menus/{menu_id}/submenus/{second_id}')
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_cache_hit_does_not_check_out_connection(ac: AsyncClient):
+    await ac.get(f'/api/v1/menus/{menu_id}')
+    checkouts = CHECKOUTS.total()
+    res = await ac.get(f'/api/v1/menus/{menu_id}')
+    assert res.status_code == 200
+    assert CHECKOUTS.total() == checkouts
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_queries_cleanup(ac: AsyncClient):
+    await ac.delete(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}')
+    await ac.delete(f'/api/v1/menus/{menu_id}/submenus/{submenu_id}')
+    res = await ac.delete(f'/api/v1/menus/{menu_id}')
+    assert res.status_code == 200
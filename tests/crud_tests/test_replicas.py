@@ -0,0 +1,82 @@
+import time
+
+import pytest
+from httpx import AsyncClient
+
+from main import app
+from source.api.repositories.repository import MenuRepository
+from source.db.database import LAST_WRITE_COOKIE, READ_SESSIONS
+from tests.crud_tests.conftest import settings
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_write_sets_last_write_cookie():
+    global menu_id
+    async with AsyncClient(app=app, base_url='http://test') as client:
+        res = await client.post('/api/v1/menus/', json={'title': 'Replica Menu', 'description': 'Replica Description'})
+        assert res.status_code == 201
+        menu_id = res.json()['id']
+        assert float(client.cookies[LAST_WRITE_COOKIE]) <= time.time()
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_read_without_recent_write_goes_to_replica():
+    async with AsyncClient(app=app, base_url='http://test') as client:
+        primary = READ_SESSIONS.get(pool='test')
+        res = await client.get('/api/v1/menus/list/0/11')
+    assert res.status_code == 200
+    assert READ_SESSIONS.get(pool='test') == primary
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_read_after_own_write_goes_to_primary():
+    async with AsyncClient(app=app, base_url='http://test') as client:
+        client.cookies.set(LAST_WRITE_COOKIE, str(time.time()))
+        primary = READ_SESSIONS.get(pool='test')
+        res = await client.get(f'/api/v1/menus/{menu_id}')
+        assert res.status_code == 200
+        assert READ_SESSIONS.get(pool='test') == primary + 1
+
+        client.cookies.set(LAST_WRITE_COOKIE, str(time.time() - settings.READ_YOUR_WRITES_WINDOW - 1))
+        res = await client.get(f'/api/v1/menus/{menu_id}')
+        assert res.status_code == 200
+        assert READ_SESSIONS.get(pool='test') == primary + 1
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_read_after_own_write_skips_cache_filled_from_replica(monkeypatch):
+    get_menu = MenuRepository.get
+
+    async def lagging_get(self, menu_id):
+        # реплика еще не получила запись и отдает прежнюю версию строки
+        menu = await get_menu(self, menu_id)
+        if menu is not None and self.db.bind.pool.name.startswith('test-replica'):
+            menu = {**menu, 'title': 'Replica Menu'}
+        return menu
+
+    monkeypatch.setattr(MenuRepository, 'get', lagging_get)
+    async with AsyncClient(app=app, base_url='http://test') as client:
+        res = await client.patch(f'/api/v1/menus/{menu_id}', json={'title': 'Written Menu', 'description': 'New'})
+        assert res.status_code == 200
+        last_write = res.cookies[LAST_WRITE_COOKIE]
+
+    # чужой промах кэша читает с реплики и кладет старую версию в кэш
+    async with AsyncClient(app=app, base_url='http://test') as client:
+        res = await client.get(f'/api/v1/menus/{menu_id}')
+        assert res.json()['title'] == 'Replica Menu'
+
+    async with AsyncClient(app=app, base_url='http://test') as client:
+        client.cookies.set(LAST_WRITE_COOKIE, last_write)
+        res = await client.get(f'/api/v1/menus/{menu_id}')
+        assert res.json()['title'] == 'Written Menu'
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_replicas_cleanup(ac: AsyncClient):
+    res = await ac.delete(f'/api/v1/menus/{menu_id}')
+    assert res.status_code == 200
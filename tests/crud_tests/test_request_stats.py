@@ -0,0 +1,54 @@
+import pytest
+from httpx import AsyncClient
+
+from source.api.middlewares import REQUEST_LATENCY
+from source.db.instrumentation import QUERIES
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_request_stats_prepare(ac: AsyncClient):
+    global menu_id
+    res = await ac.post('/api/v1/menus/', json={'title': 'Stats Menu', 'description': 'Stats Description'})
+    assert res.status_code == 201
+    menu_id = res.json()['id']
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_server_timing_is_opt_in(ac: AsyncClient):
+    res = await ac.get(f'/api/v1/menus/{menu_id}/submenus/list/0/13')
+    assert res.status_code == 200
+    assert 'server-timing' not in res.headers
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_server_timing_breakdown(ac: AsyncClient):
+    queries = QUERIES.total()
+    res = await ac.get(f'/api/v1/menus/{menu_id}/submenus/list/0/17', headers={'X-Request-Timing': '1'})
+    assert res.status_code == 200
+    timing = res.headers['server-timing']
+    assert f'desc="{int(QUERIES.total() - queries)} queries"' in timing
+    assert 'cache;desc="redis-miss"' in timing
+
+    res = await ac.get(f'/api/v1/menus/{menu_id}/submenus/list/0/17', headers={'X-Request-Timing': '1'})
+    assert 'desc="0 queries"' in res.headers['server-timing']
+    assert '-hit' in res.headers['server-timing']
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_latency_is_labelled_by_route_template(ac: AsyncClient):
+    await ac.get(f'/api/v1/menus/{menu_id}')
+    assert REQUEST_LATENCY.get(method='GET', route='/api/v1/menus/{menu_id}', status='200') > 0
+    res = await ac.get('/metrics')
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/v1/menus/{menu_id}",status="200"}' in res.text
+    assert 'db_queries_total' in res.text
+
+
+@pytest.mark.crud
+@pytest.mark.asyncio
+async def test_request_stats_cleanup(ac: AsyncClient):
+    res = await ac.delete(f'/api/v1/menus/{menu_id}')
+    assert res.status_code == 200
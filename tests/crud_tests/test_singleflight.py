@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from source.api.cache.singleflight import SingleFlight
+
+
+@pytest.mark.redis
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_concurrent_calls():
+    flights = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return b'[]'
+
+    results = await asyncio.gather(*[flights.do('submenus:list_skip:0_limit:100', load) for _ in range(50)])
+    assert calls == 1
+    assert results == [b'[]'] * 50
+    assert len(flights) == 0
+
+
+@pytest.mark.redis
+@pytest.mark.asyncio
+async def test_single_flight_shares_errors_and_retries_next_time():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError('db is down')
+
+    results = await asyncio.gather(*[flights.do('menu:item_1', fail) for _ in range(3)], return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    async def load():
+        return b'{}'
+
+    assert await flights.do('menu:item_1', load) == b'{}'
+
+
+@pytest.mark.redis
+@pytest.mark.asyncio
+async def test_single_flight_follower_survives_leader_cancellation():
+    flights = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return b'{}'
+
+    leader = asyncio.create_task(flights.do('menu:item_2', load))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flights.do('menu:item_2', load))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert await follower == b'{}'
+    assert calls == 2
+    assert len(flights) == 0